@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+服务器开销基准测试
+用可配置的假aqc（fake_aqc.py）代替真实aqc，通过内存中的MCP客户端会话驱动 AstroqueryMCPServer，
+报告启动时间、tools/list 延迟、不同并发下的调用吞吐量、p50/p99 延迟和峰值RSS；不访问网络
+
+用法:
+    PYTHONPATH=src python benchmarks/bench_server.py --concurrency 1,4,16 --calls 64
+    PYTHONPATH=src python benchmarks/bench_server.py --output baseline.json
+    PYTHONPATH=src python benchmarks/bench_server.py --baseline baseline.json  # 退化超过容差时返回1
+
+服务器本身仍读取 ASTROQUERY_MCP_* 环境变量，例如 ASTROQUERY_MCP_WORKERS=0 测量一次性子进程路径
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+HERE = Path(__file__).resolve().parent
+
+# 启动器让工作进程池能解析出入口 fake_aqc:main，与pip生成的console脚本结构相同
+LAUNCHER = """#!{interpreter}
+import sys
+from fake_aqc import main
+if __name__ == "__main__":
+    sys.exit(main())
+"""
+
+
+def write_launcher(directory: Path) -> Path:
+    """在 directory 中生成名为 aqc 的可执行启动器"""
+    path = directory / "aqc"
+    path.write_text(LAUNCHER.format(interpreter=sys.executable))
+    path.chmod(0o755)
+    return path
+
+
+def configure_environment(args: argparse.Namespace, directory: Path) -> None:
+    """让服务器找到假aqc，并把缓存放在临时目录中；已设置的 ASTROQUERY_MCP_* 不被覆盖"""
+    os.environ["PATH"] = f"{directory}{os.pathsep}{os.environ.get('PATH', '')}"
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [str(HERE), os.environ.get("PYTHONPATH")]))
+    os.environ.update(
+        FAKE_AQC_STARTUP=str(args.startup),
+        FAKE_AQC_LATENCY=str(args.latency),
+        FAKE_AQC_ROWS=str(args.rows),
+        FAKE_AQC_FAILURE_RATE=str(args.failure_rate),
+    )
+    os.environ.setdefault("ASTROQUERY_MCP_CACHE_DIR", str(directory / "cache"))
+    # 默认每次调用都执行aqc，测量的是执行路径而不是缓存
+    os.environ.setdefault("ASTROQUERY_MCP_RESULT_CACHE", "1" if args.cache else "0")
+    os.environ.setdefault("ASTROQUERY_MCP_CONE_CACHE", "0")
+    os.environ.setdefault("ASTROQUERY_MCP_CLIENT_MAX_QUEUED", "0")
+    os.environ.setdefault("ASTROQUERY_MCP_MAX_CONCURRENCY", str(max(args.concurrency)))
+    os.environ.setdefault("ASTROQUERY_MCP_SERVICE_CONCURRENCY_DEFAULT", "0")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    """服务器进程及其已结束子进程的峰值RSS（MB）"""
+    try:
+        import resource
+    except ImportError:
+        return {"server": None, "children": None}
+    # Linux 以KB为单位，macOS 以字节为单位
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "server": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    from astroquery_mcp.server import AstroqueryMCPServer
+
+    started = time.perf_counter()
+    server = AstroqueryMCPServer()
+    init_seconds = time.perf_counter() - started
+
+    report: Dict[str, Any] = {
+        "config": {
+            "calls": args.calls,
+            "rows": args.rows,
+            "startup": args.startup,
+            "latency": args.latency,
+            "failure_rate": args.failure_rate,
+            "workers": 0 if server.worker_pool is None else server.worker_pool.size,
+            "cache": args.cache,
+        },
+        "init_seconds": round(init_seconds, 4),
+        "levels": [],
+    }
+
+    try:
+        async with create_connected_server_and_client_session(server.server) as session:
+            # 第一次 tools/list 包括命令发现
+            started = time.perf_counter()
+            await session.list_tools()
+            cold = time.perf_counter() - started
+
+            warm = []
+            for _ in range(args.list_repeats):
+                started = time.perf_counter()
+                await session.list_tools()
+                warm.append(time.perf_counter() - started)
+            report["tools_list"] = {
+                "cold_seconds": round(cold, 4),
+                "p50_seconds": round(percentile(warm, 0.5), 6),
+                "p99_seconds": round(percentile(warm, 0.99), 6),
+            }
+
+            for concurrency in args.concurrency:
+                report["levels"].append(await _run_level(session, concurrency, args.calls))
+    finally:
+        server.reaper.kill_all()
+        if server.worker_pool is not None:
+            await server.worker_pool.close()
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    report["server_metrics"] = server.metrics.snapshot()["counters"]
+    return report
+
+
+async def _run_level(session, concurrency: int, calls: int) -> Dict[str, Any]:
+    """以给定并发执行 calls 次互不相同的调用（避免被合并或缓存）"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def call(index: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            result = await session.call_tool("astroquery_simbad", {
+                "subcommand": "query", "arguments": [f"BENCH-{concurrency}-{index}"],
+            })
+            latencies.append(time.perf_counter() - started)
+            if result.isError or "Return code: 0" not in result.content[0].text:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call(index) for index in range(calls)))
+    wall = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "calls": calls,
+        "failures": failures,
+        "wall_seconds": round(wall, 4),
+        "throughput": round(calls / wall, 2) if wall else 0.0,
+        "p50_seconds": round(percentile(latencies, 0.5), 6),
+        "p99_seconds": round(percentile(latencies, 0.99), 6),
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """与基线比较，返回超过容差的退化项"""
+    regressions = []
+
+    def check(label: str, current: float, previous: float, higher_is_better: bool = False) -> None:
+        if not previous:
+            return
+        change = (current - previous) / previous
+        if (change < -tolerance) if higher_is_better else (change > tolerance):
+            regressions.append(f"{label}: {previous:g} -> {current:g} ({change:+.0%})")
+
+    if "tools_list" in report and "tools_list" in baseline:
+        check("tools/list p50", report["tools_list"]["p50_seconds"], baseline["tools_list"]["p50_seconds"])
+    previous_levels = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    for level in report["levels"]:
+        previous = previous_levels.get(level["concurrency"])
+        if previous is None:
+            continue
+        prefix = f"concurrency {level['concurrency']}"
+        check(f"{prefix} throughput", level["throughput"], previous["throughput"], higher_is_better=True)
+        check(f"{prefix} p50", level["p50_seconds"], previous["p50_seconds"])
+        check(f"{prefix} p99", level["p99_seconds"], previous["p99_seconds"])
+    return regressions
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"init: {report['init_seconds'] * 1000:.1f} ms",
+        f"tools/list: cold {report['tools_list']['cold_seconds'] * 1000:.1f} ms, "
+        f"warm p50 {report['tools_list']['p50_seconds'] * 1000:.2f} ms, "
+        f"p99 {report['tools_list']['p99_seconds'] * 1000:.2f} ms",
+        "",
+        f"{'concurrency':>11}  {'calls/s':>9}  {'p50 ms':>9}  {'p99 ms':>9}  {'failures':>8}",
+    ]
+    for level in report["levels"]:
+        lines.append(
+            f"{level['concurrency']:>11}  {level['throughput']:>9.1f}  "
+            f"{level['p50_seconds'] * 1000:>9.1f}  {level['p99_seconds'] * 1000:>9.1f}  {level['failures']:>8}"
+        )
+    rss = report["peak_rss_mb"]
+    if rss["server"] is not None:
+        lines += ["", f"peak RSS: server {rss['server']} MB, largest child {rss['children']} MB"]
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure astroquery-mcp-server overhead against a fake aqc")
+    parser.add_argument("--concurrency", default="1,4,16",
+                        type=lambda value: [int(level) for level in value.split(",") if level],
+                        help="comma-separated concurrency levels (default: 1,4,16)")
+    parser.add_argument("--calls", type=int, default=64, help="tool calls per concurrency level (default: 64)")
+    parser.add_argument("--list-repeats", type=int, default=20, help="warm tools/list calls (default: 20)")
+    parser.add_argument("--startup", type=float, default=0.3, help="fake aqc import delay in seconds (default: 0.3)")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake remote latency per query (default: 0.05)")
+    parser.add_argument("--rows", type=int, default=20, help="rows per query result (default: 20)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of failing queries (default: 0)")
+    parser.add_argument("--cache", action="store_true", help="keep the result cache enabled")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="compare against a JSON report written by --output")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative regression against the baseline (default: 0.2)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="aqc-bench-") as directory:
+        write_launcher(Path(directory))
+        configure_environment(args, Path(directory))
+        report = asyncio.run(run_benchmark(args))
+
+    print(format_report(report))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            return 1
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+用于基准测试的假aqc
+模仿aqc的命令结构和输出，不访问网络；行为由环境变量控制：
+
+    FAKE_AQC_STARTUP       导入时的延迟（秒），模拟 astropy/astroquery 的导入时间（默认 0.3）
+    FAKE_AQC_LATENCY       每次查询的延迟（秒），模拟远程服务的I/O（默认 0.05）
+    FAKE_AQC_ROWS          每次查询输出的行数（默认 20）
+    FAKE_AQC_FAILURE_RATE  查询失败（返回码1）的概率（默认 0）
+
+可以直接执行，也可以作为常驻工作进程的入口（fake_aqc:main）导入。
+只依赖标准库
+"""
+
+import os
+import random
+import sys
+import time
+
+STARTUP = float(os.environ.get("FAKE_AQC_STARTUP", "0.3"))
+LATENCY = float(os.environ.get("FAKE_AQC_LATENCY", "0.05"))
+ROWS = int(os.environ.get("FAKE_AQC_ROWS", "20"))
+FAILURE_RATE = float(os.environ.get("FAKE_AQC_FAILURE_RATE", "0"))
+
+COMMANDS = {
+    "simbad": ("Query the SIMBAD astronomical database", ["query", "object", "cone"]),
+    "vizier": ("Query VizieR catalogs", ["object", "cone"]),
+    "gaia": ("Query the Gaia archive", ["query", "cone"]),
+}
+COLUMNS = ["MAIN_ID", "RA", "DEC", "V"]
+
+# 子命令的位置参数和选项，--help 以 Click 的格式输出
+FORMAT_OPTION = "  --output-format [text|csv]  Output format  [default: text]"
+SUBCOMMAND_HELP = {
+    "query": ("OBJECT_NAME", [FORMAT_OPTION]),
+    "object": ("OBJECT_NAME", [FORMAT_OPTION]),
+    "cone": ("", [
+        "  --ra FLOAT                  Right ascension in degrees  [required]",
+        "  --dec FLOAT                 Declination in degrees  [required]",
+        "  --radius TEXT               Search radius  [default: 2 arcmin]",
+        FORMAT_OPTION,
+    ]),
+}
+
+# 模拟导入重量级依赖；常驻工作进程只付出一次
+time.sleep(STARTUP)
+
+
+def _help(argv):
+    if len(argv) > 1 and argv[0] in COMMANDS and argv[1] in COMMANDS[argv[0]][1]:
+        arguments, options = SUBCOMMAND_HELP[argv[1]]
+        lines = [f"Usage: aqc {argv[0]} {argv[1]} [OPTIONS] {arguments}".rstrip(), "",
+                 f"  Run a {argv[0]} {argv[1]} query", "", "Options:"]
+        lines += options + ["  --help                      Show this message and exit."]
+    elif argv and argv[0] in COMMANDS:
+        description, subcommands = COMMANDS[argv[0]]
+        lines = [f"Usage: aqc {argv[0]} [OPTIONS] COMMAND [ARGS]...", "", description, "", "Commands:"]
+        lines += [f"  {name}  Run a {argv[0]} {name} query" for name in subcommands]
+    else:
+        lines = ["Usage: aqc [OPTIONS] COMMAND [ARGS]...", "", "Commands:"]
+        lines += [f"  {name}  {description}" for name, (description, _) in COMMANDS.items()]
+    print("\n".join(lines))
+    return 0
+
+
+def _options(argv):
+    options, arguments = {}, []
+    index = 0
+    while index < len(argv):
+        if argv[index].startswith("--") and index + 1 < len(argv):
+            options[argv[index][2:]] = argv[index + 1]
+            index += 2
+        else:
+            arguments.append(argv[index])
+            index += 1
+    return options, arguments
+
+
+def _query(argv):
+    options, arguments = _options(argv[2:])
+    time.sleep(LATENCY)
+    if FAILURE_RATE and random.random() < FAILURE_RATE:
+        print("Error: remote service unavailable", file=sys.stderr)
+        return 1
+
+    ra = float(options.get("ra", 10.0))
+    dec = float(options.get("dec", 20.0))
+    name = " ".join(arguments) or "FAKE"
+    rows = []
+    for index in range(ROWS):
+        rows.append([f"{name} {index}", f"{ra + index * 1e-4:.6f}", f"{dec - index * 1e-4:.6f}",
+                     f"{10 + (index % 50) / 10:.2f}"])
+
+    if options.get("output-format") == "csv":
+        lines = [",".join(COLUMNS)] + [",".join(row) for row in rows]
+    else:
+        widths = [max(len(column), *(len(row[i]) for row in rows)) if rows else len(column)
+                  for i, column in enumerate(COLUMNS)]
+        lines = [" ".join(column.ljust(width) for column, width in zip(COLUMNS, widths))]
+        lines += [" ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows]
+    print("\n".join(lines))
+    return 0
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or "--help" in argv:
+        return _help([arg for arg in argv if arg != "--help"])
+    if argv[0] not in COMMANDS or len(argv) < 2 or argv[1] not in COMMANDS[argv[0]][1]:
+        print(f"Error: no such command: {' '.join(argv[:2])}", file=sys.stderr)
+        return 2
+    return _query(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""
+aqc常驻工作进程
+由 WorkerPool 使用aqc自身的解释器启动：只导入一次aqc（及astropy/astroquery），
+之后通过stdin/stdout上的JSON行协议重复执行命令；
+请求带 progress_interval 时，执行过程中按间隔先发送 {"id", "progress": {"bytes", "rows"}} 帧
+
+注意：该脚本在aqc的环境中运行，只能依赖标准库
+"""
+
+import importlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+
+
+def _load_target(spec: str):
+    """加载 "module:attr" 形式的入口点"""
+    module_name, _, attr = spec.partition(":")
+    target = importlib.import_module(module_name)
+    for part in filter(None, attr.split(".")):
+        target = getattr(target, part)
+    return target
+
+
+def _exit_code(exc: SystemExit, stderr: io.StringIO) -> int:
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    stderr.write(f"{exc.code}\n")
+    return 1
+
+
+class _ProgressOutput(io.StringIO):
+    """捕获stdout，同时每隔 interval 秒报告已输出的字节数和行数"""
+
+    def __init__(self, report, interval):
+        super().__init__()
+        self._report = report
+        self._interval = interval
+        self._last = time.monotonic()
+        self.size = 0
+        self.rows = 0
+
+    def write(self, s):
+        written = super().write(s)
+        self.size += len(s.encode("utf-8", errors="replace"))
+        self.rows += s.count("\n")
+        now = time.monotonic()
+        if now - self._last >= self._interval:
+            self._last = now
+            self._report(self.size, self.rows)
+        return written
+
+
+def _run(target, argv, report=None, interval=0.0):
+    """在当前进程中执行一次aqc命令，捕获输出；给出 report 时报告输出进度"""
+    stdout = io.StringIO() if report is None else _ProgressOutput(report, interval)
+    stderr = io.StringIO()
+    returncode = 0
+    saved_argv, saved_stdin = sys.argv, sys.stdin
+    sys.argv = ["aqc"] + list(argv)
+    sys.stdin = io.StringIO("")
+
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                # Click/Typer 应用直接接收参数；普通函数从 sys.argv 读取
+                if hasattr(target, "main") or type(target).__name__ == "Typer":
+                    result = target(args=list(argv), prog_name="aqc")
+                else:
+                    result = target()
+                if isinstance(result, int):
+                    returncode = result
+            except SystemExit as e:
+                returncode = _exit_code(e, stderr)
+            except Exception:
+                traceback.print_exc(file=stderr)
+                returncode = 1
+    finally:
+        sys.argv, sys.stdin = saved_argv, saved_stdin
+
+    return {
+        "returncode": returncode,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+    }
+
+
+def _param(param):
+    """Click 参数的元数据（只保留可以写成JSON的字段）"""
+    default = param.default if isinstance(param.default, (str, int, float, bool)) else None
+    return {
+        "name": param.name,
+        "kind": "argument" if type(param).__name__.endswith("Argument") else "option",
+        "opts": list(param.opts),
+        "secondary": list(getattr(param, "secondary_opts", []) or []),
+        "type": getattr(param.type, "name", "text"),
+        "choices": [str(choice) for choice in getattr(param.type, "choices", None) or []],
+        "required": bool(param.required),
+        "default": default,
+        "multiple": bool(getattr(param, "multiple", False)),
+        "nargs": param.nargs,
+        "is_flag": bool(getattr(param, "is_flag", False)),
+        "help": getattr(param, "help", None) or "",
+        "hidden": bool(getattr(param, "hidden", False)),
+    }
+
+
+def _summary(command):
+    text = getattr(command, "short_help", None) or getattr(command, "help", None) or ""
+    return text.strip().split("\n")[0]
+
+
+def _describe(target):
+    """读取 Click/Typer 应用的 命令 -> 子命令 -> 参数 树；入口不是 Click 应用时返回 None"""
+    if type(target).__name__ == "Typer":
+        import typer.main
+        target = typer.main.get_command(target)
+    if not isinstance(getattr(target, "commands", None), dict):
+        return None
+
+    tree = {}
+    for name, command in target.commands.items():
+        if getattr(command, "hidden", False):
+            continue
+        subcommands = {}
+        for sub_name, sub in (getattr(command, "commands", None) or {}).items():
+            if getattr(sub, "hidden", False):
+                continue
+            subcommands[sub_name] = {
+                "description": _summary(sub),
+                "params": [_param(param) for param in sub.params],
+            }
+        tree[name] = {"description": _summary(command), "subcommands": subcommands}
+    return tree
+
+
+def _spill(response, request):
+    """输出超过阈值时写入临时文件，只通过管道返回开头部分"""
+    threshold = request.get("spill_threshold")
+    if threshold is None:
+        return
+
+    data = response["stdout"].encode("utf-8")
+    if len(data) <= threshold:
+        return
+
+    directory = request.get("spill_dir") or tempfile.gettempdir()
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, prefix="output-", suffix=".txt",
+                                     delete=False) as f:
+        f.write(data)
+    preview = data[:request.get("preview_bytes", 65536)]
+    response["stdout"] = preview.decode("utf-8", errors="ignore")
+    response["stdout_path"] = f.name
+    response["stdout_size"] = len(data)
+
+
+def main() -> int:
+    if len(sys.argv) != 2:
+        print("usage: _worker.py module:attr", file=sys.stderr)
+        return 2
+
+    # 协议使用原始的 fd 0/1；命令直接写 fd 1 的内容转到 stderr，避免破坏协议
+    protocol_in = os.fdopen(os.dup(0), "r", encoding="utf-8")
+    protocol_out = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    os.dup2(2, 1)
+    sys.stdout = io.TextIOWrapper(os.fdopen(1, "wb", closefd=False), encoding="utf-8")
+
+    def reply(message):
+        protocol_out.write(json.dumps(message) + "\n")
+        protocol_out.flush()
+
+    try:
+        target = _load_target(sys.argv[1])
+    except Exception as e:
+        reply({"ready": False, "error": f"{type(e).__name__}: {e}"})
+        return 1
+
+    reply({"ready": True, "pid": os.getpid()})
+
+    for line in protocol_in:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            continue
+
+        if request.get("op") == "ping":
+            reply({"id": request.get("id"), "ok": True})
+            continue
+        if request.get("op") == "describe":
+            try:
+                reply({"id": request.get("id"), "commands": _describe(target)})
+            except Exception as e:
+                reply({"id": request.get("id"), "commands": None, "error": f"{type(e).__name__}: {e}"})
+            continue
+
+        report = None
+        if request.get("progress_interval") is not None:
+            def report(size, rows, request_id=request.get("id")):
+                reply({"id": request_id, "progress": {"bytes": size, "rows": rows}})
+        response = _run(target, request.get("argv", []), report, request.get("progress_interval") or 0.0)
+        _spill(response, request)
+        response["id"] = request.get("id")
+        reply(response)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+结果归档
+每个成功的aqc结果压缩后保存在按内容寻址的本地存储中，以规范化命令和aqc版本为键，
+总大小有上限（最久未使用的先淘汰）。相同的输出只保存一份。
+
+回放模式下工具调用完全由归档回答、不运行aqc：用于预热缓存、离线运行，
+以及延迟确定、不访问网络的回归测试。归档目录可以复制到其他机器上使用
+
+布局：
+  index.sqlite3          键 -> 命令、返回码、stdout/stderr 的内容哈希；内容块的引用计数
+  objects/ab/<sha256>.z  zlib 压缩的内容块
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from .execution import PREVIEW_BYTES, READ_CHUNK, CommandResult, spill_dir
+
+INDEX_FILE = "index.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    argv TEXT NOT NULL,
+    version TEXT NOT NULL,
+    returncode INTEGER NOT NULL,
+    stdout TEXT NOT NULL,
+    stderr TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    raw_size INTEGER NOT NULL,
+    refs INTEGER NOT NULL
+);
+"""
+
+
+def _chunks(result: CommandResult) -> Iterator[bytes]:
+    """转存到文件的stdout的分块"""
+    with open(result.stdout_path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+            yield chunk
+
+
+class ResultArchive:
+    """按内容寻址、压缩、按总大小淘汰的结果归档；可在多个服务器进程间共享"""
+
+    def __init__(self, directory: Path, max_bytes: int = 1024 * 1024 * 1024, level: int = 6):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.level = level
+        (directory / "objects").mkdir(parents=True, exist_ok=True)
+        # 在线程池中使用；同一进程内由锁串行化，不同进程之间由 SQLite 加锁
+        self._db = sqlite3.connect(str(directory / INDEX_FILE), isolation_level=None,
+                                   check_same_thread=False, timeout=30)
+        # WAL：读写互不阻塞，每次提交不必同步整个日志
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.directory / "objects" / digest[:2] / f"{digest}.z"
+
+    def _write_bytes(self, data: bytes) -> Tuple[str, int, int]:
+        """内存中的内容先计算哈希，已存在（例如空的stderr）时不再压缩和写入"""
+        digest = hashlib.sha256(data).hexdigest()
+        try:
+            return digest, self._blob_path(digest).stat().st_size, len(data)
+        except OSError:
+            return self._write_blob(iter([data]))
+
+    def _write_blob(self, chunks: Iterator[bytes]) -> Tuple[str, int, int]:
+        """压缩写入内容块，返回 (sha256, 压缩后大小, 原始大小)；相同内容已存在时不重复保存"""
+        digest = hashlib.sha256()
+        compressor = zlib.compressobj(self.level)
+        raw_size = 0
+        objects = self.directory / "objects"
+        with tempfile.NamedTemporaryFile(dir=objects, prefix="blob-", suffix=".tmp", delete=False) as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                raw_size += len(chunk)
+                f.write(compressor.compress(chunk))
+            f.write(compressor.flush())
+            tmp_path = f.name
+
+        path = self._blob_path(digest.hexdigest())
+        if path.exists():
+            os.unlink(tmp_path)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, path)
+        return digest.hexdigest(), path.stat().st_size, raw_size
+
+    def _read_blob(self, digest: str, sink) -> None:
+        decompressor = zlib.decompressobj()
+        with open(self._blob_path(digest), "rb") as f:
+            for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+                sink(decompressor.decompress(chunk))
+        sink(decompressor.flush())
+
+    def _add_ref(self, digest: str, size: int, raw_size: int) -> None:
+        self._db.execute(
+            "INSERT INTO blobs (hash, size, raw_size, refs) VALUES (?, ?, ?, 1) "
+            "ON CONFLICT(hash) DO UPDATE SET refs = refs + 1",
+            (digest, size, raw_size),
+        )
+
+    def _drop_refs(self, digests: List[str]) -> None:
+        """减少引用计数，删除不再被引用的内容块"""
+        for digest in digests:
+            self._db.execute("UPDATE blobs SET refs = refs - 1 WHERE hash = ?", (digest,))
+        unused = [row[0] for row in self._db.execute("SELECT hash FROM blobs WHERE refs <= 0")]
+        for digest in unused:
+            try:
+                os.unlink(self._blob_path(digest))
+            except OSError:
+                pass
+        self._db.executemany("DELETE FROM blobs WHERE hash = ?", [(digest,) for digest in unused])
+
+    def put(self, key: str, result: CommandResult, version: str = "") -> None:
+        """归档一个成功的结果；同一个键再次写入时替换旧结果"""
+        if not result.ok:
+            return
+        stdout = self._write_blob(_chunks(result)) if result.spilled else self._write_bytes(result.stdout)
+        stderr = self._write_bytes(result.stderr)
+        now = time.time()
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                old = self._db.execute("SELECT stdout, stderr FROM entries WHERE key = ?", (key,)).fetchone()
+                self._add_ref(*stdout)
+                self._add_ref(*stderr)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries "
+                    "(key, argv, version, returncode, stdout, stderr, stored_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, json.dumps(result.argv), version, result.returncode, stdout[0], stderr[0], now, now),
+                )
+                if old is not None:
+                    self._drop_refs(list(old))
+                self._evict()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _evict(self) -> None:
+        """超出总大小上限时淘汰最久未使用的结果"""
+        while self._size() > self.max_bytes:
+            row = self._db.execute(
+                "SELECT key, stdout, stderr FROM entries ORDER BY accessed_at LIMIT 1").fetchone()
+            if row is None:
+                return
+            self._db.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+            self._drop_refs([row[1], row[2]])
+
+    def _size(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def get(self, key: str, spill_threshold: Optional[int] = None) -> Optional[Tuple[CommandResult, float]]:
+        """返回 (结果, 归档年龄秒数)；超过 spill_threshold 的输出解压到临时文件"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT argv, returncode, stdout, stderr, stored_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            raw_size = self._db.execute("SELECT raw_size FROM blobs WHERE hash = ?", (row[2],)).fetchone()
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+
+        argv, returncode, stdout_hash, stderr_hash, stored_at = row
+        result = CommandResult(argv=json.loads(argv), returncode=returncode, source="archive")
+        try:
+            stderr: List[bytes] = []
+            self._read_blob(stderr_hash, stderr.append)
+            result.stderr = b"".join(stderr)
+            if spill_threshold is not None and raw_size and raw_size[0] > spill_threshold:
+                self._spill(stdout_hash, result)
+            else:
+                stdout: List[bytes] = []
+                self._read_blob(stdout_hash, stdout.append)
+                result.stdout = b"".join(stdout)
+        except (OSError, zlib.error):
+            # 内容块丢失或损坏：视为未归档
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return result, time.time() - stored_at
+
+    def _spill(self, digest: str, result: CommandResult) -> None:
+        """解压大输出到临时文件，内存中只保留开头部分"""
+        directory = spill_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        head: List[bytes] = []
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=directory, prefix="output-", suffix=".txt", delete=False) as f:
+            def write(chunk: bytes) -> None:
+                nonlocal size
+                if size < PREVIEW_BYTES:
+                    head.append(chunk[:PREVIEW_BYTES - size])
+                size += len(chunk)
+                f.write(chunk)
+            self._read_blob(digest, write)
+        result.stdout = b"".join(head)
+        result.stdout_path = f.name
+        result.stdout_size = size
+
+    @property
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._size()
+
+    @property
+    def raw_bytes(self) -> int:
+        """归档内容解压后的总大小（去重后）"""
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(raw_size), 0) FROM blobs").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
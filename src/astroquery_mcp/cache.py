@@ -0,0 +1,189 @@
+"""
+查询结果缓存
+内存LRU层按字节数限制，可选磁盘层跨会话保留结果；TTL可按服务（主命令）单独设置
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .execution import CommandResult
+
+
+def parse_ttls(spec: Optional[str]) -> Dict[str, float]:
+    """解析 "simbad=86400,gaia=600" 形式的按服务TTL配置"""
+    ttls: Dict[str, float] = {}
+    for item in (spec or "").split(","):
+        name, sep, value = item.partition("=")
+        if not sep:
+            continue
+        try:
+            ttls[name.strip()] = float(value)
+        except ValueError:
+            continue
+    return ttls
+
+
+def cache_key(argv: List[str], version: str = "") -> str:
+    """由规范化的命令向量（及aqc版本）计算缓存键"""
+    payload = json.dumps({"argv": list(argv), "version": version}, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("result", "stored_at", "expires_at", "size")
+
+    def __init__(self, result: CommandResult, stored_at: float, expires_at: float):
+        self.result = result
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.size = len(result.stdout) + len(result.stderr)
+
+
+class ResultCache:
+    """两级结果缓存：内存LRU（字节上限）+ 可选磁盘层"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, default_ttl: float = 3600.0,
+                 service_ttls: Optional[Dict[str, float]] = None,
+                 disk_dir: Optional[Path] = None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.service_ttls = dict(service_ttls or {})
+        self.disk_dir = disk_dir
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def ttl_for(self, service: str) -> float:
+        return self.service_ttls.get(service, self.default_ttl)
+
+    def get(self, key: str) -> Optional[Tuple[CommandResult, float]]:
+        """返回 (结果, 缓存年龄秒数)；未命中返回 None"""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            self._evict(key)
+            entry = None
+
+        if entry is None:
+            entry = self._load(key, now)
+            if entry is not None and entry.size <= self.max_bytes:
+                self._insert(key, entry)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.result, now - entry.stored_at
+
+    def put(self, key: str, result: CommandResult, service: str, age: float = 0.0) -> None:
+        """缓存成功的结果；TTL为0的服务和转存到文件的大输出不缓存
+
+        age 是结果已有的年龄（例如从归档读出的结果），缓存的有效期相应缩短
+        """
+        ttl = self.ttl_for(service) - age
+        if ttl <= 0 or not result.ok or result.spilled:
+            return
+
+        now = time.time()
+        entry = _Entry(replace(result, notes=[]), now - age, now + ttl)
+        if entry.size <= self.max_bytes:
+            self._insert(key, entry)
+        self._save(key, entry)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _insert(self, key: str, entry: _Entry) -> None:
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        # 超出字节上限时从最久未使用的一端淘汰
+        while self._bytes > self.max_bytes and self._entries:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    # 磁盘格式：一行JSON头，随后是原始stdout和stderr字节
+    def _path(self, key: str) -> Optional[Path]:
+        if self.disk_dir is None:
+            return None
+        return self.disk_dir / key[:2] / key
+
+    def _save(self, key: str, entry: _Entry) -> None:
+        path = self._path(key)
+        if path is None:
+            return
+
+        result = entry.result
+        header = {
+            "argv": result.argv,
+            "returncode": result.returncode,
+            "source": result.source,
+            "stored_at": entry.stored_at,
+            "expires_at": entry.expires_at,
+            "stdout": len(result.stdout),
+            "stderr": len(result.stderr),
+        }
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(json.dumps(header).encode("utf-8") + b"\n")
+                f.write(result.stdout)
+                f.write(result.stderr)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def _load(self, key: str, now: float) -> Optional[_Entry]:
+        path = self._path(key)
+        if path is None:
+            return None
+
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                if header["expires_at"] <= now:
+                    raise ValueError("expired")
+                stdout = f.read(header["stdout"])
+                stderr = f.read(header["stderr"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+
+        result = CommandResult(
+            argv=header["argv"],
+            returncode=header["returncode"],
+            stdout=stdout,
+            stderr=stderr,
+            source=header.get("source", "subprocess"),
+        )
+        return _Entry(result, header["stored_at"], header["expires_at"])
@@ -0,0 +1,150 @@
+"""
+aqc命令目录缓存
+命令/子命令列表只依赖于所安装的aqc，因此按 (路径, mtime, 版本) 缓存在内存和磁盘上，
+避免每次 tools/list 都重新执行 N+1 次 `--help`
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+CATALOG_FILE = "catalog.json"
+# 2: 每个命令增加按子命令的参数模式（schemas）
+CATALOG_SCHEMA = 2
+
+
+def console_script_entry(name: str = "aqc") -> Optional[Any]:
+    """在当前解释器的 console_scripts 中查找入口点（不执行任何子进程）"""
+    try:
+        from importlib import metadata
+    except ImportError:  # pragma: no cover - Python < 3.8
+        return None
+
+    try:
+        eps = metadata.entry_points()
+        if hasattr(eps, "select"):
+            candidates = eps.select(group="console_scripts", name=name)
+        else:  # Python 3.8/3.9 返回字典
+            candidates = [ep for ep in eps.get("console_scripts", []) if ep.name == name]
+        for ep in candidates:
+            return ep
+    except Exception:
+        pass
+    return None
+
+
+def aqc_version(name: str = "aqc") -> str:
+    """获取提供aqc的发行包版本，无法确定时返回 "unknown" """
+    ep = console_script_entry(name)
+    dist = getattr(ep, "dist", None) if ep is not None else None
+    if dist is not None:
+        try:
+            return str(dist.version)
+        except Exception:
+            pass
+
+    try:
+        from importlib import metadata
+        return metadata.version("astroquery-cli")
+    except Exception:
+        return "unknown"
+
+
+class CommandCatalog:
+    """命令目录的两级缓存：内存 + 磁盘 JSON 文件"""
+
+    def __init__(self, cli_path: str, cache_dir: Optional[Path] = None):
+        self.cli_path = cli_path
+        self.cache_dir = cache_dir
+        self._commands: Optional[Dict[str, Dict]] = None
+        self._fingerprint: Optional[Dict[str, Any]] = None
+        self._version: Optional[str] = None
+
+    @property
+    def path(self) -> Optional[Path]:
+        return self.cache_dir / CATALOG_FILE if self.cache_dir else None
+
+    @property
+    def version(self) -> str:
+        # 扫描 entry_points 较慢，每个进程只做一次；升级aqc时 mtime 也会变化
+        if self._version is None:
+            self._version = aqc_version()
+        return self._version
+
+    def fingerprint(self) -> Dict[str, Any]:
+        """计算aqc的指纹；只做 stat 和元数据查询，不启动进程"""
+        try:
+            stat = os.stat(self.cli_path)
+            mtime_ns, size = stat.st_mtime_ns, stat.st_size
+        except OSError:
+            mtime_ns, size = None, None
+
+        return {
+            "schema": CATALOG_SCHEMA,
+            "path": os.path.realpath(self.cli_path),
+            "mtime_ns": mtime_ns,
+            "size": size,
+            "version": self.version,
+        }
+
+    def get(self) -> Optional[Dict[str, Dict]]:
+        """返回缓存的命令目录；指纹不匹配或不存在时返回 None"""
+        fingerprint = self.fingerprint()
+
+        if self._commands is not None and self._fingerprint == fingerprint:
+            return self._commands
+
+        commands = self._load(fingerprint)
+        if commands is not None:
+            self._commands, self._fingerprint = commands, fingerprint
+        return commands
+
+    def put(self, commands: Dict[str, Dict]) -> None:
+        """保存命令目录到内存和磁盘"""
+        fingerprint = self.fingerprint()
+        self._commands, self._fingerprint = commands, fingerprint
+
+        path = self.path
+        if path is None:
+            return
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": fingerprint, "commands": commands}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Cannot write command catalog cache: {e}", file=sys.stderr)
+
+    def invalidate(self) -> None:
+        """显式失效：清空内存并删除磁盘缓存"""
+        self._commands = None
+        self._fingerprint = None
+        self._version = None
+
+        path = self.path
+        if path is not None:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def _load(self, fingerprint: Dict[str, Any]) -> Optional[Dict[str, Dict]]:
+        path = self.path
+        if path is None:
+            return None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(data, dict) or data.get("fingerprint") != fingerprint:
+            return None
+
+        commands = data.get("commands")
+        return commands if isinstance(commands, dict) else None
@@ -0,0 +1,59 @@
+"""
+运行时配置
+所有可调参数都通过环境变量提供，便于在MCP客户端配置的 "env" 中设置
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+ENV_PREFIX = "ASTROQUERY_MCP_"
+
+
+def env_str(name: str, default: Optional[str] = None) -> Optional[str]:
+    """读取字符串配置"""
+    return os.environ.get(ENV_PREFIX + name, default)
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    """读取布尔配置（1/true/yes/on 视为真）"""
+    value = os.environ.get(ENV_PREFIX + name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    """读取整数配置，无法解析时使用默认值"""
+    try:
+        return int(os.environ[ENV_PREFIX + name])
+    except (KeyError, ValueError):
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    """读取浮点配置，无法解析时使用默认值"""
+    try:
+        return float(os.environ[ENV_PREFIX + name])
+    except (KeyError, ValueError):
+        return default
+
+
+def env_mapping(name: str) -> Dict[str, str]:
+    """读取 "simbad=2,vizier=4" 形式的按服务配置"""
+    mapping: Dict[str, str] = {}
+    for item in (env_str(name) or "").split(","):
+        key, sep, value = item.partition("=")
+        if sep and key.strip():
+            mapping[key.strip()] = value.strip()
+    return mapping
+
+
+def cache_dir() -> Optional[Path]:
+    """返回持久化缓存目录；ASTROQUERY_MCP_CACHE_DIR 设为空字符串时禁用磁盘缓存"""
+    configured = env_str("CACHE_DIR")
+    if configured is not None:
+        return Path(configured).expanduser() if configured else None
+
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "astroquery-mcp"
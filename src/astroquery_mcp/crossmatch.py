@@ -0,0 +1,195 @@
+"""
+位置交叉匹配
+在服务器端把用户源表与查询返回的星表按位置匹配，只返回匹配对和角距；
+安装了 numpy/scipy 时使用单位向量上的KD树，否则使用同样基于单位向量的网格哈希
+"""
+
+import importlib.util
+import math
+import re
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .tables import Table
+
+ARCSEC = math.pi / (180 * 3600)
+
+# 常见的赤经/赤纬列名（小写比较）
+RA_COLUMNS = ("ra", "ra_icrs", "raj2000", "_raj2000", "ra_deg", "ra_d", "radeg", "ra2000", "alpha_j2000")
+DEC_COLUMNS = ("dec", "de", "dec_icrs", "de_icrs", "dej2000", "_dej2000", "dec_deg", "dec_d",
+               "decdeg", "dec2000", "delta_j2000")
+
+_SEXAGESIMAL_RE = re.compile(r"[\s:hdms°'\"]+")
+
+Match = Tuple[int, int, float]
+
+
+def has_kdtree() -> bool:
+    """是否可以使用 scipy 的KD树"""
+    return (importlib.util.find_spec("numpy") is not None
+            and importlib.util.find_spec("scipy") is not None)
+
+
+def parse_angle(value: Any, hours: bool = False) -> float:
+    """把十进制度数或六十进制文本（"00 42 44.3"、"+41:16:09"）转为度"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+
+    parts = [p for p in _SEXAGESIMAL_RE.split(text) if p]
+    if not parts or len(parts) > 3:
+        raise ValueError(f"Invalid angle: {value!r}")
+    sign = -1.0 if text.startswith("-") else 1.0
+    degrees = 0.0
+    for index, part in enumerate(parts):
+        degrees += abs(float(part)) / (60 ** index)
+    return sign * degrees * (15.0 if hours else 1.0)
+
+
+def find_column(table: Table, candidates: Sequence[str], requested: Optional[str] = None) -> str:
+    """按名称查找坐标列（显式指定优先，其次常见列名，不区分大小写）"""
+    if requested:
+        if requested not in table.columns:
+            raise ValueError(f"Unknown column: {requested}")
+        return requested
+    lowered = {name.lower(): name for name in table.names}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    raise ValueError(f"No coordinate column found (tried {', '.join(candidates)}); "
+                     f"available: {', '.join(table.names)}")
+
+
+def coordinates(table: Table, ra_column: Optional[str] = None,
+                dec_column: Optional[str] = None) -> Tuple[array, array]:
+    """从表中取出以度为单位的赤经、赤纬列（缺失值为 NaN）"""
+    ra_name = find_column(table, RA_COLUMNS, ra_column)
+    dec_name = find_column(table, DEC_COLUMNS, dec_column)
+    return _degrees(table, ra_name, hours=True), _degrees(table, dec_name, hours=False)
+
+
+def _degrees(table: Table, name: str, hours: bool) -> array:
+    column = table.columns[name]
+    if table.types[name] in ("int", "float"):
+        return array("d", column)
+    # 文本列按六十进制解析；赤经的六十进制表示以小时为单位
+    values = array("d")
+    for value in column:
+        try:
+            values.append(math.nan if value is None else parse_angle(value, hours=hours))
+        except ValueError:
+            values.append(math.nan)
+    return values
+
+
+def _unit_vectors(ra: Sequence[float], dec: Sequence[float]) -> List[Optional[Tuple[float, float, float]]]:
+    vectors: List[Optional[Tuple[float, float, float]]] = []
+    for a, d in zip(ra, dec):
+        if a != a or d != d:
+            vectors.append(None)
+            continue
+        a, d = math.radians(a), math.radians(d)
+        cos_d = math.cos(d)
+        vectors.append((cos_d * math.cos(a), cos_d * math.sin(a), math.sin(d)))
+    return vectors
+
+
+def _chord(radius_arcsec: float) -> float:
+    return 2 * math.sin(min(radius_arcsec * ARCSEC, math.pi) / 2)
+
+
+def _separation(chord: float) -> float:
+    """弦长 → 角距（角秒）"""
+    return 2 * math.asin(min(1.0, chord / 2)) / ARCSEC
+
+
+def _match_grid(sources, catalog, radius_arcsec: float, nearest: bool) -> List[Match]:
+    """纯Python实现：以弦长为边长的三维网格，每个源只检查相邻的27个格子"""
+    chord = _chord(radius_arcsec)
+    cell = max(chord, 1e-12)
+    grid: Dict[Tuple[int, int, int], List[int]] = {}
+    for j, vector in enumerate(catalog):
+        if vector is not None:
+            key = (int(math.floor(vector[0] / cell)), int(math.floor(vector[1] / cell)),
+                   int(math.floor(vector[2] / cell)))
+            grid.setdefault(key, []).append(j)
+
+    limit = chord * chord
+    matches: List[Match] = []
+    for i, vector in enumerate(sources):
+        if vector is None:
+            continue
+        x, y, z = vector
+        cx, cy, cz = int(math.floor(x / cell)), int(math.floor(y / cell)), int(math.floor(z / cell))
+        found = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for j in grid.get((cx + dx, cy + dy, cz + dz), ()):
+                        ox, oy, oz = catalog[j]
+                        distance = (x - ox) ** 2 + (y - oy) ** 2 + (z - oz) ** 2
+                        if distance <= limit:
+                            found.append((distance, j))
+        if not found:
+            continue
+        found.sort()
+        for distance, j in (found[:1] if nearest else found):
+            matches.append((i, j, _separation(math.sqrt(distance))))
+    return matches
+
+
+def _match_kdtree(source_ra, source_dec, catalog_ra, catalog_dec,
+                  radius_arcsec: float, nearest: bool) -> List[Match]:
+    """numpy/scipy 实现：单位向量上的KD树"""
+    import numpy as np
+    from scipy.spatial import cKDTree
+
+    def vectors(ra, dec):
+        ra = np.radians(np.frombuffer(ra, dtype=np.float64) if isinstance(ra, array) else np.asarray(ra, float))
+        dec = np.radians(np.frombuffer(dec, dtype=np.float64) if isinstance(dec, array) else np.asarray(dec, float))
+        xyz = np.column_stack((np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)))
+        valid = np.flatnonzero(np.isfinite(xyz).all(axis=1))
+        return xyz[valid], valid
+
+    source_xyz, source_index = vectors(source_ra, source_dec)
+    catalog_xyz, catalog_index = vectors(catalog_ra, catalog_dec)
+    if len(source_xyz) == 0 or len(catalog_xyz) == 0:
+        return []
+
+    chord = _chord(radius_arcsec)
+    tree = cKDTree(catalog_xyz)
+    if nearest:
+        distances, found = tree.query(source_xyz, k=1, distance_upper_bound=chord)
+        hit = np.flatnonzero(np.isfinite(distances))
+        separations = 2 * np.arcsin(np.minimum(1.0, distances[hit] / 2)) / ARCSEC
+        return [(int(source_index[i]), int(catalog_index[found[i]]), float(s))
+                for i, s in zip(hit, separations)]
+
+    matches: List[Match] = []
+    for i, neighbours in enumerate(tree.query_ball_point(source_xyz, r=chord)):
+        if not neighbours:
+            continue
+        distances = np.linalg.norm(catalog_xyz[neighbours] - source_xyz[i], axis=1)
+        separations = 2 * np.arcsin(np.minimum(1.0, distances / 2)) / ARCSEC
+        for j, s in sorted(zip(neighbours, separations), key=lambda pair: pair[1]):
+            matches.append((int(source_index[i]), int(catalog_index[j]), float(s)))
+    return matches
+
+
+def crossmatch(source_ra: Sequence[float], source_dec: Sequence[float],
+               catalog_ra: Sequence[float], catalog_dec: Sequence[float],
+               radius_arcsec: float, nearest: bool = True,
+               use_kdtree: Optional[bool] = None) -> List[Match]:
+    """位置匹配，返回 (源序号, 星表行号, 角距角秒)；nearest 为真时每个源只保留最近的一个"""
+    if radius_arcsec <= 0:
+        raise ValueError("radius must be positive")
+    if use_kdtree is None:
+        use_kdtree = has_kdtree()
+    if use_kdtree:
+        return _match_kdtree(source_ra, source_dec, catalog_ra, catalog_dec, radius_arcsec, nearest)
+    return _match_grid(_unit_vectors(source_ra, source_dec), _unit_vectors(catalog_ra, catalog_dec),
+                       radius_arcsec, nearest)
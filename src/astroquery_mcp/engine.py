@@ -0,0 +1,220 @@
+"""
+进程内astroquery执行引擎
+对最常用的工具（SIMBAD对象查询、VizieR/Gaia锥形检索）直接在线程池中调用astroquery，
+省去进程创建和stdout文本往返；引擎不支持的调用仍走aqc路径
+"""
+
+import asyncio
+import importlib.util
+import io
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .execution import CommandResult, Invocation
+
+# 没有单位的半径按角分处理
+DEFAULT_RADIUS_UNIT = "arcmin"
+# 没有给出行数上限时 astroquery（以及aqc）默认返回的行数
+DEFAULT_ROW_LIMIT = 50
+
+# 所有处理函数都接受的选项（由 _render 处理）
+COMMON_OPTIONS = frozenset({"output-format", "format"})
+
+Prepared = Callable[[], Any]
+Handler = Callable[[Invocation], Prepared]
+
+
+def _normalize(key: str) -> str:
+    """选项名规范化：去掉 -- 前缀，下划线换成连字符"""
+    return key.lstrip("-").replace("_", "-")
+
+
+def _option(options: Dict[str, str], *names: str) -> Optional[str]:
+    """按多个候选名读取选项（兼容带或不带 -- 前缀、连字符/下划线）"""
+    for key, value in options.items():
+        if _normalize(key) in names:
+            return value
+    return None
+
+
+def _accepts(*options: str, arguments: bool = False) -> Callable[[Handler], Handler]:
+    """声明处理函数支持的选项以及是否接受位置参数；带有其他选项或参数的调用交给aqc"""
+    def declare(handler: Handler) -> Handler:
+        handler.options = frozenset(options) | COMMON_OPTIONS
+        handler.arguments = arguments
+        return handler
+    return declare
+
+
+def _target_name(invocation: Invocation) -> str:
+    name = _option(invocation.options or {}, "object", "name", "target")
+    if name is None and invocation.arguments:
+        name = " ".join(invocation.arguments)
+    if not name:
+        raise ValueError("no object name")
+    return name
+
+
+def _cone(invocation: Invocation) -> Tuple[Any, Any]:
+    """从选项解析锥形检索的中心和半径"""
+    from astropy import units as u
+    from astropy.coordinates import SkyCoord
+
+    options = invocation.options or {}
+    ra = _option(options, "ra")
+    dec = _option(options, "dec")
+    radius = _option(options, "radius", "r")
+    if ra is None or dec is None or radius is None:
+        raise ValueError("cone search needs ra, dec and radius")
+
+    try:
+        center = SkyCoord(float(ra), float(dec), unit="deg")
+    except ValueError:
+        center = SkyCoord(ra, dec, unit=(u.hourangle, u.deg))
+
+    try:
+        radius_q = float(radius) * u.Unit(DEFAULT_RADIUS_UNIT)
+    except ValueError:
+        radius_q = u.Quantity(radius)
+    return center, radius_q
+
+
+@_accepts("object", "name", "target", arguments=True)
+def _simbad_object(invocation: Invocation) -> Prepared:
+    name = _target_name(invocation)
+
+    def call():
+        from astroquery.simbad import Simbad
+        return Simbad.query_object(name)
+    return call
+
+
+@_accepts("ra", "dec", "radius", "r", "catalog", "catalogue", "row-limit", "max-rows", "limit")
+def _vizier_cone(invocation: Invocation) -> Prepared:
+    center, radius = _cone(invocation)
+    options = invocation.options or {}
+    catalog = _option(options, "catalog", "catalogue")
+    row_limit = int(_option(options, "row-limit", "max-rows", "limit") or DEFAULT_ROW_LIMIT)
+
+    def call():
+        from astroquery.vizier import Vizier
+        vizier = Vizier(catalog=catalog, row_limit=row_limit)
+        return vizier.query_region(center, radius=radius)
+    return call
+
+
+@_accepts("ra", "dec", "radius", "r")
+def _gaia_cone(invocation: Invocation) -> Prepared:
+    center, radius = _cone(invocation)
+
+    def call():
+        from astroquery.gaia import Gaia
+        return Gaia.cone_search_async(center, radius=radius).get_results()
+    return call
+
+
+# 输出格式选项 -> astropy 写出格式
+WRITE_FORMATS = {"csv": "ascii.csv", "ecsv": "ascii.ecsv", "votable": "votable"}
+
+
+def _render(result: Any, output_format: Optional[str] = None) -> str:
+    """把astroquery返回的 Table/TableList 渲染为文本；指定机器可读格式时写出第一张表"""
+    if result is None:
+        return "No results\n"
+
+    tables = result.values() if hasattr(result, "values") and hasattr(result, "keys") else [result]
+    write_format = WRITE_FORMATS.get((output_format or "").lower())
+    if write_format is not None:
+        for table in tables:
+            if hasattr(table, "write"):
+                if write_format == "votable":
+                    buffer = io.BytesIO()
+                    table.write(buffer, format=write_format)
+                    return buffer.getvalue().decode("utf-8")
+                text_buffer = io.StringIO()
+                table.write(text_buffer, format=write_format)
+                return text_buffer.getvalue()
+
+    blocks = []
+    for table in tables:
+        if hasattr(table, "pformat"):
+            header = f"{table.meta.get('name', '')}\n" if getattr(table, "meta", None) else ""
+            blocks.append(header + "\n".join(table.pformat(max_lines=-1, max_width=-1)))
+        else:
+            blocks.append(str(table))
+    return "\n\n".join(blocks) + "\n"
+
+
+class InProcessEngine:
+    """在服务器进程内执行热点查询的引擎"""
+
+    # (命令, 子命令) -> 准备函数；准备函数抛出 ValueError 表示参数无法映射，交给aqc处理
+    handlers: Dict[Tuple[str, str], Handler] = {
+        ("simbad", "query"): _simbad_object,
+        ("simbad", "object"): _simbad_object,
+        ("simbad", "query-object"): _simbad_object,
+        ("vizier", "cone"): _vizier_cone,
+        ("vizier", "region"): _vizier_cone,
+        ("vizier", "query-region"): _vizier_cone,
+        ("gaia", "cone"): _gaia_cone,
+        ("gaia", "cone-search"): _gaia_cone,
+        ("gaia", "region"): _gaia_cone,
+    }
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="astroquery-engine")
+
+    @staticmethod
+    def available() -> bool:
+        """服务器环境中是否安装了astroquery"""
+        return importlib.util.find_spec("astroquery") is not None
+
+    def supports(self, invocation: Invocation) -> bool:
+        """调用是否只使用了对应处理函数声明支持的选项和参数"""
+        if not invocation.structured:
+            return False
+        handler = self.handlers.get((invocation.command, invocation.subcommand))
+        if handler is None:
+            return False
+        if invocation.arguments and not getattr(handler, "arguments", False):
+            return False
+        accepted = getattr(handler, "options", COMMON_OPTIONS)
+        return all(_normalize(key) in accepted for key in invocation.options or {})
+
+    async def run(self, invocation: Invocation) -> Optional[CommandResult]:
+        """执行调用；引擎不支持时返回 None，超时抛出 asyncio.TimeoutError"""
+        if not self.supports(invocation):
+            return None
+
+        handler = self.handlers[(invocation.command, invocation.subcommand)]
+        try:
+            call = handler(invocation)
+        except (ValueError, TypeError, ImportError):
+            return None
+
+        output_format = _option(invocation.options or {}, "output-format", "format")
+
+        def execute() -> Tuple[int, str, str]:
+            try:
+                return 0, _render(call(), output_format), ""
+            except Exception:
+                return 1, "", traceback.format_exc()
+
+        loop = asyncio.get_event_loop()
+        # 线程无法被强制终止；超时后结果被丢弃
+        returncode, stdout, stderr = await asyncio.wait_for(
+            loop.run_in_executor(self._executor, execute), timeout=invocation.timeout
+        )
+
+        return CommandResult(
+            argv=list(invocation.argv),
+            returncode=returncode,
+            stdout=stdout.encode("utf-8"),
+            stderr=stderr.encode("utf-8"),
+            source="engine",
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
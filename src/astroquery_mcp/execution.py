@@ -0,0 +1,342 @@
+"""
+aqc命令执行
+定义统一的执行结果，以及一次性子进程的执行路径；
+stdout按块增量读取，超过阈值的输出写入临时文件而不是保存在内存中。
+每次执行在独立的进程组中运行，超时或取消时整个进程组先 SIGTERM 后 SIGKILL
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+READ_CHUNK = 64 * 1024
+# 输出被转存到文件时，内存中保留的开头部分
+PREVIEW_BYTES = 64 * 1024
+
+# 进度回调：(已接收字节数, 已接收行数)
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+# SIGTERM 之后等待进程退出的时间，超时后 SIGKILL
+KILL_GRACE = 2.0
+
+_POSIX = os.name == "posix"
+
+
+def process_group_options() -> Dict[str, Any]:
+    """让子进程成为新进程组组长的 create_subprocess_exec 参数"""
+    if _POSIX:
+        return {"start_new_session": True}
+    return {"creationflags": getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)}
+
+
+def signal_group(process, sig: int) -> None:
+    """向进程所在的进程组发送信号；非POSIX平台只作用于进程本身"""
+    pid = getattr(process, "pid", None)
+    try:
+        # pid 为空或不大于0时 killpg 会作用于调用者自身的进程组，必须避免
+        if _POSIX and pid and pid > 0 and pid != os.getpgrp():
+            os.killpg(pid, sig)
+        elif sig == getattr(signal, "SIGKILL", None):
+            process.kill()
+        else:
+            process.terminate()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def group_alive(pgid: int) -> bool:
+    """进程组中是否还有存活的进程"""
+    if not _POSIX or pgid <= 0:
+        return False
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+async def terminate_process(process, grace: float = KILL_GRACE) -> None:
+    """终止整个进程组：先 SIGTERM，宽限期后仍存活则 SIGKILL，并回收子进程"""
+    if process.returncode is None:
+        signal_group(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), timeout=grace)
+        except asyncio.TimeoutError:
+            pass
+    # 组长已退出时，组内可能还有孙进程
+    signal_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+    if process.returncode is None:
+        await process.wait()
+
+
+class Reaper:
+    """跟踪每次执行的进程组；执行结束后仍有存活成员的进程组视为泄漏，报告并清理"""
+
+    def __init__(self):
+        self._finished: Dict[int, List[str]] = {}
+        self._active: Dict[int, List[str]] = {}
+        # 因超时或取消由本进程终止的进程组；SIGKILL后成员可能短暂残留为僵尸进程，不算泄漏
+        self._killing: Set[int] = set()
+        self.leaked = 0
+        self.killed = 0
+
+    def register(self, process, argv: List[str]) -> None:
+        pid = getattr(process, "pid", None)
+        if _POSIX and pid and pid > 0:
+            self._active[pid] = list(argv)
+
+    def finished(self, process) -> None:
+        pid = getattr(process, "pid", None)
+        argv = self._active.pop(pid, None)
+        if pid in self._killing:
+            self._killing.discard(pid)
+            return
+        if argv is not None:
+            self._finished[pid] = argv
+            self.sweep()
+
+    def record_kill(self, process) -> None:
+        """记录一次因超时或取消而终止的执行；整个进程组随后被终止，结束时不再检查泄漏"""
+        pid = getattr(process, "pid", None)
+        if pid in self._active:
+            self._killing.add(pid)
+        if process.returncode is None:
+            self.killed += 1
+
+    def sweep(self) -> int:
+        """清理已结束执行遗留的进程；返回本次发现的泄漏进程组数"""
+        leaked = 0
+        for pgid, argv in list(self._finished.items()):
+            del self._finished[pgid]
+            if group_alive(pgid):
+                leaked += 1
+                print(f"Reaped leaked child processes of aqc {' '.join(argv)} "
+                      f"(process group {pgid})", file=sys.stderr)
+                try:
+                    os.killpg(pgid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    pass
+        self.leaked += leaked
+        return leaked
+
+    def kill_all(self) -> None:
+        """关闭服务器时终止所有仍在运行的执行"""
+        for pgid in list(self._active):
+            try:
+                os.killpg(pgid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        self._active.clear()
+        self.sweep()
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+
+def spill_dir() -> Path:
+    """大输出的临时文件目录"""
+    return Path(tempfile.gettempdir()) / "astroquery-mcp"
+
+
+def cleanup_spill_dir(max_age: float = 24 * 3600) -> None:
+    """删除过期的转存文件"""
+    cutoff = time.time() - max_age
+    try:
+        entries = list(spill_dir().iterdir())
+    except OSError:
+        return
+    for path in entries:
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            continue
+
+
+@dataclass
+class Invocation:
+    """一次aqc调用的规范化描述；通用命令只有 argv，特定命令同时保留结构化参数"""
+    argv: List[str]
+    # None 表示不设时限（时限由调用方施加）
+    timeout: Optional[float] = 30
+    subcommand: str = ""
+    arguments: Optional[List[str]] = None
+    options: Optional[Dict[str, str]] = None
+    # 为 False 时绕过结果缓存
+    use_cache: bool = True
+    progress: Optional[ProgressCallback] = None
+
+    @property
+    def command(self) -> str:
+        """主命令（服务名），例如 simbad"""
+        return self.argv[0] if self.argv else ""
+
+    @property
+    def structured(self) -> bool:
+        return self.options is not None
+
+
+@dataclass
+class CommandResult:
+    """一次aqc命令执行的结果"""
+    argv: List[str]
+    returncode: int
+    stdout: bytes = b""
+    stderr: bytes = b""
+    # 结果来源：subprocess / worker / ...
+    source: str = "subprocess"
+    notes: List[str] = field(default_factory=list)
+    # 输出过大时完整stdout所在的文件；此时 stdout 只包含开头部分
+    stdout_path: Optional[str] = None
+    stdout_size: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+    @property
+    def spilled(self) -> bool:
+        return self.stdout_path is not None
+
+    @property
+    def output_size(self) -> int:
+        return self.stdout_size if self.spilled else len(self.stdout)
+
+    def read_stdout(self) -> bytes:
+        """读取完整stdout（包括转存到文件的部分）"""
+        if self.stdout_path is None:
+            return self.stdout
+        with open(self.stdout_path, "rb") as f:
+            return f.read()
+
+
+class StdoutSink:
+    """累积stdout；超过阈值后转存到临时文件，内存中只保留开头部分
+
+    指定 path 时全部输出直接写入该文件并随时刷新，可以在执行过程中读取（后台作业使用）；
+    该文件属于调用方，执行失败时也不删除
+    """
+
+    def __init__(self, spill_threshold: Optional[int] = None, path: Optional[str] = None):
+        self.spill_threshold = spill_threshold
+        self.size = 0
+        self.rows = 0
+        self._chunks: List[bytes] = []
+        self._file = None
+        self.path: Optional[str] = path
+        self._owned = path is None
+        if path is not None:
+            self._file = open(path, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        self.rows += chunk.count(b"\n")
+
+        if self._file is not None:
+            self._file.write(chunk)
+            if not self._owned:
+                self._file.flush()
+            if self.size - len(chunk) < PREVIEW_BYTES and not self._owned:
+                self._chunks.append(chunk[:PREVIEW_BYTES - (self.size - len(chunk))])
+            return
+
+        self._chunks.append(chunk)
+        if self.spill_threshold is not None and self.size > self.spill_threshold:
+            directory = spill_dir()
+            directory.mkdir(parents=True, exist_ok=True)
+            self._file = tempfile.NamedTemporaryFile(
+                dir=directory, prefix="output-", suffix=".txt", delete=False
+            )
+            self.path = self._file.name
+            for buffered in self._chunks:
+                self._file.write(buffered)
+            head = b"".join(self._chunks)[:PREVIEW_BYTES]
+            self._chunks = [head]
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+    def discard(self) -> None:
+        self.close()
+        if self.path is not None and self._owned:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def apply(self, result: "CommandResult") -> "CommandResult":
+        """把收集到的stdout写入结果"""
+        self.close()
+        result.stdout = b"".join(self._chunks)
+        if self.path is not None:
+            result.stdout_path = self.path
+            result.stdout_size = self.size
+        return result
+
+
+async def run_subprocess(cli_path: str, argv: List[str], timeout: Optional[float],
+                         progress: Optional[ProgressCallback] = None,
+                         spill_threshold: Optional[int] = None,
+                         reaper: Optional[Reaper] = None,
+                         stdout_path: Optional[str] = None) -> CommandResult:
+    """启动一个新的aqc进程执行命令，增量读取输出；超时抛出 asyncio.TimeoutError
+
+    超时或被取消时终止整个进程组（包括aqc启动的子进程）；
+    指定 stdout_path 时stdout边读边写入该文件（已写入的部分在失败时保留）
+    """
+    process = await asyncio.create_subprocess_exec(
+        cli_path, *argv,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=os.environ, # 明确传递环境变量
+        **process_group_options()
+    )
+    if reaper is not None:
+        reaper.register(process, argv)
+
+    sink = StdoutSink(spill_threshold, path=stdout_path)
+
+    async def read_stdout() -> None:
+        while True:
+            chunk = await process.stdout.read(READ_CHUNK)
+            if not chunk:
+                break
+            sink.write(chunk)
+            if progress is not None:
+                await progress(sink.size, sink.rows)
+
+    async def collect() -> bytes:
+        # stdout与stderr同时读取，避免任一管道写满导致子进程阻塞
+        _, stderr = await asyncio.gather(read_stdout(), process.stderr.read())
+        await process.wait()
+        return stderr
+
+    try:
+        stderr = await asyncio.wait_for(collect(), timeout=timeout)
+    except BaseException:
+        sink.discard()
+        if reaper is not None:
+            reaper.record_kill(process)
+        # 即使调用方再次被取消，也要完成进程清理
+        await asyncio.shield(terminate_process(process))
+        raise
+    finally:
+        if reaper is not None:
+            reaper.finished(process)
+
+    return sink.apply(CommandResult(
+        argv=list(argv),
+        returncode=process.returncode,
+        stderr=stderr or b"",
+    ))
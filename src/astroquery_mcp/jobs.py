@@ -0,0 +1,324 @@
+"""
+后台作业
+耗时很长的查询（Gaia ADQL、MAST 检索等）作为作业提交：立即返回作业ID，
+之后轮询状态、读取已经产生的输出或取消，MCP请求不必一直等到查询结束
+
+作业记录保存在 SQLite 中，stdout 边执行边写入每个作业的输出文件，
+客户端重新连接（或在HTTP模式下由其他会话）仍可读取；同时运行的作业数有上限。
+每个作业记录所属服务器进程（pid 和主机名）；所属进程已退出而未结束的作业在下次启动时标记为失败，
+其他仍在运行的服务器进程的作业不受影响，也不能从本进程取消
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .execution import CommandResult
+
+STORE_FILE = "jobs.sqlite3"
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+FINISHED_STATES = frozenset({SUCCEEDED, FAILED, CANCELLED, TIMED_OUT})
+
+# 保存的stderr末尾长度
+STDERR_BYTES = 16 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    argv TEXT NOT NULL,
+    state TEXT NOT NULL,
+    timeout REAL NOT NULL,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    returncode INTEGER,
+    stderr TEXT,
+    error TEXT,
+    owner_pid INTEGER,
+    owner_host TEXT
+)
+"""
+
+_COLUMNS = ("id", "argv", "state", "timeout", "submitted", "started", "finished", "returncode", "stderr", "error",
+            "owner_pid", "owner_host")
+
+# 较早版本创建的作业表没有的列
+_ADDED_COLUMNS = {"owner_pid": "INTEGER", "owner_host": "TEXT"}
+
+# 作业执行函数：(argv, 超时, 输出文件路径) -> 执行结果
+JobRunner = Callable[[List[str], float, str], Awaitable[CommandResult]]
+
+
+class JobError(Exception):
+    """无法对作业执行请求的操作"""
+
+
+def _process_alive(pid: int) -> bool:
+    """本机上 pid 对应的进程是否存在；非POSIX平台无法安全探测，只认本进程"""
+    if pid == os.getpid():
+        return True
+    if os.name != "posix" or pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@dataclass
+class Job:
+    """一个作业的记录"""
+    id: str
+    argv: List[str]
+    state: str
+    timeout: float
+    submitted: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    returncode: Optional[int] = None
+    stderr: Optional[str] = None
+    error: Optional[str] = None
+    # 运行该作业的服务器进程
+    owner_pid: Optional[int] = None
+    owner_host: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def elapsed(self, now: Optional[float] = None) -> Optional[float]:
+        """已运行时间（秒）；尚未开始时为 None"""
+        if self.started is None:
+            return None
+        return (self.finished or now or time.time()) - self.started
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = self.elapsed()
+        return {
+            "id": self.id,
+            "command": " ".join(self.argv),
+            "state": self.state,
+            "submitted": round(self.submitted, 3),
+            "started": None if self.started is None else round(self.started, 3),
+            "finished": None if self.finished is None else round(self.finished, 3),
+            "elapsed_seconds": None if elapsed is None else round(elapsed, 3),
+            "returncode": self.returncode,
+            "error": self.error,
+            "owner": None if self.owner_pid is None else f"{self.owner_host}:{self.owner_pid}",
+        }
+
+
+class JobStore:
+    """SQLite 中的作业记录；directory 为 None 时只保存在内存中"""
+
+    def __init__(self, directory: Optional[Path]):
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+            path = str(directory / STORE_FILE)
+        else:
+            path = ":memory:"
+        # 自动提交；每次更新都很小，不需要显式事务
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute(_SCHEMA)
+        existing = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for column, kind in _ADDED_COLUMNS.items():
+            if column not in existing:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    def _job(self, row: Tuple) -> Job:
+        values = dict(zip(_COLUMNS, row))
+        values["argv"] = json.loads(values["argv"])
+        return Job(**values)
+
+    def insert(self, job: Job) -> None:
+        values = [getattr(job, column) for column in _COLUMNS]
+        values[1] = json.dumps(job.argv)
+        self._db.execute(f"INSERT INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                         values)
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._db.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else self._job(row)
+
+    def list(self, limit: int = 50) -> List[Job]:
+        """最近提交的作业，新的在前"""
+        rows = self._db.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM jobs ORDER BY submitted DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def expired(self, cutoff: float) -> List[str]:
+        """在 cutoff 之前结束的作业"""
+        rows = self._db.execute("SELECT id FROM jobs WHERE finished IS NOT NULL AND finished < ?", (cutoff,))
+        return [row[0] for row in rows]
+
+    def delete(self, job_ids: List[str]) -> None:
+        self._db.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in job_ids])
+
+    def abandon(self, reason: str, host: str) -> int:
+        """把所属进程已退出的未结束作业标记为失败，返回数量
+
+        只能探测本机（host）上的进程；其他主机的作业保持不变，没有所属进程记录的旧作业视为已退出
+        """
+        rows = self._db.execute(
+            "SELECT id, owner_pid, owner_host FROM jobs WHERE state IN (?, ?)", (QUEUED, RUNNING)
+        ).fetchall()
+        dead = [job_id for job_id, pid, owner_host in rows
+                if pid is None or (owner_host == host and not _process_alive(pid))]
+        finished = time.time()
+        self._db.executemany(
+            "UPDATE jobs SET state = ?, finished = ?, error = ? WHERE id = ? AND state IN (?, ?)",
+            [(FAILED, finished, reason, job_id, QUEUED, RUNNING) for job_id in dead],
+        )
+        return len(dead)
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class JobManager:
+    """提交、运行、查询和取消作业；同时运行的作业数不超过 concurrency"""
+
+    def __init__(self, store: JobStore, output_dir: Path, runner: JobRunner,
+                 concurrency: int = 2, ttl: float = 7 * 24 * 3600):
+        self.store = store
+        self.output_dir = output_dir
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._runner = runner
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.ttl = ttl
+        self._tasks: Dict[str, "asyncio.Task[None]"] = {}
+        self.running = 0
+        self.pid = os.getpid()
+        self.host = socket.gethostname()
+        self.abandoned = store.abandon("Server stopped before the job finished", self.host)
+
+    def output_path(self, job_id: str) -> Path:
+        return self.output_dir / f"{job_id}.out"
+
+    @property
+    def queued(self) -> int:
+        return len(self._tasks) - self.running
+
+    def submit(self, argv: List[str], timeout: float) -> Job:
+        """记录并在后台启动作业，立即返回"""
+        self.prune()
+        job = Job(id=uuid.uuid4().hex[:16], argv=list(argv), state=QUEUED,
+                  timeout=timeout, submitted=time.time(), owner_pid=self.pid, owner_host=self.host)
+        self.store.insert(job)
+        self.output_path(job.id).touch()
+        self._tasks[job.id] = asyncio.ensure_future(self._run(job))
+        return job
+
+    async def _run(self, job: Job) -> None:
+        fields: Dict[str, Any]
+        try:
+            async with self._semaphore:
+                self.running += 1
+                try:
+                    self.store.update(job.id, state=RUNNING, started=time.time())
+                    result = await self._runner(job.argv, job.timeout, str(self.output_path(job.id)))
+                finally:
+                    self.running -= 1
+            fields = {
+                "state": SUCCEEDED if result.ok else FAILED,
+                "returncode": result.returncode,
+                "stderr": result.stderr[-STDERR_BYTES:].decode("utf-8", errors="replace"),
+            }
+        except asyncio.CancelledError:
+            fields = {"state": CANCELLED}
+        except asyncio.TimeoutError:
+            fields = {"state": TIMED_OUT, "error": f"Timed out after {job.timeout} seconds"}
+        except Exception as e:
+            fields = {"state": FAILED, "error": str(e)}
+        finally:
+            self._tasks.pop(job.id, None)
+        self.store.update(job.id, finished=time.time(), **fields)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    def list(self, limit: int = 50) -> List[Job]:
+        return self.store.list(limit)
+
+    def output_size(self, job_id: str) -> int:
+        try:
+            return self.output_path(job_id).stat().st_size
+        except OSError:
+            return 0
+
+    def read_output(self, job: Job, offset: int = 0, max_bytes: int = 64 * 1024) -> Tuple[str, int]:
+        """从字节偏移 offset 开始读取输出，返回 (文本, 下一次读取的偏移)
+
+        作业仍在运行时只返回到最后一个完整行，下一次从未读的行首继续
+        """
+        offset = max(0, offset)
+        try:
+            with open(self.output_path(job.id), "rb") as f:
+                f.seek(offset)
+                data = f.read(max(0, max_bytes))
+        except OSError:
+            return "", offset
+        if not job.done or len(data) == max_bytes:
+            end = data.rfind(b"\n") + 1
+            # 一行比 max_bytes 还长时按字节截断，避免永远读不到进展
+            if end > 0:
+                data = data[:end]
+        return data.decode("utf-8", errors="replace"), offset + len(data)
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """取消排队或运行中的作业（终止其进程组），返回更新后的记录
+
+        作业由其他服务器进程运行时抛出 JobError
+        """
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return self.store.get(job_id)
+        job = self.store.get(job_id)
+        if job is not None and not job.done:
+            raise JobError(f"Job {job_id} is run by another server process "
+                           f"(pid {job.owner_pid} on {job.owner_host}) and can only be cancelled there")
+        return job
+
+    def prune(self) -> None:
+        """删除超过保留时间的已结束作业及其输出"""
+        expired = self.store.expired(time.time() - self.ttl)
+        for job_id in expired:
+            try:
+                os.unlink(self.output_path(job_id))
+            except OSError:
+                pass
+        self.store.delete(expired)
+
+    async def close(self) -> None:
+        """取消所有未结束的作业"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.store.close()
@@ -0,0 +1,160 @@
+"""
+运行指标
+进程内的计数器和延迟直方图（固定桶，记录开销为常数），
+可导出为JSON快照（astroquery_stats 工具）或 Prometheus 文本格式（/metrics）
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+PREFIX = "astroquery_mcp_"
+
+Labels = Tuple[Tuple[str, str], ...]
+# 额外导出的指标：(名称, 类型, 标签, 值)
+Sample = Tuple[str, str, Dict[str, str], float]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _label_text(labels: Labels, extra: str = "") -> str:
+    parts = []
+    for key, value in labels:
+        value = value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    """固定桶直方图"""
+
+    __slots__ = ("bounds", "counts", "sum", "count", "max")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        # 最后一个桶是 +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """按桶上界估算分位数；落在 +Inf 桶时返回观测到的最大值"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": round(self.max, 6),
+        }
+
+
+class Metrics:
+    """按名称和标签区分的计数器与直方图"""
+
+    def __init__(self):
+        self.started = time.time()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """记录代码块耗时（包括抛出异常的情况）"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started, **labels)
+
+    def counter(self, name: str, **labels: Any) -> float:
+        return self._counters.get((name, _labels(labels)), 0.0)
+
+    def histogram(self, name: str, **labels: Any) -> Optional[Histogram]:
+        return self._histograms.get((name, _labels(labels)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON友好的快照：{名称: {"标签=值,...": 数值或直方图摘要}}"""
+        counters: Dict[str, Dict[str, float]] = {}
+        for (name, labels), value in sorted(self._counters.items()):
+            counters.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels)] = value
+        histograms: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            histograms.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels)] = histogram.summary()
+        return {
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def prometheus(self, extra: Optional[List[Sample]] = None) -> str:
+        """Prometheus 文本格式；extra 中是由其他组件状态得到的计数器/仪表值"""
+        families: Dict[str, Tuple[str, List[str]]] = {}
+
+        def family(name: str, kind: str) -> List[str]:
+            return families.setdefault(PREFIX + name, (kind, []))[1]
+
+        family("uptime_seconds", "gauge").append(
+            f"{PREFIX}uptime_seconds {_number(round(time.time() - self.started, 3))}")
+        for (name, labels), value in sorted(self._counters.items()):
+            family(name, "counter").append(f"{PREFIX}{name}{_label_text(labels)} {_number(value)}")
+        for name, kind, labels, value in extra or []:
+            family(name, kind).append(f"{PREFIX}{name}{_label_text(_labels(labels))} {_number(value)}")
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            lines = family(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{PREFIX}{name}_bucket{_label_text(labels, le)} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{_label_text(labels)} {_number(round(histogram.sum, 6))}")
+            lines.append(f"{PREFIX}{name}_count{_label_text(labels)} {histogram.count}")
+
+        output = []
+        for name, (kind, lines) in families.items():
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
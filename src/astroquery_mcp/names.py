@@ -0,0 +1,186 @@
+"""
+天体名称解析缓存
+名称→坐标的持久化缓存（带TTL），所有服务共用；未缓存的名称通过CDS Sesame并发批量解析。
+带半径的按名称查询可改写为按坐标的锥形检索，省去aqc每次调用时的一次名称解析往返
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+SESAME_URL = "https://cds.unistra.fr/cgi-bin/nph-sesame/-oI/SNV?"
+
+# 按名称查询的子命令 -> 可改写成的锥形检索子命令（按顺序取aqc实际提供的第一个）
+NAME_SUBCOMMANDS = ("object", "query-object", "name")
+CONE_SUBCOMMANDS = ("cone", "cone-search", "region", "query-region")
+# 名称所在的选项
+NAME_OPTIONS = ("object", "name", "target")
+# 参数模式中表示名称的位置参数
+NAME_ARGUMENTS = NAME_OPTIONS + ("object-name", "target-name")
+# 这些服务本身就是名称解析器，不改写
+RESOLVER_SERVICES = ("simbad", "sesame", "ned")
+
+Coordinates = Tuple[float, float]
+Lookup = Callable[[str, float], Optional[Coordinates]]
+
+_J2000_RE = re.compile(r"^%J\s+([+-]?\d+(?:\.\d*)?)\s+([+-]?\d+(?:\.\d*)?)", re.MULTILINE)
+
+
+def normalize_name(name: str) -> str:
+    """名称规范化：忽略大小写和空白（"NGC 2024" 与 "ngc2024" 相同）"""
+    return "".join(name.split()).lower()
+
+
+def sesame_lookup(name: str, timeout: float = 10.0, url: str = SESAME_URL) -> Optional[Coordinates]:
+    """通过CDS Sesame解析名称，返回 (ra, dec) 度；无法解析时返回 None"""
+    request_url = url + urllib.parse.quote(name)
+    with urllib.request.urlopen(request_url, timeout=timeout) as response:
+        text = response.read().decode("utf-8", errors="replace")
+    match = _J2000_RE.search(text)
+    if match is None:
+        return None
+    return float(match.group(1)), float(match.group(2))
+
+
+class NameResolver:
+    """名称→坐标缓存；path 为 None 时只保存在内存中"""
+
+    def __init__(self, path: Optional[Path] = None, ttl: float = 30 * 24 * 3600,
+                 lookup: Optional[Lookup] = None, timeout: float = 10.0, concurrency: int = 8):
+        self.path = path
+        self.ttl = ttl
+        self.lookup = lookup or sesame_lookup
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self._entries: Dict[str, Dict] = self._load()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, Dict]:
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Cannot write name cache: {e}", file=sys.stderr)
+
+    def get(self, name: str) -> Optional[Coordinates]:
+        """只查缓存"""
+        entry = self._entries.get(normalize_name(name))
+        if entry is None or time.time() - entry["resolved_at"] > self.ttl:
+            return None
+        return entry["ra"], entry["dec"]
+
+    def put(self, name: str, ra: float, dec: float) -> None:
+        self._entries[normalize_name(name)] = {"ra": ra, "dec": dec, "resolved_at": time.time()}
+        self._save()
+
+    async def resolve_many(self, names: Iterable[str]) -> Dict[str, Optional[Coordinates]]:
+        """批量解析：缓存命中直接返回，其余名称去重后并发查询"""
+        names = list(names)
+        results: Dict[str, Optional[Coordinates]] = {}
+        missing: Dict[str, str] = {}
+        for name in names:
+            cached = self.get(name)
+            if cached is not None:
+                self.hits += 1
+                results[name] = cached
+            else:
+                missing.setdefault(normalize_name(name), name)
+
+        if missing:
+            self.misses += len(missing)
+            semaphore = asyncio.Semaphore(self.concurrency)
+            loop = asyncio.get_event_loop()
+
+            async def resolve(name: str) -> Optional[Coordinates]:
+                async with semaphore:
+                    try:
+                        return await loop.run_in_executor(None, self.lookup, name, self.timeout)
+                    except Exception as e:
+                        print(f"Cannot resolve {name!r}: {e}", file=sys.stderr)
+                        return None
+
+            resolved = await asyncio.gather(*(resolve(name) for name in missing.values()))
+            changed = False
+            for key, coordinates in zip(missing, resolved):
+                if coordinates is not None:
+                    self._entries[key] = {"ra": coordinates[0], "dec": coordinates[1],
+                                          "resolved_at": time.time()}
+                    changed = True
+            if changed:
+                self._save()
+
+            by_key = dict(zip(missing, resolved))
+            for name in names:
+                results.setdefault(name, by_key.get(normalize_name(name)))
+
+        return results
+
+    async def resolve(self, name: str) -> Optional[Coordinates]:
+        return (await self.resolve_many([name]))[name]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def rewrite_target(command: str, subcommand: str, subcommands: Iterable[str],
+                   overrides: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """按名称查询可改写成的锥形检索子命令；overrides 形如 {"vizier.object": "cone"}"""
+    overrides = overrides or {}
+    explicit = overrides.get(f"{command}.{subcommand}")
+    if explicit is not None:
+        return explicit or None
+    if command in RESOLVER_SERVICES or subcommand not in NAME_SUBCOMMANDS:
+        return None
+    available = set(subcommands)
+    return next((cone for cone in CONE_SUBCOMMANDS if cone in available), None)
+
+
+def _normalized(name: str) -> str:
+    return name.lstrip("-").replace("_", "-").lower()
+
+
+def target_name(options: Dict[str, str], arguments: List[str],
+                spec: Optional[Dict] = None) -> Tuple[Optional[str], Optional[str], Optional[int]]:
+    """调用中的天体名称及其位置：(名称, 所在选项名, 所在位置参数下标)；找不到时全为 None
+
+    位置参数只取参数模式中表示名称的那一个（模式只有一个位置参数时即为它）；
+    参数模式未知时只接受唯一的位置参数
+    """
+    for key, value in options.items():
+        if _normalized(key) in NAME_OPTIONS:
+            return str(value), key, None
+
+    index: Optional[int] = None
+    if spec is not None:
+        names = [_normalized(argument["name"]) for argument in spec.get("arguments", [])]
+        index = next((i for i, name in enumerate(names) if name in NAME_ARGUMENTS), None)
+        if index is None and len(names) == 1:
+            index = 0
+    elif len(arguments) == 1:
+        index = 0
+    if index is None or index >= len(arguments):
+        return None, None, None
+    return str(arguments[index]), None, index
@@ -0,0 +1,284 @@
+"""
+大结果存储
+超过阈值的查询输出保存在磁盘上，并以MCP资源的形式按行范围/列子集分页读取，
+不必把整张表塞进工具输出，也不必重新执行查询
+
+每个结果一个目录：
+  data       原始输出（读取时 mmap）
+  rows.idx   数据行起始偏移（array('Q')）
+  meta.json  命令、布局（定宽/CSV/逐行）、列名与列区间
+"""
+
+import csv
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from .execution import CommandResult
+
+URI_SCHEME = "astroquery"
+URI_PREFIX = f"{URI_SCHEME}://results/"
+URI_TEMPLATE = URI_PREFIX + "{id}{?offset,limit,columns}"
+
+# 在输出开头多少行内查找表头
+_HEADER_SCAN_LINES = 50
+
+
+class StoredResult:
+    """一个保存在磁盘上的查询结果"""
+
+    def __init__(self, directory: Path, meta: Dict[str, Any]):
+        self.directory = directory
+        self.meta = meta
+        self._offsets: Optional[array] = None
+
+    @property
+    def id(self) -> str:
+        return self.meta["id"]
+
+    @property
+    def uri(self) -> str:
+        return URI_PREFIX + self.id
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.meta["columns"])
+
+    @property
+    def row_count(self) -> int:
+        return int(self.meta["rows"])
+
+    @property
+    def size(self) -> int:
+        return int(self.meta["size"])
+
+    def _index(self) -> array:
+        if self._offsets is None:
+            offsets = array("Q")
+            with open(self.directory / "rows.idx", "rb") as f:
+                offsets.frombytes(f.read())
+            self._offsets = offsets
+        return self._offsets
+
+    def _lines(self, offset: int, limit: int) -> Iterator[str]:
+        offsets = self._index()
+        end = min(len(offsets), offset + limit)
+        if offset >= end:
+            return
+        with open(self.directory / "data", "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for i in range(offset, end):
+                    stop = offsets[i + 1] if i + 1 < len(offsets) else self.meta["size"]
+                    yield mm[offsets[i]:stop].decode("utf-8", errors="replace").rstrip("\r\n")
+
+    def _split(self, line: str) -> List[str]:
+        layout = self.meta["layout"]
+        if layout == "fixed":
+            return [(line[a:b] if b is not None else line[a:]).strip()
+                    for a, b in self.meta["spans"]]
+        if layout == "csv":
+            return next(csv.reader([line]), [])
+        return [line]
+
+    def page(self, offset: int = 0, limit: int = 100,
+             columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """读取一页：行范围 [offset, offset+limit)，可选列子集"""
+        offset = max(0, offset)
+        limit = max(0, limit)
+        names = self.columns
+        if columns:
+            unknown = [c for c in columns if c not in names]
+            if unknown:
+                raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+            indices = [names.index(c) for c in columns]
+        else:
+            indices = list(range(len(names)))
+
+        rows = []
+        for line in self._lines(offset, limit):
+            cells = self._split(line)
+            rows.append([cells[i] if i < len(cells) else "" for i in indices])
+
+        return {
+            "id": self.id,
+            "command": self.meta["argv"],
+            "total_rows": self.row_count,
+            "offset": offset,
+            "limit": limit,
+            "columns": [names[i] for i in indices],
+            "rows": rows,
+        }
+
+    def header_text(self) -> str:
+        """表头部分的原始文本（列名、单位和分隔线）"""
+        return "\n".join(self.meta.get("header", []))
+
+    def head_text(self, count: int) -> str:
+        """表头加前 count 行的原始文本"""
+        lines = list(self._lines(0, count))
+        header = self.header_text()
+        return "\n".join(([header] if header else []) + lines)
+
+
+class ResultStore:
+    """大结果的磁盘存储，按总字节数和存活时间淘汰"""
+
+    def __init__(self, directory: Path, max_bytes: int = 512 * 1024 * 1024,
+                 ttl: float = 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._results: Dict[str, StoredResult] = {}
+        # put 在线程池中执行，同一结果可能被多个等待者同时保存
+        self._lock = threading.Lock()
+        self._load_existing()
+
+    def _load_existing(self) -> None:
+        try:
+            entries = sorted(self.directory.iterdir())
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                with open(entry / "meta.json", "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self._results[meta["id"]] = StoredResult(entry, meta)
+        self._evict()
+
+    def get(self, result_id: str) -> Optional[StoredResult]:
+        stored = self._results.get(result_id)
+        if stored is not None and time.time() - stored.meta["created"] > self.ttl:
+            self._remove(result_id)
+            return None
+        return stored
+
+    def list(self) -> List[StoredResult]:
+        self._evict()
+        return sorted(self._results.values(), key=lambda r: r.meta["created"], reverse=True)
+
+    def put(self, result_id: str, result: CommandResult) -> StoredResult:
+        """保存结果（接管已转存的输出文件）；同一id且大小相同时复用已有副本"""
+        with self._lock:
+            return self._put(result_id, result)
+
+    def _put(self, result_id: str, result: CommandResult) -> StoredResult:
+        existing = self.get(result_id)
+        if existing is not None and existing.size == result.output_size:
+            if result.spilled and result.stdout_path != str(existing.directory / "data"):
+                _unlink(result.stdout_path)
+            return existing
+        if existing is not None:
+            self._remove(result_id)
+
+        directory = self.directory / result_id
+        directory.mkdir(parents=True, exist_ok=True)
+        data_path = directory / "data"
+        if result.spilled:
+            shutil.move(result.stdout_path, data_path)
+            result.stdout_path = str(data_path)
+        else:
+            with open(data_path, "wb") as f:
+                f.write(result.stdout)
+
+        meta = self._index(directory, data_path)
+        meta.update(id=result_id, argv=list(result.argv), created=time.time())
+        with open(directory / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        stored = StoredResult(directory, meta)
+        self._results[result_id] = stored
+        self._evict(keep=result_id)
+        return stored
+
+    def _index(self, directory: Path, data_path: Path) -> Dict[str, Any]:
+        """扫描一次数据文件：识别布局并记录数据行偏移"""
+        from .tables import detect_layout
+        size = data_path.stat().st_size
+        offsets = array("Q")
+        head: List[str] = []
+        line_starts: List[int] = []
+
+        with open(data_path, "rb") as f:
+            position = 0
+            for raw in f:
+                if len(head) < _HEADER_SCAN_LINES:
+                    head.append(raw.decode("utf-8", errors="replace").rstrip("\r\n"))
+                    line_starts.append(position)
+                    if len(head) == _HEADER_SCAN_LINES:
+                        layout = detect_layout(head, _HEADER_SCAN_LINES)
+                        offsets.extend(line_starts[layout["data_start"]:])
+                elif raw.strip():
+                    offsets.append(position)
+                position += len(raw)
+
+        if len(head) < _HEADER_SCAN_LINES:
+            layout = detect_layout(head, _HEADER_SCAN_LINES)
+            offsets.extend(line_starts[layout["data_start"]:])
+
+        # 去掉开头部分中的空行
+        data_start = layout["data_start"]
+        blank = {line_starts[i] for i in range(data_start, len(head)) if not head[i].strip()}
+        offsets = array("Q", (o for o in offsets if o not in blank))
+
+        with open(directory / "rows.idx", "wb") as f:
+            offsets.tofile(f)
+
+        return {
+            "layout": layout["layout"],
+            "columns": layout["columns"],
+            "spans": layout["spans"],
+            "header": head[:data_start],
+            "rows": len(offsets),
+            "size": size,
+        }
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        now = time.time()
+        for result_id, stored in list(self._results.items()):
+            if now - stored.meta["created"] > self.ttl and result_id != keep:
+                self._remove(result_id)
+
+        total = sum(r.size for r in self._results.values())
+        for stored in sorted(self._results.values(), key=lambda r: r.meta["created"]):
+            if total <= self.max_bytes:
+                break
+            if stored.id == keep:
+                continue
+            total -= stored.size
+            self._remove(stored.id)
+
+    def _remove(self, result_id: str) -> None:
+        stored = self._results.pop(result_id, None)
+        if stored is not None:
+            shutil.rmtree(stored.directory, ignore_errors=True)
+
+
+def _unlink(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def parse_result_uri(uri: str) -> Tuple[str, int, int, Optional[List[str]]]:
+    """解析 astroquery://results/<id>?offset=&limit=&columns= """
+    parsed = urlparse(str(uri))
+    if parsed.scheme != URI_SCHEME or parsed.netloc != "results":
+        raise ValueError(f"Unknown resource: {uri}")
+
+    result_id = parsed.path.strip("/")
+    query = parse_qs(parsed.query)
+    offset = int(query.get("offset", ["0"])[0])
+    limit = int(query.get("limit", ["100"])[0])
+    columns = query.get("columns", [""])[0]
+    return result_id, offset, limit, [c for c in columns.split(",") if c] or None
@@ -0,0 +1,203 @@
+"""
+执行调度器
+限制同时运行的aqc执行数（全局 + 按服务），按服务做令牌桶限速，
+并在客户端之间轮转出队，避免单个客户端的突发请求饿死其他客户端
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+
+def parse_rates(spec: Dict[str, str]) -> Dict[str, Tuple[float, float]]:
+    """解析 {"simbad": "5", "vizier": "2:10"} 形式的限速配置为 (每秒速率, 突发容量)"""
+    rates: Dict[str, Tuple[float, float]] = {}
+    for service, value in spec.items():
+        rate, _, burst = value.partition(":")
+        try:
+            rate_f = float(rate)
+            burst_f = float(burst) if burst else max(1.0, rate_f)
+        except ValueError:
+            continue
+        if rate_f > 0:
+            rates[service] = (rate_f, burst_f)
+    return rates
+
+
+class QueueFull(Exception):
+    """客户端排队的请求数已达上限"""
+
+
+class TokenBucket:
+    """令牌桶限速器"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """距离下一个令牌可用还需等待的秒数"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+
+class _Waiter:
+    __slots__ = ("future", "service", "enqueued_at")
+
+    def __init__(self, future: "asyncio.Future[None]", service: str):
+        self.future = future
+        self.service = service
+        self.enqueued_at = time.monotonic()
+
+
+class Scheduler:
+    """全局/按服务并发上限 + 令牌桶限速 + 客户端间公平轮转"""
+
+    def __init__(self, max_concurrency: int = 8,
+                 service_limits: Optional[Dict[str, int]] = None,
+                 default_service_limit: Optional[int] = None,
+                 service_rates: Optional[Dict[str, Tuple[float, float]]] = None,
+                 max_queued_per_client: Optional[int] = None):
+        self.max_concurrency = max_concurrency
+        # 单个客户端最多排队的请求数，超出时立即拒绝（背压），避免其淹没共享后端
+        self.max_queued_per_client = max_queued_per_client
+        self.service_limits = dict(service_limits or {})
+        self.default_service_limit = default_service_limit
+        self.buckets = {name: TokenBucket(rate, burst)
+                        for name, (rate, burst) in (service_rates or {}).items()}
+
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._total_running = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.completed_waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.rejected = 0
+
+    def _limit(self, service: str) -> Optional[int]:
+        return self.service_limits.get(service, self.default_service_limit)
+
+    def _can_run(self, service: str, now: float) -> Tuple[bool, float]:
+        """返回 (能否立即运行, 因限速需等待的秒数)"""
+        if self._total_running >= self.max_concurrency:
+            return False, 0.0
+        limit = self._limit(service)
+        if limit is not None and self._running.get(service, 0) >= limit:
+            return False, 0.0
+        bucket = self.buckets.get(service)
+        if bucket is not None:
+            delay = bucket.delay(now)
+            if delay > 0:
+                return False, delay
+        return True, 0.0
+
+    def _grant(self, waiter: _Waiter, now: float) -> None:
+        bucket = self.buckets.get(waiter.service)
+        if bucket is not None:
+            bucket.take(now)
+        self._running[waiter.service] = self._running.get(waiter.service, 0) + 1
+        self._total_running += 1
+
+        waited = now - waiter.enqueued_at
+        self.completed_waits += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        waiter.future.set_result(None)
+
+    def _dispatch(self) -> None:
+        """按客户端轮转，为每个客户端放行其队列中第一个可运行的请求"""
+        now = time.monotonic()
+        retry_in: Optional[float] = None
+
+        progressed = True
+        while progressed and self._total_running < self.max_concurrency:
+            progressed = False
+            for client in list(self._queues):
+                queue = self._queues[client]
+                for waiter in queue:
+                    if waiter.future.done():
+                        # 已取消，等待其协程自行出队
+                        continue
+                    ok, delay = self._can_run(waiter.service, now)
+                    if ok:
+                        queue.remove(waiter)
+                        self._grant(waiter, now)
+                        # 被服务的客户端移到队尾，实现轮转
+                        self._queues.move_to_end(client)
+                        if not queue:
+                            del self._queues[client]
+                        progressed = True
+                        break
+                    if delay > 0:
+                        retry_in = delay if retry_in is None else min(retry_in, delay)
+                if progressed:
+                    break
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if retry_in is not None and self._queues:
+            # 受限速阻塞的请求在令牌可用时重新调度
+            self._timer = asyncio.get_event_loop().call_later(retry_in, self._dispatch)
+
+    async def acquire(self, service: str, client: str = "") -> float:
+        """排队等待执行名额，返回排队时间（秒）；取消时自动离开队列，客户端队列已满时抛出 QueueFull"""
+        queued = len(self._queues.get(client, ()))
+        if self.max_queued_per_client is not None and queued >= self.max_queued_per_client:
+            self.rejected += 1
+            raise QueueFull(f"Too many queued requests from this client ({queued}); retry later")
+
+        loop = asyncio.get_event_loop()
+        waiter = _Waiter(loop.create_future(), service)
+        self._queues.setdefault(client, deque()).append(waiter)
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 已分配名额但调用方放弃
+                self.release(service)
+            else:
+                queue = self._queues.get(client)
+                if queue is not None and waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._queues[client]
+            raise
+
+        return time.monotonic() - waiter.enqueued_at
+
+    def release(self, service: str) -> None:
+        self._running[service] = max(0, self._running.get(service, 0) - 1)
+        self._total_running = max(0, self._total_running - 1)
+        self._dispatch()
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._total_running,
+            "running_by_service": {k: v for k, v in self._running.items() if v},
+            "queued": self.queue_depth,
+            "queued_by_client": {k: len(v) for k, v in self._queues.items()},
+            "max_concurrency": self.max_concurrency,
+            "average_wait_seconds": self.total_wait / self.completed_waits if self.completed_waits else 0.0,
+            "max_wait_seconds": self.max_wait,
+            "rejected": self.rejected,
+        }
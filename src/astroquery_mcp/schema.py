@@ -0,0 +1,488 @@
+"""
+子命令参数模式
+从 `aqc <命令> <子命令> --help`（Click/Typer 的纯文本或 rich 面板格式）或工作进程报告的 Click 元数据中
+提取位置参数和选项（类型、默认值、是否必需、可选值），编译为工具的 JSON Schema，
+并在启动aqc之前校验调用参数，使无效调用不必花一次进程启动才失败
+
+模式（spec）是可以写入命令目录缓存的纯JSON：
+    {"usage": "...", "arguments": [参数, ...], "options": [参数, ...]}
+参数字段：name, type（string/integer/number/boolean）, description, required,
+以及可选的 enum, default, variadic（位置参数可重复）, multiple（选项可重复）,
+flag（选项的长名称，如 --radius）, is_flag（布尔开关）, secondary（开关的否定形式，如 --no-verbose）
+"""
+
+import difflib
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# 服务器自身的工具参数；与之同名的aqc参数加 aqc_ 前缀
+CONTROL_PROPERTIES = frozenset({"timeout", "cache", "output", "columns", "where", "max_rows"})
+
+# Typer 根命令上与查询无关的选项
+_IGNORED_OPTIONS = frozenset({"help", "install-completion", "show-completion"})
+
+_PANEL = re.compile(r"^[╭┏]─+\s*(.*?)\s*─")
+_SECTION = re.compile(r"^(Options|Arguments)\s*:\s*$", re.IGNORECASE)
+_USAGE = re.compile(r"^Usage:\s*(.+)$", re.IGNORECASE)
+_TAGS = re.compile(r"\s*\[((?:default:|required)[^\[\]]*)\]", re.IGNORECASE)
+_METAVAR = re.compile(r"^(\[[^\]\s]*\|[^\]\s]*\]|<[^>]+>|[A-Z][A-Z0-9_]*(?: RANGE)?(?:\.\.\.)?)$")
+_FLAG = re.compile(r"^--?[A-Za-z0-9][\w-]*$")
+_ARGUMENT_NAME = re.compile(r"^[A-Z][A-Z0-9_-]*$")
+
+_TRUE = {"true", "1", "yes", "on"}
+_FALSE = {"false", "0", "no", "off", ""}
+
+
+def _json_type(metavar: Optional[str]) -> Tuple[str, Optional[List[str]]]:
+    """把 Click 的类型名/metavar 映射为 (JSON类型, 可选值)"""
+    if metavar is None:
+        return "boolean", None
+    if metavar.startswith("[") and "|" in metavar:
+        return "string", metavar[1:-1].split("|")
+    name = metavar.rstrip(".").lower()
+    if name.startswith(("integer", "int")):
+        return "integer", None
+    if name.startswith("float"):
+        return "number", None
+    if name in ("boolean", "bool"):
+        return "boolean", None
+    return "string", None
+
+
+def _typed_default(value: str, json_type: str) -> Any:
+    value = value.strip()
+    if value in ("", "None"):
+        return None
+    try:
+        if json_type == "integer":
+            return int(value)
+        if json_type == "number":
+            return float(value)
+    except ValueError:
+        return None
+    if json_type == "boolean":
+        return value.lower() in _TRUE
+    return value
+
+
+def _finish(param: Dict[str, Any]) -> Dict[str, Any]:
+    """从描述中取出 [default: ...] 和 [required] 标记（Click 8.2+ 合并为 [default: 10; x>=1; required]）"""
+    def tags(match):
+        kept = []
+        for part in match.group(1).split(";"):
+            part = part.strip()
+            if part.lower() == "required":
+                param["required"] = True
+            elif part.lower().startswith("default:"):
+                default = _typed_default(part[len("default:"):], param["type"])
+                if default is not None and not param.get("is_flag"):
+                    param["default"] = default
+            elif part:
+                kept.append(part)
+        return f" [{'; '.join(kept)}]" if kept else ""
+
+    param["description"] = _TAGS.sub(tags, param.get("description", "")).strip()
+    return param
+
+
+def _parse_option(row: str) -> Optional[Dict[str, Any]]:
+    """解析一行选项声明，如 "-r, --radius TEXT  Search radius" 或 rich 面板中的 "--radius  -r  TEXT  ..." """
+    required = row.startswith("*")
+    if required:
+        row = row[1:].strip()
+
+    flags: List[str] = []
+    secondary: Optional[str] = None
+    metavar: Optional[str] = None
+    description: List[str] = []
+    state = "flags"
+    negate_next = False
+
+    for segment in re.split(r"\s{2,}", row):
+        if state == "description":
+            description.append(segment)
+            continue
+
+        # rich 面板中短选项、否定形式和类型各占一列，所以每一列都可能还是选项名
+        tokens = segment.replace("/", " / ").split()
+        index = 0
+        while index < len(tokens):
+            token = tokens[index].rstrip(",")
+            if token == "/":
+                negate_next = True
+            elif _FLAG.match(token):
+                long_flags = [flag for flag in flags if flag.startswith("--")]
+                if token.startswith("--") and long_flags and (negate_next or token.startswith("--no-")):
+                    secondary = token
+                else:
+                    flags.append(token)
+                negate_next = False
+            else:
+                break
+            index += 1
+        rest = " ".join(tokens[index:])
+        if not rest:
+            continue
+        # 选项名后面紧跟类型（纯文本格式中只用单个空格分隔），之后是描述
+        words = rest.split(" ", 1)
+        if _METAVAR.match(rest):
+            metavar, rest = rest, ""
+        elif _METAVAR.match(words[0]) and (index > 0 or words[0].startswith("[")):
+            metavar, rest = words[0], words[1] if len(words) > 1 else ""
+        if rest:
+            description.append(rest)
+        state = "description"
+
+    long_flags = [flag for flag in flags if flag.startswith("--")]
+    if not flags:
+        return None
+    flag = long_flags[0] if long_flags else flags[0]
+    name = flag.lstrip("-")
+    if name in _IGNORED_OPTIONS:
+        return None
+
+    json_type, choices = _json_type(metavar)
+    param: Dict[str, Any] = {
+        "name": name,
+        "flag": flag,
+        "type": json_type,
+        "description": " ".join(description),
+        "required": required,
+        "is_flag": metavar is None,
+    }
+    if choices:
+        param["enum"] = choices
+    if secondary:
+        param["secondary"] = secondary
+    if len(flags) > 1:
+        param["aliases"] = [other for other in flags if other != flag]
+    return param
+
+
+def _usage_arguments(usage: str) -> List[Dict[str, Any]]:
+    """从 Usage 行中读取位置参数，如 "aqc simbad query [OPTIONS] OBJECT_NAME [RADIUS] NAMES..." """
+    arguments = []
+    for token in usage.split():
+        if token.upper() in ("[OPTIONS]", "COMMAND", "[ARGS]...", "ARGS..."):
+            continue
+        optional = token.startswith("[")
+        variadic = token.endswith("...")
+        name = token.rstrip(".").strip("[]").rstrip(".")
+        if not _ARGUMENT_NAME.match(name):
+            continue
+        arguments.append({
+            "name": name.lower().replace("-", "_"),
+            "type": "string",
+            "description": "",
+            "required": not optional,
+            "variadic": variadic,
+        })
+    return arguments
+
+
+def _parse_argument_row(row: str) -> Optional[Dict[str, Any]]:
+    """rich 面板中的位置参数行，如 "*    object_name      TEXT  Name [required]" """
+    required = row.startswith("*")
+    segments = re.split(r"\s{2,}", row.lstrip("*").strip())
+    if not segments or not segments[0]:
+        return None
+    name = segments[0].split()[0].lower().replace("-", "_")
+    metavar = segments[1] if len(segments) > 1 and _METAVAR.match(segments[1]) else None
+    description = " ".join(segments[2 if metavar else 1:])
+    json_type, choices = _json_type(metavar or "TEXT")
+    param = {"name": name, "type": json_type, "description": description, "required": required,
+             "variadic": bool(metavar and metavar.endswith("..."))}
+    if choices:
+        param["enum"] = choices
+    return param
+
+
+def parse_help(help_text: str) -> Optional[Dict[str, Any]]:
+    """解析子命令的 `--help` 输出；没有选项段落（无法确认格式）时返回 None"""
+    usage = ""
+    section: Optional[str] = None
+    found_options = False
+    options: List[Dict[str, Any]] = []
+    panel_arguments: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+
+    for raw in help_text.splitlines():
+        stripped = raw.strip()
+        panel = _PANEL.match(stripped)
+        if panel:
+            section, current = panel.group(1).lower(), None
+            found_options = found_options or section == "options"
+            continue
+        if stripped.startswith(("╰", "┗")):
+            section, current = None, None
+            continue
+        boxed = stripped.startswith(("│", "┃"))
+        if boxed:
+            stripped = stripped[1:].rstrip("│┃").strip()
+
+        match = _USAGE.match(stripped)
+        if match and not usage:
+            usage = match.group(1).strip()
+            continue
+        heading = _SECTION.match(stripped)
+        if heading and not boxed:
+            section, current = heading.group(1).lower(), None
+            found_options = found_options or section == "options"
+            continue
+        if not stripped:
+            if not boxed:
+                current = None
+            continue
+        if not boxed and raw[:1].strip():
+            # 顶格的文字是新的段落（例如 Commands:）
+            section, current = None, None
+            continue
+
+        if section == "options":
+            if stripped.startswith("-") or (stripped.startswith("*") and stripped[1:].lstrip().startswith("-")):
+                current = _parse_option(stripped)
+                if current is not None:
+                    options.append(current)
+            elif current is not None:
+                current["description"] += " " + stripped
+        elif section == "arguments":
+            if boxed and current is not None and not stripped.startswith("*") and re.match(r"^\s{8,}", raw.strip()[1:]):
+                current["description"] += " " + stripped
+            else:
+                current = _parse_argument_row(stripped)
+                if current is not None:
+                    panel_arguments.append(current)
+
+    if not found_options:
+        return None
+
+    arguments = _usage_arguments(usage)
+    by_name = {argument["name"]: argument for argument in arguments}
+    for argument in panel_arguments:
+        if argument["name"] in by_name:
+            by_name[argument["name"]].update(
+                {key: value for key, value in argument.items() if key not in ("required", "variadic")})
+            by_name[argument["name"]]["required"] |= argument["required"]
+        else:
+            arguments.append(argument)
+
+    return {
+        "usage": usage,
+        "arguments": [_finish(argument) for argument in arguments],
+        "options": [_finish(option) for option in options],
+    }
+
+
+def spec_from_params(params: List[Dict[str, Any]], usage: str = "") -> Dict[str, Any]:
+    """把工作进程报告的 Click 参数元数据转换为模式"""
+    arguments, options = [], []
+    for param in params:
+        if param.get("hidden") or param.get("name") in _IGNORED_OPTIONS:
+            continue
+        type_name = str(param.get("type", "text")).lower()
+        choices = [str(choice) for choice in param.get("choices") or []]
+        if param.get("is_flag"):
+            json_type = "boolean"
+        elif choices:
+            json_type = "string"
+        else:
+            json_type, _ = _json_type(type_name.upper())
+        entry: Dict[str, Any] = {
+            "name": param["name"],
+            "type": json_type,
+            "description": param.get("help") or "",
+            "required": bool(param.get("required")),
+        }
+        if choices:
+            entry["enum"] = choices
+        default = param.get("default")
+        if isinstance(default, (str, int, float, bool)) and not param.get("is_flag") and default != "":
+            entry["default"] = default
+
+        if param.get("kind") == "argument":
+            entry["name"] = entry["name"].lower()
+            entry["variadic"] = param.get("nargs") == -1
+            arguments.append(entry)
+            continue
+
+        opts = [opt for opt in param.get("opts", []) if opt.startswith("-")]
+        long_opts = [opt for opt in opts if opt.startswith("--")]
+        flag = long_opts[0] if long_opts else (opts[0] if opts else f"--{param['name']}")
+        entry.update(name=flag.lstrip("-"), flag=flag, is_flag=bool(param.get("is_flag")),
+                     multiple=bool(param.get("multiple")))
+        if entry["name"] in _IGNORED_OPTIONS:
+            continue
+        secondary = param.get("secondary") or []
+        if secondary:
+            entry["secondary"] = secondary[0]
+        if len(opts) > 1:
+            entry["aliases"] = [opt for opt in opts if opt != flag]
+        options.append(entry)
+    return {"usage": usage, "arguments": arguments, "options": options}
+
+
+def property_name(param: Dict[str, Any]) -> str:
+    """参数在工具输入中的属性名"""
+    name = param["name"]
+    return f"aqc_{name}" if name in CONTROL_PROPERTIES else name
+
+
+def _property_schema(param: Dict[str, Any]) -> Dict[str, Any]:
+    schema: Dict[str, Any] = {"type": param["type"]}
+    if param.get("enum"):
+        schema["enum"] = list(param["enum"])
+    if "default" in param:
+        schema["default"] = param["default"]
+    if param.get("variadic") or param.get("multiple"):
+        schema = {"type": "array", "items": schema}
+    description = param.get("description") or ""
+    if param.get("flag"):
+        description = f"{param['flag']}: {description}".rstrip(": ")
+    if description:
+        schema["description"] = description
+    return schema
+
+
+def tool_schema(spec: Dict[str, Any], extra_properties: Dict[str, Any]) -> Dict[str, Any]:
+    """编译为工具的输入模式：位置参数和选项都是有类型的顶层属性"""
+    properties: Dict[str, Any] = {}
+    required = []
+    for param in spec["arguments"] + spec["options"]:
+        key = property_name(param)
+        properties[key] = _property_schema(param)
+        if param.get("required"):
+            required.append(key)
+    properties.update(extra_properties)
+    return {"type": "object", "properties": properties, "required": required, "additionalProperties": False}
+
+
+def find_option(spec: Dict[str, Any], key: str) -> Optional[Dict[str, Any]]:
+    """按长名称、别名或属性名查找选项"""
+    name = key.lstrip("-")
+    for option in spec["options"]:
+        if name == option["name"] or key == property_name(option) or \
+                any(name == alias.lstrip("-") for alias in option.get("aliases", [])):
+            return option
+    return None
+
+
+def _as_bool(value: Any) -> Optional[bool]:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    return None
+
+
+def _check_value(param: Dict[str, Any], value: Any, label: str) -> Optional[str]:
+    values = value if isinstance(value, list) else [value]
+    if isinstance(value, list) and not (param.get("variadic") or param.get("multiple")):
+        return f"{label} takes a single value"
+    for item in values:
+        if param.get("is_flag") or param["type"] == "boolean":
+            if _as_bool(item) is None:
+                return f"{label} expects true or false, got {item!r}"
+            continue
+        if param["type"] == "integer":
+            try:
+                if isinstance(item, bool) or float(item) != int(float(item)):
+                    raise ValueError
+            except (TypeError, ValueError):
+                return f"{label} expects an integer, got {item!r}"
+        elif param["type"] == "number":
+            try:
+                float(item)
+            except (TypeError, ValueError):
+                return f"{label} expects a number, got {item!r}"
+        if param.get("enum") and str(item) not in param["enum"]:
+            return f"{label} must be one of {', '.join(param['enum'])}, got {item!r}"
+    return None
+
+
+def validate_call(spec: Dict[str, Any], args: List[Any], options: Dict[str, Any]) -> List[str]:
+    """校验位置参数和选项，返回错误信息列表（为空表示有效）"""
+    errors = []
+    for key, value in options.items():
+        option = find_option(spec, key)
+        if option is None:
+            known = [o["name"] for o in spec["options"]]
+            close = difflib.get_close_matches(key.lstrip("-"), known, n=1)
+            hint = f" (did you mean --{close[0]}?)" if close else ""
+            errors.append(f"Unknown option --{key.lstrip('-')}{hint}")
+            continue
+        error = _check_value(option, value, option["flag"])
+        if error:
+            errors.append(error)
+
+    given = {find_option(spec, key)["name"] for key in options if find_option(spec, key) is not None}
+    for option in spec["options"]:
+        if option.get("required") and option["name"] not in given:
+            errors.append(f"Missing required option {option['flag']}")
+
+    positional = spec["arguments"]
+    variadic = any(argument.get("variadic") for argument in positional)
+    required = [argument for argument in positional if argument.get("required")]
+    if len(args) < len(required):
+        missing = [argument["name"].upper() for argument in required[len(args):]]
+        errors.append(f"Missing argument{'s' if len(missing) > 1 else ''} {', '.join(missing)}")
+    elif not variadic and len(args) > len(positional):
+        extra = " ".join(str(arg) for arg in args[len(positional):])
+        errors.append(f"Unexpected extra argument{'s' if len(args) - len(positional) > 1 else ''}: {extra}")
+    for argument, value in zip(positional, args):
+        error = _check_value(dict(argument, variadic=False), value, argument["name"].upper())
+        if error:
+            errors.append(error)
+    return errors
+
+
+def bind_arguments(spec: Dict[str, Any], values: Dict[str, Any]) -> Tuple[List[Any], Dict[str, Any], List[str]]:
+    """把按子命令工具的顶层属性拆分为 (位置参数, 选项, 错误)"""
+    errors = []
+    known = {property_name(param) for param in spec["arguments"] + spec["options"]}
+    for key in values:
+        if key not in known and key not in CONTROL_PROPERTIES:
+            close = difflib.get_close_matches(key, sorted(known), n=1)
+            errors.append(f"Unknown parameter {key!r}" + (f" (did you mean {close[0]!r}?)" if close else ""))
+
+    args: List[Any] = []
+    for argument in spec["arguments"]:
+        key = property_name(argument)
+        if key not in values:
+            continue
+        value = values[key]
+        args.extend(value if isinstance(value, list) and argument.get("variadic") else [value])
+
+    options = {option["name"]: values[property_name(option)]
+               for option in spec["options"] if property_name(option) in values}
+    return args, options, errors
+
+
+def option_argv(option: Dict[str, Any], value: Any) -> List[str]:
+    """选项对应的命令行片段：开关只写标志，可重复选项逐个写出"""
+    if option.get("is_flag"):
+        if _as_bool(value):
+            return [option["flag"]]
+        return [option["secondary"]] if option.get("secondary") else []
+    values = value if isinstance(value, list) else [value]
+    argv: List[str] = []
+    for item in values:
+        argv.extend([option["flag"], str(item)])
+    return argv
+
+
+def usage_text(command: str, subcommand: str, spec: Dict[str, Any]) -> str:
+    """简短的调用签名，用于错误信息"""
+    parts = [f"aqc {command} {subcommand}"]
+    for argument in spec["arguments"]:
+        name = argument["name"].upper() + ("..." if argument.get("variadic") else "")
+        parts.append(name if argument.get("required") else f"[{name}]")
+    for option in spec["options"]:
+        if option.get("is_flag"):
+            text = option["flag"]
+        else:
+            text = f"{option['flag']} {'|'.join(option['enum']) if option.get('enum') else option['type'].upper()}"
+        parts.append(text if option.get("required") else f"[{text}]")
+    return " ".join(parts)
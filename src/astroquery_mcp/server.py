@@ -5,159 +5,810 @@ Astroquery-CLI MCP Server
 """
 
 import asyncio
+import inspect
 import json
 import os # Added import for os module
 import shutil # Added import for shutil module
-import subprocess
+import sqlite3
 import sys
-from typing import Any, Dict, List, Optional
+import time
+from array import array
+from dataclasses import replace
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
 from pathlib import Path
 
-from mcp.server import Server
+from mcp.server import NotificationOptions, Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
 from mcp.server.models import InitializationOptions
-from mcp.server.stdio import stdio_server
-from mcp.types import Tool, TextContent
+from mcp.types import Resource, ResourceTemplate, Tool, TextContent
+
+from . import config
+from .archive import ResultArchive
+from .cache import ResultCache, cache_key, parse_ttls
+from .catalog import CommandCatalog
+from .execution import (CommandResult, Invocation, ProgressCallback, Reaper, cleanup_spill_dir,
+                        process_group_options, run_subprocess, spill_dir, terminate_process)
+from .jobs import CANCELLED, FAILED, SUCCEEDED, TIMED_OUT, Job, JobError, JobManager, JobStore
+from .metrics import Metrics, Sample
+from .names import NameResolver, rewrite_target, sesame_lookup, target_name
+from .resources import URI_TEMPLATE, ResultStore, StoredResult, parse_result_uri
+from .scheduler import Scheduler, parse_rates
+from .schema import (CONTROL_PROPERTIES, bind_arguments, find_option, option_argv, parse_help,
+                     spec_from_params, tool_schema, usage_text, validate_call)
+from .singleflight import SingleFlight
+from .spatial import ConeCache
+from .workers import PoolBusy, WorkerError, WorkerPool, resolve_worker_spec
+
+# 表格解析、交叉匹配和进程内引擎只在用到时导入（包括 spatial、resources 中的用法），缩短启动时间
+if TYPE_CHECKING:
+    from .engine import InProcessEngine
+    from .tables import Table
+
+
+# 进度通知的最小间隔（秒）
+PROGRESS_INTERVAL = 0.5
+# 检查泄漏子进程的间隔（秒）
+REAP_INTERVAL = 30.0
+# 大结果摘要中展示的行数
+SUMMARY_ROWS = 10
+# 表格输出默认返回的最大行数
+TABLE_MAX_ROWS = 1000
+# astroquery_job 每次默认返回的输出字节数
+JOB_OUTPUT_BYTES = 64 * 1024
+
+# 不依赖命令目录的内置工具
+BUILTIN_TOOLS = frozenset({
+    "astroquery_execute", "astroquery_batch", "astroquery_crossmatch",
+    "astroquery_resolve", "astroquery_result", "astroquery_stats",
+    "astroquery_submit", "astroquery_job", "astroquery_cancel",
+})
+
+# 表格输出相关的工具参数（各执行工具共用）
+TABLE_PROPERTIES = {
+    "output": {
+        "type": "string",
+        "description": "'text' returns aqc's output as is; 'table' returns compact columnar JSON (default: text)",
+        "enum": ["text", "table"],
+        "default": "text"
+    },
+    "columns": {
+        "type": "array",
+        "items": {"type": "string"},
+        "description": "Only return these columns (implies output=table)"
+    },
+    "where": {
+        "type": "array",
+        "items": {"type": "string"},
+        "description": "Row filters such as 'Vmag < 12', 'otype == Star' or 'MAIN_ID ~ NGC' (substring); all must match (implies output=table)"
+    },
+    "max_rows": {
+        "type": "integer",
+        "description": f"Maximum number of rows returned in table output (default: {TABLE_MAX_ROWS})",
+        "default": TABLE_MAX_ROWS,
+        "minimum": 0
+    }
+}
+
+
+def _parse_commands_section(help_text: str) -> Dict[str, str]:
+    """解析help输出中的 Commands 段落，返回 {命令: 描述}"""
+    commands = {}
+    in_commands_section = False
+
+    for line in help_text.split('\n'):
+        if 'Commands:' in line or 'Available commands:' in line:
+            in_commands_section = True
+            continue
+
+        if in_commands_section and line.strip():
+            if line.startswith('  ') and not line.startswith('    '):
+                # 这是一个命令行
+                parts = line.strip().split(None, 1)
+                if len(parts) >= 1:
+                    commands[parts[0]] = parts[1] if len(parts) > 1 else "No description available"
+
+    return commands
+
+
+def _format_text_table(headers: List[str], rows: List[List[str]]) -> str:
+    """把行数据格式化为等宽文本表格"""
+    widths = [len(h) for h in headers]
+    for row in rows:
+        widths = [max(w, len(cell)) for w, cell in zip(widths, row)]
+
+    lines = ["  ".join(h.ljust(w) for h, w in zip(headers, widths)).rstrip()]
+    lines.append("  ".join("-" * w for w in widths))
+    for row in rows:
+        lines.append("  ".join(cell.ljust(w) for cell, w in zip(row, widths)).rstrip())
+    return "\n".join(lines)
+
+
+def _ratio(part: int, total: int) -> Optional[float]:
+    return round(part / total, 4) if total else None
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _accepts_keyword(function: Any, name: str) -> bool:
+    try:
+        return name in inspect.signature(function).parameters
+    except (TypeError, ValueError):
+        return False
 
 
 class AstroqueryMCPServer:
     def __init__(self):
         self.server = Server("astroquery-cli")
         self.astroquery_cli_path = self._find_astroquery_cli()
+        self.catalog = CommandCatalog(self.astroquery_cli_path, config.cache_dir())
+        if config.env_bool("REFRESH_CATALOG"):
+            self.catalog.invalidate()
+        self.discovery_concurrency = max(1, config.env_int("DISCOVERY_CONCURRENCY", 8))
+        self._discovery_task: Optional[asyncio.Future] = None
+        self.prewarm_catalog = config.env_bool("PREWARM_CATALOG", True)
+        # 按子命令生成有类型的工具，并在启动aqc之前校验参数
+        self.subcommand_tools = config.env_bool("SUBCOMMAND_TOOLS", True)
+        self.validate_calls = config.env_bool("VALIDATE", True)
+        # 无状态HTTP模式下每个请求都是新会话，公平调度改按客户端地址（或可信代理设置的请求头）区分
+        self.http_stateless = config.env_bool("HTTP_STATELESS")
+        self.client_header = config.env_str("CLIENT_HEADER")
+        self.metrics = Metrics()
+        self.reaper = Reaper()
+        self.worker_pool = self._create_worker_pool()
+        self.engine = self._create_engine()
+        self.result_cache = self._create_result_cache()
+        self.archive = self._create_archive()
+        self._archiving: Set["asyncio.Future[None]"] = set()
+        self.cone_cache = self._create_cone_cache()
+        self.name_resolver = self._create_name_resolver()
+        self._inflight = SingleFlight()
+        # 进行中的共享执行所处的阶段（queue/run），按键记录
+        self._running: Dict[str, Dict[str, str]] = {}
+        self.scheduler = self._create_scheduler()
+        spill_bytes = config.env_int("SPILL_BYTES", 8 * 1024 * 1024)
+        self.spill_threshold: Optional[int] = spill_bytes if spill_bytes > 0 else None
+        self.result_store = self._create_result_store()
+        self.jobs = self._create_job_manager()
+        # 表格输出时要求aqc使用的机器可读格式
+        self.format_option = config.env_str("FORMAT_OPTION", "output-format").lstrip("-")
+        self.table_format = config.env_str("TABLE_FORMAT", "csv")
         self._setup_handlers()
         
+    def _create_worker_pool(self) -> Optional[WorkerPool]:
+        """创建常驻工作进程池；禁用或无法确定aqc入口时返回 None（使用一次性子进程）"""
+        size = config.env_int("WORKERS", 2)
+        if size <= 0:
+            return None
+
+        spec = resolve_worker_spec(self.astroquery_cli_path)
+        if spec is None:
+            return None
+
+        interpreter, entry = spec
+        return WorkerPool(
+            interpreter,
+            entry,
+            size=size,
+            max_requests=max(1, config.env_int("WORKER_MAX_REQUESTS", 100)),
+            health_interval=config.env_float("WORKER_HEALTH_INTERVAL", 30.0),
+        )
+
+    def _create_engine(self) -> Optional["InProcessEngine"]:
+        """创建进程内执行引擎；需要 ASTROQUERY_MCP_INPROCESS=1 且已安装astroquery"""
+        if not config.env_bool("INPROCESS"):
+            return None
+        from .engine import InProcessEngine
+
+        if not InProcessEngine.available():
+            print("ASTROQUERY_MCP_INPROCESS is set but astroquery is not installed; "
+                  "using aqc for all calls", file=sys.stderr)
+            return None
+        return InProcessEngine(max_workers=max(1, config.env_int("INPROCESS_THREADS", 4)))
+
+    def _create_result_cache(self) -> Optional[ResultCache]:
+        """创建查询结果缓存；ASTROQUERY_MCP_RESULT_CACHE=0 时禁用"""
+        if not config.env_bool("RESULT_CACHE", True):
+            return None
+
+        disk_dir = None
+        if config.env_bool("RESULT_CACHE_DISK"):
+            base = config.cache_dir()
+            disk_dir = base / "results" if base is not None else None
+
+        return ResultCache(
+            max_bytes=int(config.env_float("RESULT_CACHE_MB", 64) * 1024 * 1024),
+            default_ttl=config.env_float("CACHE_TTL", 3600),
+            service_ttls=parse_ttls(config.env_str("CACHE_TTLS")),
+            disk_dir=disk_dir,
+        )
+
+    def _create_archive(self) -> Optional[ResultArchive]:
+        """创建结果归档；ASTROQUERY_MCP_ARCHIVE 为 record（默认，只记录）、replay（只从归档回答）或 off"""
+        mode = (config.env_str("ARCHIVE") or "record").lower()
+        if mode not in ("record", "replay", "off", "0"):
+            raise ValueError(f"Unknown archive mode: {mode}")
+        self.replay = mode == "replay"
+        if mode in ("off", "0"):
+            return None
+
+        configured = config.env_str("ARCHIVE_DIR")
+        base = config.cache_dir()
+        directory = Path(configured).expanduser() if configured else (base / "archive" if base else None)
+        if directory is None:
+            if self.replay:
+                raise RuntimeError("Replay needs an archive: set ASTROQUERY_MCP_ARCHIVE_DIR or ASTROQUERY_MCP_CACHE_DIR")
+            return None
+        return ResultArchive(directory, max_bytes=int(config.env_float("ARCHIVE_MB", 1024) * 1024 * 1024))
+
+    def _create_result_store(self) -> Optional[ResultStore]:
+        """创建大结果存储；ASTROQUERY_MCP_RESOURCE_BYTES=0 时禁用（大结果直接内联返回）"""
+        self.resource_threshold = config.env_int("RESOURCE_BYTES", 256 * 1024)
+        if self.resource_threshold <= 0:
+            return None
+
+        base = config.cache_dir()
+        directory = base / "resources" if base is not None else spill_dir() / "resources"
+        return ResultStore(
+            directory,
+            max_bytes=int(config.env_float("RESOURCE_STORE_MB", 512) * 1024 * 1024),
+            ttl=config.env_float("RESOURCE_TTL", 24 * 3600),
+        )
+
+    def _create_job_manager(self) -> Optional[JobManager]:
+        """创建后台作业管理器；ASTROQUERY_MCP_JOBS=0 时禁用。没有缓存目录时作业记录只保存在内存中"""
+        if not config.env_bool("JOBS", True):
+            return None
+
+        base = config.cache_dir()
+        directory = base / "jobs" if base is not None else spill_dir() / "jobs"
+        return JobManager(
+            JobStore(directory if base is not None else None),
+            directory,
+            self._run_job,
+            concurrency=config.env_int("JOB_CONCURRENCY", 2),
+            ttl=config.env_float("JOB_TTL", 7 * 24 * 3600),
+        )
+
+    def _create_cone_cache(self) -> Optional[ConeCache]:
+        """创建锥形检索的空间缓存；ASTROQUERY_MCP_CONE_CACHE=0 时禁用"""
+        if not config.env_bool("CONE_CACHE", True):
+            return None
+        return ConeCache(
+            max_bytes=int(config.env_float("CONE_CACHE_MB", 64) * 1024 * 1024),
+            default_ttl=config.env_float("CACHE_TTL", 3600),
+            service_ttls=parse_ttls(config.env_str("CACHE_TTLS")),
+        )
+
+    def _create_name_resolver(self) -> Optional[NameResolver]:
+        """创建名称解析缓存；ASTROQUERY_MCP_NAME_CACHE=0 时禁用"""
+        if not config.env_bool("NAME_CACHE", True):
+            return None
+
+        base = config.cache_dir()
+        sesame_url = config.env_str("SESAME_URL")
+        return NameResolver(
+            path=base / "names.json" if base is not None else None,
+            ttl=config.env_float("NAME_TTL", 30 * 24 * 3600),
+            lookup=(lambda name, timeout: sesame_lookup(name, timeout, sesame_url)) if sesame_url else None,
+            timeout=config.env_float("NAME_RESOLVE_TIMEOUT", 10.0),
+        )
+
+    def _create_scheduler(self) -> Scheduler:
+        """创建执行调度器（全局/按服务并发上限与限速）"""
+        service_limits = {}
+        for service, value in config.env_mapping("SERVICE_CONCURRENCY").items():
+            try:
+                service_limits[service] = max(1, int(value))
+            except ValueError:
+                continue
+
+        default_limit = config.env_int("SERVICE_CONCURRENCY_DEFAULT", 4)
+        max_queued = config.env_int("CLIENT_MAX_QUEUED", 64)
+        return Scheduler(
+            max_concurrency=max(1, config.env_int("MAX_CONCURRENCY", 8)),
+            service_limits=service_limits,
+            default_service_limit=default_limit if default_limit > 0 else None,
+            service_rates=parse_rates(config.env_mapping("SERVICE_RATES")),
+            max_queued_per_client=max_queued if max_queued > 0 else None,
+        )
+
     def _find_astroquery_cli(self) -> str:
-        """查找aqc可执行文件路径"""
-        # 尝试使用 shutil.which 来查找可执行文件
+        """查找aqc可执行文件路径；只查找不执行，是否可用由后台的命令发现确认"""
+        configured = config.env_str("AQC")
+        if configured:
+            # ASTROQUERY_MCP_AQC 可以是路径或PATH中的命令名
+            aqc_path = shutil.which(configured)
+            if aqc_path:
+                return aqc_path
+            raise RuntimeError(f"Cannot find aqc executable {configured!r} (ASTROQUERY_MCP_AQC)")
+
         aqc_path = shutil.which("aqc")
-        
         if aqc_path:
-            try:
-                # 验证找到的路径是否确实是可执行文件
-                result = subprocess.run([aqc_path, "--help"], 
-                                      capture_output=True, text=True, timeout=5, env=os.environ)
-                if result.returncode == 0:
-                    return aqc_path
-            except (subprocess.TimeoutExpired, FileNotFoundError):
-                pass # 如果找到的路径不可用，继续抛出错误
-                
-        # 如果 shutil.which 找不到，或者找到的路径不可用，则尝试硬编码路径
+            return aqc_path
+
+        # PATH中没有时尝试 pip --user 的默认安装位置
         hardcoded_path = str(Path.home() / ".local/bin/aqc")
-        try:
-            result = subprocess.run([hardcoded_path, "--help"], 
-                                  capture_output=True, text=True, timeout=5, env=os.environ)
-            if result.returncode == 0:
-                return hardcoded_path
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            pass
-                
+        if os.path.isfile(hardcoded_path) and os.access(hardcoded_path, os.X_OK):
+            return hardcoded_path
+
         raise RuntimeError(f"Cannot find aqc executable. Tried PATH and {hardcoded_path}")
     
-    def _get_available_commands(self) -> Dict[str, Dict]:
-        """动态获取所有可用的aqc命令和子命令"""
-        try:
-            # 明确传递 env=os.environ 来继承当前进程的PATH
-            result = subprocess.run([self.astroquery_cli_path, "--help"], 
-                                  capture_output=True, text=True, timeout=10, env=os.environ)
-            
-            commands = {}
-            
-            # 解析help输出，提取命令信息
-            lines = result.stdout.split('\n')
-            in_commands_section = False
-            
-            for line in lines:
-                if 'Commands:' in line or 'Available commands:' in line:
-                    in_commands_section = True
-                    continue
-                    
-                if in_commands_section and line.strip():
-                    if line.startswith('  ') and not line.startswith('    '):
-                        # 这是一个命令行
-                        parts = line.strip().split(None, 1)
-                        if len(parts) >= 1:
-                            cmd = parts[0]
-                            description = parts[1] if len(parts) > 1 else "No description available"
-                            commands[cmd] = {
-                                "description": description,
-                                "subcommands": self._get_subcommands(cmd)
-                            }
-                            
+    async def _get_catalog(self) -> Dict[str, Dict]:
+        """获取命令目录，优先使用缓存；仅在缓存缺失或aqc变化时重新发现"""
+        commands = self.catalog.get()
+        if commands is not None:
             return commands
-            
+
+        # 同一时间只运行一次发现（预热任务与 tools/list 共享）
+        if self._discovery_task is None or self._discovery_task.done():
+            self._discovery_task = asyncio.ensure_future(self._discover_catalog())
+        return await asyncio.shield(self._discovery_task)
+
+    async def _discover_catalog(self) -> Dict[str, Dict]:
+        """执行命令发现并写入缓存"""
+        with self.metrics.timer("discovery_seconds"):
+            commands = await self._get_available_commands()
+        # 发现失败（空结果）不写入缓存，下次重试
+        if commands:
+            self.catalog.put(commands)
+        return commands
+
+    def start_catalog_prewarm(self) -> None:
+        """在后台读取命令目录缓存或执行命令发现，使第一次 tools/list 无需等待；不阻塞握手"""
+        if self._discovery_task is None:
+            self._discovery_task = asyncio.ensure_future(self._prewarm_catalog())
+
+    async def _prewarm_catalog(self) -> Dict[str, Dict]:
+        # 先让出事件循环，使 initialize 请求先被处理
+        await asyncio.sleep(0)
+        commands = self.catalog.get()
+        if commands is not None:
+            return commands
+        return await self._discover_catalog()
+
+    def invalidate_catalog(self) -> None:
+        """显式使命令目录缓存失效，下次 tools/list 时重新发现"""
+        self.catalog.invalidate()
+        self._discovery_task = None
+
+    async def _run_help(self, *args: str) -> str:
+        """异步执行 `aqc ... --help` 并返回stdout"""
+        self.metrics.inc("spawns_total", kind="help")
+        process = await asyncio.create_subprocess_exec(
+            self.astroquery_cli_path, *args, "--help",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            env=os.environ, # 明确传递 env=os.environ 来继承当前进程的PATH
+            **process_group_options()
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), timeout=10)
+        except BaseException:
+            await asyncio.shield(terminate_process(process))
+            raise
+        return stdout.decode("utf-8", errors="replace")
+
+    async def _get_available_commands(self) -> Dict[str, Dict]:
+        """动态获取所有可用的aqc命令、子命令及其参数模式"""
+        if self.worker_pool is not None:
+            # 工作进程直接读取 Click/Typer 元数据，不需要为每个子命令启动一次 --help
+            described = await self._describe_commands()
+            if described:
+                return described
+
+        try:
+            commands = _parse_commands_section(await self._run_help())
+            if not commands:
+                # aqc只在这里第一次被执行，不可用时在此报告
+                print(f"aqc at {self.astroquery_cli_path} did not list any commands; "
+                      f"check the installation or set ASTROQUERY_MCP_AQC", file=sys.stderr)
+
+            # 并行探测所有子命令，并发数受限
+            semaphore = asyncio.Semaphore(self.discovery_concurrency)
+
+            async def probe(cmd: str) -> Dict[str, str]:
+                async with semaphore:
+                    return await self._get_subcommands(cmd)
+
+            async def probe_schema(cmd: str, sub: str) -> Optional[Dict[str, Any]]:
+                async with semaphore:
+                    return await self._get_subcommand_schema(cmd, sub)
+
+            subcommands = await asyncio.gather(*(probe(cmd) for cmd in commands))
+            pairs = [(cmd, sub) for cmd, subs in zip(commands, subcommands) for sub in subs]
+            specs = await asyncio.gather(*(probe_schema(cmd, sub) for cmd, sub in pairs))
+            schemas: Dict[str, Dict[str, Any]] = {cmd: {} for cmd in commands}
+            for (cmd, sub), spec in zip(pairs, specs):
+                if spec is not None:
+                    schemas[cmd][sub] = spec
+
+            return {
+                cmd: {"description": description, "subcommands": subs, "schemas": schemas[cmd]}
+                for (cmd, description), subs in zip(commands.items(), subcommands)
+            }
+
         except Exception as e:
             print(f"Error getting commands: {e}", file=sys.stderr)
             return {}
-    
-    def _get_subcommands(self, command: str) -> Dict[str, str]:
+
+    async def _get_subcommands(self, command: str) -> Dict[str, str]:
         """获取特定命令的子命令"""
         try:
-            # 明确传递 env=os.environ 来继承当前进程的PATH
-            result = subprocess.run([self.astroquery_cli_path, command, "--help"], 
-                                  capture_output=True, text=True, timeout=10, env=os.environ)
-            
-            subcommands = {}
-            lines = result.stdout.split('\n')
-            in_commands_section = False
-            
-            for line in lines:
-                if 'Commands:' in line or 'Available commands:' in line:
-                    in_commands_section = True
-                    continue
-                    
-                if in_commands_section and line.strip():
-                    if line.startswith('  ') and not line.startswith('    '):
-                        parts = line.strip().split(None, 1)
-                        if len(parts) >= 1:
-                            subcmd = parts[0]
-                            description = parts[1] if len(parts) > 1 else "No description available"
-                            subcommands[subcmd] = description
-                            
-            return subcommands
-            
+            return _parse_commands_section(await self._run_help(command))
         except Exception:
             return {}
-    
+
+    async def _get_subcommand_schema(self, command: str, subcommand: str) -> Optional[Dict[str, Any]]:
+        """从子命令的help输出中提取参数模式；无法识别时返回 None（该子命令不生成有类型的工具）"""
+        try:
+            return parse_help(await self._run_help(command, subcommand))
+        except Exception:
+            return None
+
+    async def _describe_commands(self) -> Optional[Dict[str, Dict]]:
+        """通过工作进程读取命令树；aqc不是 Click/Typer 应用或读取失败时返回 None"""
+        try:
+            tree = await self.worker_pool.describe()
+        except (WorkerError, asyncio.TimeoutError) as e:
+            print(f"Cannot describe aqc commands in a worker: {e}", file=sys.stderr)
+            return None
+        if not tree:
+            return None
+
+        commands = {}
+        for cmd, info in tree.items():
+            subcommands = info.get("subcommands") or {}
+            commands[cmd] = {
+                "description": info.get("description") or "No description available",
+                "subcommands": {sub: sub_info.get("description") or "No description available"
+                                for sub, sub_info in subcommands.items()},
+                "schemas": {sub: spec_from_params(sub_info.get("params", []))
+                            for sub, sub_info in subcommands.items()},
+            }
+        return commands
+
+    def _subcommand_spec(self, cmd: str, subcommand: str) -> Optional[Dict[str, Any]]:
+        """子命令的参数模式（来自命令目录）；未知时返回 None"""
+        commands = self.catalog.get() or {}
+        return commands.get(cmd, {}).get("schemas", {}).get(subcommand)
+
+    def _subcommand_tool(self, name: str) -> Optional[Tuple[str, str]]:
+        """把 astroquery_<命令>_<子命令> 工具名解析为 (命令, 子命令)"""
+        if not self.subcommand_tools or not name.startswith("astroquery_"):
+            return None
+        rest = name[len("astroquery_"):]
+        for cmd, cmd_info in (self.catalog.get() or {}).items():
+            if rest.startswith(f"{cmd}_") and rest[len(cmd) + 1:] in cmd_info.get("schemas", {}):
+                return cmd, rest[len(cmd) + 1:]
+        return None
+
     def _setup_handlers(self):
         """设置MCP处理器"""
         
         @self.server.list_tools()
         async def handle_list_tools() -> List[Tool]:
             """动态生成工具列表"""
-            tools = []
-            commands = self._get_available_commands()
-            
-            # 为每个主命令创建一个工具
-            for cmd, cmd_info in commands.items():
+            with self.metrics.timer("list_tools_seconds"):
+                return await self._list_tools()
+
+        @self.server.call_tool()
+        async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
+            """处理工具调用，并记录按工具的延迟和请求/响应字节数"""
+            started = time.monotonic()
+            content = await self._call_tool(name, arguments)
+            tool = self._tool_label(name)
+            self.metrics.observe("tool_seconds", time.monotonic() - started, tool=tool)
+            self.metrics.inc("tool_request_bytes_total", len(json.dumps(arguments or {})), tool=tool)
+            self.metrics.inc("tool_response_bytes_total",
+                             sum(len(item.text.encode("utf-8")) for item in content), tool=tool)
+            return content
+
+        @self.server.list_resources()
+        async def handle_list_resources() -> List[Resource]:
+            """列出已保存的大结果"""
+            if self.result_store is None:
+                return []
+            return [
+                Resource(
+                    uri=stored.uri,
+                    name=f"aqc {' '.join(stored.meta['argv'])}",
+                    description=f"{stored.row_count} rows; columns: {', '.join(stored.columns)}",
+                    mimeType="application/json",
+                )
+                for stored in self.result_store.list()
+            ]
+
+        @self.server.list_resource_templates()
+        async def handle_list_resource_templates() -> List[ResourceTemplate]:
+            """大结果的分页读取模板"""
+            return [ResourceTemplate(
+                uriTemplate=URI_TEMPLATE,
+                name="Stored query result",
+                description="Rows [offset, offset+limit) of a stored result, optionally limited to a comma-separated list of columns",
+                mimeType="application/json",
+            )]
+
+        @self.server.read_resource()
+        async def handle_read_resource(uri) -> List[ReadResourceContents]:
+            """按行范围/列子集读取大结果"""
+            result_id, offset, limit, columns = parse_result_uri(str(uri))
+            page = self._result_page(result_id, offset, limit, columns)
+            return [ReadResourceContents(content=json.dumps(page), mime_type="application/json")]
+    
+    async def _list_tools(self) -> List[Tool]:
+        """动态生成工具列表"""
+        tools = []
+        commands = await self._get_catalog()
+        
+        # 为每个主命令创建一个工具
+        for cmd, cmd_info in commands.items():
+            tools.append(Tool(
+                name=f"astroquery_{cmd}",
+                description=f"Execute aqc {cmd} command: {cmd_info['description']}",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "subcommand": {
+                            "type": "string",
+                            "description": f"Subcommand for {cmd}",
+                            "enum": list(cmd_info['subcommands'].keys()) if cmd_info['subcommands'] else []
+                        },
+                        "arguments": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Additional arguments for the command"
+                        },
+                        "options": {
+                            "type": "object",
+                            "description": "Command options as key-value pairs",
+                            "additionalProperties": {"type": "string"}
+                        },
+                        "timeout": {
+                            "type": "number",
+                            "description": f"Command timeout in seconds (default: {self._tool_timeout(cmd, {})})"
+                        },
+                        "cache": {
+                            "type": "boolean",
+                            "description": "Use cached results for identical queries (default: true)",
+                            "default": True
+                        },
+                        **TABLE_PROPERTIES
+                    },
+                    "required": []
+                }
+            ))
+
+            # 每个能识别参数的子命令一个有类型的工具
+            if not self.subcommand_tools:
+                continue
+            for sub, spec in cmd_info.get("schemas", {}).items():
                 tools.append(Tool(
-                    name=f"astroquery_{cmd}",
-                    description=f"Execute aqc {cmd} command: {cmd_info['description']}",
-                    inputSchema={
-                        "type": "object",
-                        "properties": {
-                            "subcommand": {
-                                "type": "string",
-                                "description": f"Subcommand for {cmd}",
-                                "enum": list(cmd_info['subcommands'].keys()) if cmd_info['subcommands'] else []
+                    name=f"astroquery_{cmd}_{sub}",
+                    description=f"aqc {cmd} {sub}: {cmd_info['subcommands'].get(sub, '')}".rstrip(": "),
+                    inputSchema=tool_schema(spec, {
+                        "timeout": {
+                            "type": "number",
+                            "description": f"Command timeout in seconds (default: {self._tool_timeout(cmd, {})})"
+                        },
+                        "cache": {
+                            "type": "boolean",
+                            "description": "Use cached results for identical queries (default: true)",
+                            "default": True
+                        },
+                        **TABLE_PROPERTIES
+                    })
+                ))
+        
+        # 添加一个通用执行工具
+        tools.append(Tool(
+            name="astroquery_execute",
+            description="Execute any aqc command with full control",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "command": {
+                        "type": "string",
+                        "description": "Full command to execute (without 'aqc' prefix)"
+                    },
+                    "timeout": {
+                        "type": "number",
+                        "description": f"Command timeout in seconds (default: {self._tool_timeout('execute', {}, 30)})"
+                    },
+                    "cache": {
+                        "type": "boolean",
+                        "description": "Use cached results for identical queries (default: true)",
+                        "default": True
+                    },
+                    **TABLE_PROPERTIES
+                },
+                "required": ["command"]
+            }
+        ))
+
+        # 批量查询工具：一个命令模板 + 多个目标
+        tools.append(Tool(
+            name="astroquery_batch",
+            description=(
+                "Run one aqc command template for many targets concurrently and return "
+                "a merged result with per-row status. Use {target} in the template for "
+                "names, or {ra}/{dec}/any row key for coordinate rows."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "command": {
+                        "type": "string",
+                        "description": "Command template without 'aqc' prefix, e.g. 'simbad query {target}'"
+                    },
+                    "targets": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Object names substituted for {target}"
+                    },
+                    "rows": {
+                        "type": "array",
+                        "items": {"type": "object"},
+                        "description": "Rows of values (e.g. {\"ra\": 10.68, \"dec\": 41.27}) substituted by key"
+                    },
+                    "concurrency": {
+                        "type": "integer",
+                        "description": "Maximum number of rows queried at once (default: 4)",
+                        "default": 4,
+                        "minimum": 1
+                    },
+                    "timeout": {
+                        "type": "number",
+                        "description": f"Timeout per row in seconds (default: {self._tool_timeout('batch', {}, 30)})"
+                    },
+                    "cache": {
+                        "type": "boolean",
+                        "description": "Use cached results for identical queries (default: true)",
+                        "default": True
+                    }
+                },
+                "required": ["command"]
+            }
+        ))
+
+        # 交叉匹配工具：并发执行星表查询，在服务器端按位置匹配
+        tools.append(Tool(
+            name="astroquery_crossmatch",
+            description=(
+                "Cross-match a source list against one or more catalog queries by position. "
+                "The queries run concurrently and only matched pairs with their separations "
+                "are returned."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "sources": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "id": {"type": ["string", "number"]},
+                                "ra": {"type": ["number", "string"]},
+                                "dec": {"type": ["number", "string"]}
                             },
-                            "arguments": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "description": "Additional arguments for the command"
+                            "required": ["ra", "dec"]
+                        },
+                        "description": "Sources to match: ra/dec in degrees or sexagesimal (RA in hours), optional id"
+                    },
+                    "catalogs": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "command": {
+                                    "type": "string",
+                                    "description": "Catalog query without 'aqc' prefix, e.g. 'vizier cone --ra 10.68 --dec 41.27 --radius 10 --catalog II/246'"
+                                },
+                                "name": {"type": "string"},
+                                "ra_column": {"type": "string"},
+                                "dec_column": {"type": "string"},
+                                "columns": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "Catalog columns to include for each match"
+                                }
                             },
-                            "options": {
-                                "type": "object",
-                                "description": "Command options as key-value pairs",
-                                "additionalProperties": {"type": "string"}
-                            }
+                            "required": ["command"]
                         },
-                        "required": []
+                        "description": "Catalog queries to match against"
+                    },
+                    "radius": {
+                        "type": "number",
+                        "description": "Match radius in arcseconds (default: 1)",
+                        "default": 1.0
+                    },
+                    "nearest": {
+                        "type": "boolean",
+                        "description": "Keep only the nearest counterpart per source and catalog (default: true)",
+                        "default": True
+                    },
+                    "timeout": {
+                        "type": "number",
+                        "description": f"Timeout per catalog query in seconds (default: {self._tool_timeout('crossmatch', {}, 60)})"
+                    },
+                    "cache": {
+                        "type": "boolean",
+                        "description": "Use cached results for identical queries (default: true)",
+                        "default": True
                     }
-                ))
-            
-            # 添加一个通用执行工具
+                },
+                "required": ["sources", "catalogs"]
+            }
+        ))
+
+        # 名称解析工具
+        if self.name_resolver is not None:
+            tools.append(Tool(
+                name="astroquery_resolve",
+                description="Resolve object names to ICRS coordinates (degrees) using a shared, persistent name cache",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "names": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Object names, e.g. ['Betelgeuse', 'NGC 2024']"
+                        }
+                    },
+                    "required": ["names"]
+                }
+            ))
+
+        # 分页读取大结果（供不支持MCP资源的客户端使用）
+        if self.result_store is not None:
             tools.append(Tool(
-                name="astroquery_execute",
-                description="Execute any aqc command with full control",
+                name="astroquery_result",
+                description=(
+                    "Read rows from a large query result stored on the server "
+                    "(astroquery://results/<id>) without re-running the query"
+                ),
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "id": {
+                            "type": "string",
+                            "description": "Result id or astroquery://results/<id> URI"
+                        },
+                        "offset": {
+                            "type": "integer",
+                            "description": "First row to return (default: 0)",
+                            "default": 0,
+                            "minimum": 0
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "description": "Number of rows to return (default: 100)",
+                            "default": 100,
+                            "minimum": 0
+                        },
+                        "columns": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Subset of columns to return (default: all)"
+                        }
+                    },
+                    "required": ["id"]
+                }
+            ))
+
+        # 后台作业：提交后立即返回，之后轮询状态/输出或取消
+        if self.jobs is not None:
+            tools.append(Tool(
+                name="astroquery_submit",
+                description=(
+                    "Start a long-running aqc command (e.g. a Gaia ADQL query or a MAST search) "
+                    "as a background job and return its id at once; follow it with astroquery_job"
+                ),
                 inputSchema={
                     "type": "object",
                     "properties": {
@@ -167,90 +818,612 @@ class AstroqueryMCPServer:
                         },
                         "timeout": {
                             "type": "number",
-                            "description": "Command timeout in seconds (default: 30)",
-                            "default": 30
+                            "description": f"Job timeout in seconds (default: {self._job_timeout({})})"
                         }
                     },
                     "required": ["command"]
                 }
             ))
-            
-            return tools
+            tools.append(Tool(
+                name="astroquery_job",
+                description=(
+                    "Status of a background job with the output produced so far, read in chunks "
+                    "from a byte offset; without an id, lists recent jobs"
+                ),
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "id": {
+                            "type": "string",
+                            "description": "Job id returned by astroquery_submit"
+                        },
+                        "offset": {
+                            "type": "integer",
+                            "description": "Byte offset to read output from; pass the previous next_offset to continue (default: 0)",
+                            "default": 0,
+                            "minimum": 0
+                        },
+                        "max_bytes": {
+                            "type": "integer",
+                            "description": f"Maximum output bytes to return (default: {JOB_OUTPUT_BYTES})",
+                            "default": JOB_OUTPUT_BYTES,
+                            "minimum": 0
+                        }
+                    }
+                }
+            ))
+            tools.append(Tool(
+                name="astroquery_cancel",
+                description="Cancel a queued or running background job and stop its aqc process",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "id": {
+                            "type": "string",
+                            "description": "Job id returned by astroquery_submit"
+                        }
+                    },
+                    "required": ["id"]
+                }
+            ))
+
+        tools.append(Tool(
+            name="astroquery_stats",
+            description=(
+                "Server metrics: per-tool latency, aqc process spawns, bytes in/out, "
+                "cache hit rates, queue depth and timeouts"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "format": {
+                        "type": "string",
+                        "description": "'json' (default) or 'prometheus' text exposition format",
+                        "enum": ["json", "prometheus"],
+                        "default": "json"
+                    }
+                }
+            }
+        ))
         
-        @self.server.call_tool()
-        async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
-            """处理工具调用"""
-            try:
-                if name == "astroquery_execute":
-                    return await self._execute_generic_command(arguments)
-                elif name.startswith("astroquery_"):
-                    cmd = name.replace("astroquery_", "")
-                    return await self._execute_specific_command(cmd, arguments)
-                else:
-                    return [TextContent(
-                        type="text",
-                        text=f"Unknown tool: {name}"
-                    )]
-                    
-            except Exception as e:
+        return tools
+
+    async def _call_tool(self, name: str, arguments: Dict[str, Any]) -> List[TextContent]:
+        """按工具名分派调用"""
+        try:
+            if name == "astroquery_execute":
+                return await self._execute_generic_command(arguments)
+            elif name == "astroquery_batch":
+                return await self._execute_batch(arguments)
+            elif name == "astroquery_crossmatch":
+                return await self._execute_crossmatch(arguments)
+            elif name == "astroquery_resolve":
+                return await self._resolve_names(arguments)
+            elif name == "astroquery_result":
+                return self._read_result(arguments)
+            elif name == "astroquery_stats":
+                return self._read_stats(arguments)
+            elif name == "astroquery_submit":
+                return self._submit_job(arguments)
+            elif name == "astroquery_job":
+                return self._read_job(arguments)
+            elif name == "astroquery_cancel":
+                return await self._cancel_job(arguments)
+            elif name.startswith("astroquery_"):
+                target = self._subcommand_tool(name)
+                if target is not None:
+                    return await self._execute_subcommand_tool(*target, arguments)
+                cmd = name.replace("astroquery_", "")
+                return await self._execute_specific_command(cmd, arguments)
+            else:
                 return [TextContent(
-                    type="text", 
-                    text=f"Error executing {name}: {str(e)}"
+                    type="text",
+                    text=f"Unknown tool: {name}"
                 )]
-    
+                
+        except Exception as e:
+            self.metrics.inc("tool_errors_total", tool=self._tool_label(name))
+            return [TextContent(
+                type="text", 
+                text=f"Error executing {name}: {str(e)}"
+            )]
+
+    def _tool_label(self, name: str) -> str:
+        """指标中的工具标签；未知工具名统一记为 unknown，避免标签数量无限增长"""
+        if name in BUILTIN_TOOLS:
+            return name
+        if name.startswith("astroquery_") and name[len("astroquery_"):] in (self.catalog.get() or {}):
+            return name
+        if self._subcommand_tool(name) is not None:
+            return name
+        return "unknown"
+
+    def _result_page(self, result_id: str, offset: int, limit: int,
+                     columns: Optional[List[str]]) -> Dict[str, Any]:
+        """读取已保存结果的一页"""
+        stored = self.result_store.get(result_id) if self.result_store is not None else None
+        if stored is None:
+            raise ValueError(f"Unknown or expired result: {result_id}")
+        return stored.page(offset, limit, columns)
+
+    def _read_result(self, arguments: Dict[str, Any]) -> List[TextContent]:
+        """astroquery_result 工具：分页读取大结果"""
+        result_id = str(arguments.get("id", "")).rsplit("/", 1)[-1]
+        page = self._result_page(
+            result_id,
+            int(arguments.get("offset", 0)),
+            int(arguments.get("limit", 100)),
+            arguments.get("columns") or None,
+        )
+        return [TextContent(type="text", text=json.dumps(page))]
+
+    async def _publish(self, result: CommandResult) -> Optional[StoredResult]:
+        """超过阈值的成功结果保存为资源；写盘和建索引在线程池中进行"""
+        if self.result_store is None or not result.ok or result.output_size <= self.resource_threshold:
+            return None
+        result_id = cache_key(result.argv, self.catalog.version)[:16]
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(None, self.result_store.put, result_id, result)
+        except OSError as e:
+            print(f"Cannot store large result: {e}", file=sys.stderr)
+            return None
+
+    async def _run_aqc(self, invocation: Invocation) -> CommandResult:
+        """执行aqc命令，记录按服务和执行方式的耗时与输出字节数"""
+        started = time.monotonic()
+        result = await self._dispatch_aqc(invocation)
+        service = invocation.command
+        self.metrics.observe("aqc_seconds", time.monotonic() - started, service=service, source=result.source)
+        self.metrics.inc("aqc_output_bytes_total", result.output_size, service=service)
+        if not result.ok:
+            self.metrics.inc("aqc_failures_total", service=service)
+        return result
+
+    async def _dispatch_aqc(self, invocation: Invocation) -> CommandResult:
+        """执行aqc命令：进程内引擎 → 常驻工作进程 → 一次性子进程，逐级回退"""
+        if self.engine is not None:
+            result = await self.engine.run(invocation)
+            if result is not None:
+                return result
+
+        argv, timeout = invocation.argv, invocation.timeout
+        if self.worker_pool is not None:
+            try:
+                return await self.worker_pool.run(argv, timeout, spill_threshold=self.spill_threshold,
+                                                  progress=invocation.progress)
+            except PoolBusy:
+                self.metrics.inc("worker_busy_total")
+            except WorkerError as e:
+                print(f"aqc worker failed, falling back to subprocess: {e}", file=sys.stderr)
+
+        self.metrics.inc("spawns_total", kind="subprocess")
+        return await run_subprocess(
+            self.astroquery_cli_path, argv, timeout,
+            progress=invocation.progress,
+            spill_threshold=self.spill_threshold,
+            reaper=self.reaper,
+        )
+
+    def _progress_reporter(self) -> Optional[ProgressCallback]:
+        """客户端请求了进度（progressToken）时，返回发送MCP进度通知的回调"""
+        try:
+            context = self.server.request_context
+        except LookupError:
+            return None
+
+        token = getattr(context.meta, "progressToken", None) if context.meta else None
+        if token is None:
+            return None
+
+        session = context.session
+        last_sent = 0.0
+        # 较早的mcp版本不接受进度消息文本，只发送进度数值
+        with_message = _accepts_keyword(session.send_progress_notification, "message")
+
+        async def report(size: int, rows: int) -> None:
+            nonlocal last_sent
+            now = time.monotonic()
+            if now - last_sent < PROGRESS_INTERVAL:
+                return
+            last_sent = now
+            extra = {"message": f"{rows} rows, {size} bytes received"} if with_message else {}
+            try:
+                await session.send_progress_notification(token, float(size), **extra)
+            except Exception:
+                # 进度通知失败不影响查询本身
+                pass
+
+        return report
+
+    async def _execute(self, invocation: Invocation) -> CommandResult:
+        """执行一次调用；命中结果缓存时不再运行aqc，相同的并发调用只执行一次"""
+        key = cache_key(invocation.argv, self.catalog.version)
+        cache = self.result_cache
+
+        # 回放模式只由归档回答，不经过其他缓存，结果与记录时完全一致
+        if self.replay:
+            return await self._replay(key, invocation)
+
+        if cache is not None and invocation.use_cache:
+            cached = cache.get(key)
+            if cached is not None:
+                result, age = cached
+                return replace(result, notes=[f"Cache: hit (age {age:.0f}s)"])
+
+        # 落在已获取锥形内的锥形检索在本地过滤得到
+        if self.cone_cache is not None and invocation.use_cache:
+            answered = self.cone_cache.lookup(invocation)
+            if answered is not None:
+                return answered
+
+        # 重启后内存缓存为空时，服务TTL内的归档结果仍可使用
+        if self.archive is not None and cache is not None and invocation.use_cache:
+            archived = await self._from_archive(key, invocation)
+            if archived is not None:
+                return archived
+
+        # 加入进行中的执行时共享它的阶段记录，超时时据此区分排队超时和运行超时
+        state = self._running.setdefault(key, {"stage": "queue"})
+        try:
+            result, shared = await self._inflight.do(
+                key, lambda: self._run_and_store(key, invocation, state), invocation.timeout
+            )
+        except asyncio.TimeoutError:
+            self.metrics.inc("timeouts_total", service=invocation.command, stage=state["stage"])
+            raise
+        finally:
+            if key not in self._inflight and self._running.get(key) is state:
+                del self._running[key]
+
+        # 共享的结果对象不能被各个等待者修改
+        result = replace(result, notes=list(result.notes))
+        if cache is not None and invocation.use_cache:
+            result.notes.append("Cache: miss")
+        if shared:
+            self.metrics.inc("coalesced_total", service=invocation.command)
+            result.notes.append("Coalesced: shared an identical in-flight call")
+        return result
+
+    async def _run_and_store(self, key: str, invocation: Invocation, state: Dict[str, str]) -> CommandResult:
+        """经调度器排队后执行，并写入结果缓存
+
+        时限由等待者在 SingleFlight 中各自施加（排队时间计入调用超时），
+        最后一个等待者离开时本执行被取消，因此这里不再设置超时
+        """
+        service = invocation.command
+        waited = await self.scheduler.acquire(service, self._client_id())
+        self.metrics.observe("queue_wait_seconds", waited, service=service)
+        state["stage"] = "run"
+        try:
+            result = await self._run_aqc(replace(invocation, timeout=None))
+        finally:
+            self.scheduler.release(service)
+
+        if waited >= 0.01:
+            result.notes.append(f"Queued: {waited:.2f}s (queue depth {self.scheduler.queue_depth})")
+        if self.result_cache is not None:
+            self.result_cache.put(key, result, invocation.command)
+        if self.cone_cache is not None:
+            self.cone_cache.add(invocation, result)
+        await self._record(key, result)
+        return result
+
+    async def _record(self, key: str, result: CommandResult) -> None:
+        """把成功的结果写入归档（在线程池中压缩），不延迟调用本身"""
+        if self.archive is None or self.replay or not result.ok:
+            return
+        loop = asyncio.get_event_loop()
+        future = loop.run_in_executor(None, self._archive_result, key, result, self.catalog.version)
+        if result.spilled:
+            # 转存文件随后会被移入大结果存储，必须先读完
+            await future
+            return
+        self._archiving.add(future)
+        future.add_done_callback(self._archiving.discard)
+
+    def _archive_result(self, key: str, result: CommandResult, version: str) -> None:
+        # 归档失败不影响调用
+        try:
+            self.archive.put(key, result, version)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Cannot archive result: {e}", file=sys.stderr)
+
+    async def _from_archive(self, key: str, invocation: Invocation) -> Optional[CommandResult]:
+        """从归档读取结果；记录模式下超过服务TTL的结果不使用"""
+        loop = asyncio.get_event_loop()
+        found = await loop.run_in_executor(None, self.archive.get, key, self.spill_threshold)
+        if found is None:
+            return None
+        result, age = found
+        if not self.replay and age > self.result_cache.ttl_for(invocation.command):
+            return None
+        self.metrics.inc("archive_hits_total", service=invocation.command)
+        if not self.replay:
+            # 与运行aqc后一样填充结果缓存和锥形缓存，之后的调用不必再读归档
+            self.result_cache.put(key, result, invocation.command, age)
+            if self.cone_cache is not None:
+                self.cone_cache.add(invocation, result, age)
+        result.notes.append(f"Archive: {'replayed' if self.replay else 'hit'} (recorded {age:.0f}s ago)")
+        return result
+
+    async def _replay(self, key: str, invocation: Invocation) -> CommandResult:
+        """回放模式：只由归档回答，未记录的调用返回错误结果，不运行aqc"""
+        result = await self._from_archive(key, invocation)
+        if result is not None:
+            return result
+        self.metrics.inc("archive_misses_total", service=invocation.command)
+        return CommandResult(
+            argv=list(invocation.argv),
+            returncode=1,
+            stderr=f"Replay: no recorded result for aqc {' '.join(invocation.argv)}\n".encode("utf-8"),
+            source="archive",
+        )
+
+    def _client_id(self) -> str:
+        """当前请求所属的客户端标识，用于客户端间公平调度
+
+        通常是MCP会话；无状态HTTP模式下是 ASTROQUERY_MCP_CLIENT_HEADER 请求头或客户端地址
+        """
+        try:
+            context = self.server.request_context
+        except LookupError:
+            return ""
+        request = getattr(context, "request", None)
+        if self.http_stateless and request is not None:
+            if self.client_header:
+                value = request.headers.get(self.client_header)
+                if value:
+                    return f"header:{value}"
+            client = getattr(request, "client", None)
+            if client is not None:
+                return f"address:{client.host}"
+        return str(id(context.session))
+
+    def _output_text(self, result: CommandResult) -> str:
+        """stdout文本；输出被转存时只包含开头部分并注明完整输出的位置"""
+        text = result.stdout.decode('utf-8', errors='replace')
+        if result.spilled:
+            text += (
+                f"\n... [output truncated: showing first {len(result.stdout)} of "
+                f"{result.stdout_size} bytes; full output saved to {result.stdout_path}]"
+            )
+        return text
+
+    def _summary_text(self, stored: StoredResult) -> str:
+        """大结果的摘要：资源URI、行数、列名和前几行"""
+        return (
+            f"Result: {stored.uri}\n"
+            f"Rows: {stored.row_count}\n"
+            f"Columns: {', '.join(stored.columns)}\n\n"
+            f"{stored.head_text(SUMMARY_ROWS)}\n\n"
+            f"Showing the first {min(SUMMARY_ROWS, stored.row_count)} of {stored.row_count} rows. "
+            f"Read more with resources/read on {stored.uri}?offset={SUMMARY_ROWS}&limit=100 "
+            f"(add &columns=a,b for a subset) or the astroquery_result tool."
+        )
+
+    def _format_result(self, result: CommandResult,
+                       stored: Optional[StoredResult] = None) -> List[TextContent]:
+        """把执行结果格式化为工具输出；大结果只返回摘要"""
+        output_text = f"Command: {' '.join([self.astroquery_cli_path] + result.argv)}\n\n"
+        
+        if stored is not None:
+            output_text += f"Output (stored as resource):\n{self._summary_text(stored)}\n\n"
+        elif result.stdout:
+            output_text += f"Output:\n{self._output_text(result)}\n\n"
+        
+        if result.stderr:
+            output_text += f"Errors:\n{result.stderr.decode('utf-8')}\n\n"
+            
+        output_text += f"Return code: {result.returncode}"
+
+        for note in result.notes:
+            output_text += f"\n{note}"
+        
+        return [TextContent(type="text", text=output_text)]
+
+    def _tool_timeout(self, tool: str, arguments: Dict[str, Any], default: float = 30.0) -> float:
+        """调用超时：调用参数 > ASTROQUERY_MCP_TOOL_TIMEOUTS 中的按工具配置 > ASTROQUERY_MCP_TIMEOUT"""
+        if arguments.get("timeout") is not None:
+            return float(arguments["timeout"])
+        configured = config.env_mapping("TOOL_TIMEOUTS").get(tool)
+        try:
+            return float(configured) if configured else config.env_float("TIMEOUT", default)
+        except ValueError:
+            return default
+
+    @staticmethod
+    def _wants_table(arguments: Dict[str, Any]) -> bool:
+        """调用是否要求表格输出（指定列投影或过滤条件时隐含）"""
+        return (arguments.get("output") == "table"
+                or bool(arguments.get("columns")) or bool(arguments.get("where")))
+
+    async def _parse_table(self, result: CommandResult) -> "Table":
+        """在线程池中把输出解析为表，并记录解码耗时"""
+        from .tables import parse_output
+
+        loop = asyncio.get_event_loop()
+        with self.metrics.timer("decode_seconds", service=result.argv[0] if result.argv else ""):
+            return await loop.run_in_executor(None, lambda: parse_output(result.read_stdout()))
+
+    async def _format_table(self, result: CommandResult, arguments: Dict[str, Any]) -> List[TextContent]:
+        """把输出解析为按列的表，投影/过滤后以紧凑JSON返回；无法解析时回退为文本输出"""
+        try:
+            table = await self._parse_table(result)
+        except (ValueError, SyntaxError) as e:
+            # JSON/VOTable 解析错误分别是 ValueError/SyntaxError 的子类
+            result = replace(result, notes=result.notes + [f"Table: output is not a parsable table ({e})"])
+            return self._format_result(result, await self._publish(result))
+
+        max_rows = max(0, int(arguments.get("max_rows", TABLE_MAX_ROWS)))
+        matched = table.where(arguments.get("where") or []).select(arguments.get("columns") or None)
+        returned = matched.head(max_rows)
+        from .tables import table_json
+
+        text = table_json(
+            returned,
+            command=result.argv,
+            total_rows=len(table),
+            matched_rows=len(matched),
+            returned_rows=len(returned),
+            notes=result.notes,
+        )
+        return [TextContent(type="text", text=text)]
+
+    async def _rewrite_name_query(self, cmd: str, subcommand: str, args: List[Any], options: Dict[str, Any],
+                                  timeout: float) -> Optional[Tuple[str, List[Any], Dict[str, Any], str]]:
+        """把 "名称 + 半径" 的查询改写为 ra/dec 锥形检索；无法改写时返回 None
+
+        名称解析最多等待 timeout 秒（调用方从调用的超时中扣除所用时间）；
+        改写后的调用不符合锥形子命令的参数模式时不改写
+        """
+        if self.name_resolver is None or self.replay or not config.env_bool("NAME_REWRITE", True):
+            return None
+        if not any(key.lstrip("-").lower() in ("radius", "r") for key in options):
+            return None
+
+        commands = self.catalog.get() or {}
+        subcommands = commands.get(cmd, {}).get("subcommands", {})
+        target = rewrite_target(cmd, subcommand, subcommands, config.env_mapping("NAME_REWRITES"))
+        if target is None:
+            return None
+
+        name, name_option, name_index = target_name(options, args, self._subcommand_spec(cmd, subcommand))
+        if not name:
+            return None
+        try:
+            coordinates = await asyncio.wait_for(self.name_resolver.resolve(name), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if coordinates is None:
+            return None
+
+        ra, dec = coordinates
+        options = {key: value for key, value in options.items() if key != name_option}
+        options.update(ra=f"{ra:.6f}", dec=f"{dec:.6f}")
+        args = [arg for index, arg in enumerate(args) if index != name_index]
+
+        spec = self._subcommand_spec(cmd, target)
+        if spec is not None and self.validate_calls:
+            errors = validate_call(spec, args, options)
+            if errors:
+                print(f"Not rewriting {cmd} {subcommand} to {target}: {'; '.join(errors)}", file=sys.stderr)
+                return None
+        note = f"Resolved: {name} -> ra={ra:.6f} dec={dec:.6f} ({cmd} {subcommand} rewritten to {target})"
+        return target, args, options, note
+
+    async def _resolve_names(self, arguments: Dict[str, Any]) -> List[TextContent]:
+        """astroquery_resolve 工具：批量解析名称"""
+        names = [str(name) for name in arguments.get("names", [])]
+        if not names:
+            return [TextContent(type="text", text="No names provided")]
+
+        resolved = await self.name_resolver.resolve_many(names)
+        payload = {
+            name: None if coordinates is None else {"ra": coordinates[0], "dec": coordinates[1]}
+            for name, coordinates in resolved.items()
+        }
+        return [TextContent(type="text", text=json.dumps(payload))]
+
     async def _execute_generic_command(self, arguments: Dict[str, Any]) -> List[TextContent]:
         """执行通用命令"""
         command = arguments.get("command", "")
-        timeout = arguments.get("timeout", 30)
+        timeout = self._tool_timeout("execute", arguments)
         
         if not command:
             return [TextContent(type="text", text="No command provided")]
         
-        # 构建完整命令
-        full_command = [self.astroquery_cli_path] + command.split()
-        
         try:
-            result = await asyncio.create_subprocess_exec(
-                *full_command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=os.environ # 明确传递环境变量
-            )
-            
-            stdout, stderr = await asyncio.wait_for(result.communicate(), timeout=timeout)
-            
-            output_text = f"Command: {' '.join(full_command)}\n\n"
-            
-            if stdout:
-                output_text += f"Output:\n{stdout.decode('utf-8')}\n\n"
-            
-            if stderr:
-                output_text += f"Errors:\n{stderr.decode('utf-8')}\n\n"
-                
-            output_text += f"Return code: {result.returncode}"
-            
-            return [TextContent(type="text", text=output_text)]
+            result = await self._execute(Invocation(
+                command.split(), timeout,
+                use_cache=arguments.get("cache", True),
+                progress=self._progress_reporter(),
+            ))
+            if self._wants_table(arguments) and result.ok:
+                return await self._format_table(result, arguments)
+            return self._format_result(result, await self._publish(result))
             
         except asyncio.TimeoutError:
             return [TextContent(type="text", text=f"Command timed out after {timeout} seconds")]
         except Exception as e:
             return [TextContent(type="text", text=f"Error executing command: {str(e)}")]
     
+    def _table_format_supported(self, cmd: str, subcommand: str) -> bool:
+        """子命令是否接受格式选项（以及 table_format 这个取值）；参数模式未知时假定接受
+
+        不接受时不添加格式选项，改为解析aqc的文本输出
+        """
+        spec = self._subcommand_spec(cmd, subcommand)
+        if spec is None:
+            return True
+        option = find_option(spec, self.format_option)
+        return option is not None and (not option.get("enum") or self.table_format in option["enum"])
+
+    def _invalid_call(self, cmd: str, subcommand: str, spec: Dict[str, Any],
+                      errors: List[str]) -> List[TextContent]:
+        """参数校验失败：不启动aqc，直接返回错误和调用签名"""
+        self.metrics.inc("invalid_calls_total", service=cmd)
+        lines = [f"Invalid arguments for aqc {cmd} {subcommand}:"]
+        lines += [f"  - {error}" for error in errors]
+        lines += ["", f"Usage: {usage_text(cmd, subcommand, spec)}"]
+        return [TextContent(type="text", text="\n".join(lines))]
+
+    async def _execute_subcommand_tool(self, cmd: str, subcommand: str,
+                                       arguments: Dict[str, Any]) -> List[TextContent]:
+        """有类型的子命令工具：把顶层属性拆分为位置参数和选项后按特定命令执行"""
+        spec = self._subcommand_spec(cmd, subcommand)
+        args, options, errors = bind_arguments(spec, arguments)
+        if errors:
+            return self._invalid_call(cmd, subcommand, spec, errors)
+        control = {key: value for key, value in arguments.items() if key in CONTROL_PROPERTIES}
+        return await self._execute_specific_command(
+            cmd, dict(control, subcommand=subcommand, arguments=args, options=options))
+
     async def _execute_specific_command(self, cmd: str, arguments: Dict[str, Any]) -> List[TextContent]:
         """执行特定的astroquery命令"""
         subcommand = arguments.get("subcommand", "")
         args = arguments.get("arguments", [])
         options = arguments.get("options", {})
+        as_table = self._wants_table(arguments)
+        timeout = self._tool_timeout(cmd, arguments)
+        notes: List[str] = []
+
+        # 已知参数模式时先校验，无效调用不启动aqc
+        spec = self._subcommand_spec(cmd, subcommand)
+        if spec is not None and self.validate_calls:
+            errors = validate_call(spec, args, options)
+            if errors:
+                return self._invalid_call(cmd, subcommand, spec, errors)
+
+        # 带半径的按名称查询改写为按坐标的锥形检索（名称从共享缓存解析）；解析时间计入超时
+        started = time.monotonic()
+        rewritten = await self._rewrite_name_query(cmd, subcommand, args, options, timeout)
+        if rewritten is not None:
+            subcommand, args, options, note = rewritten
+            notes.append(note)
+        remaining = timeout - (time.monotonic() - started)
+        if remaining <= 0:
+            return [TextContent(type="text", text=f"Command timed out after {timeout} seconds")]
+
+        # 表格输出时要求aqc输出机器可读格式（调用方已指定格式时不覆盖）
+        if as_table and not any(key.lstrip("-") == self.format_option for key in options) \
+                and self._table_format_supported(cmd, subcommand):
+            options = dict(options, **{self.format_option: self.table_format})
         
         # 构建命令
-        command_parts = [self.astroquery_cli_path, cmd]
+        command_parts = [cmd]
         
         if subcommand:
             command_parts.append(subcommand)
         
-        # 添加选项
-        for key, value in options.items():
-            if key.startswith("--"):
+        # 添加选项（排序后命令向量与选项书写顺序无关，便于缓存）
+        spec = self._subcommand_spec(cmd, subcommand)
+        for key, value in sorted(options.items()):
+            option = find_option(spec, key) if spec is not None else None
+            if option is not None:
+                # 开关只写标志，可重复选项逐个写出
+                command_parts.extend(option_argv(option, value))
+            elif key.startswith("--"):
                 command_parts.extend([key, str(value)])
             else:
                 command_parts.extend([f"--{key}", str(value)])
@@ -259,32 +1432,407 @@ class AstroqueryMCPServer:
         command_parts.extend(str(arg) for arg in args)
         
         try:
-            result = await asyncio.create_subprocess_exec(
-                *command_parts,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=os.environ # 明确传递环境变量
-            )
-            
-            stdout, stderr = await asyncio.wait_for(result.communicate(), timeout=30)
-            
-            output_text = f"Command: {' '.join(command_parts)}\n\n"
-            
-            if stdout:
-                output_text += f"Output:\n{stdout.decode('utf-8')}\n\n"
-            
-            if stderr:
-                output_text += f"Errors:\n{stderr.decode('utf-8')}\n\n"
-                
-            output_text += f"Return code: {result.returncode}"
-            
-            return [TextContent(type="text", text=output_text)]
+            result = await self._execute(Invocation(
+                command_parts, remaining,
+                subcommand=subcommand,
+                arguments=[str(arg) for arg in args],
+                options={key: ",".join(map(str, value)) if isinstance(value, list) else str(value)
+                         for key, value in options.items()},
+                use_cache=arguments.get("cache", True),
+                progress=self._progress_reporter(),
+            ))
+            result.notes.extend(notes)
+            if as_table and result.ok:
+                return await self._format_table(result, arguments)
+            return self._format_result(result, await self._publish(result))
             
+        except asyncio.TimeoutError:
+            return [TextContent(type="text", text=f"Command timed out after {timeout} seconds")]
         except Exception as e:
             return [TextContent(type="text", text=f"Error: {str(e)}")]
     
+    def _job_timeout(self, arguments: Dict[str, Any]) -> float:
+        """作业超时：调用参数 > ASTROQUERY_MCP_TOOL_TIMEOUTS 中的 submit > ASTROQUERY_MCP_JOB_TIMEOUT"""
+        if arguments.get("timeout") is not None:
+            return float(arguments["timeout"])
+        configured = config.env_mapping("TOOL_TIMEOUTS").get("submit")
+        try:
+            return float(configured) if configured else config.env_float("JOB_TIMEOUT", 3600)
+        except ValueError:
+            return 3600.0
+
+    async def _run_job(self, argv: List[str], timeout: float, stdout_path: str) -> CommandResult:
+        """执行一个作业：经调度器排队后在一次性进程中运行（不占用常驻工作进程），stdout直接写入作业输出文件"""
+        service = argv[0] if argv else ""
+        key = cache_key(argv, self.catalog.version)
+        if self.replay:
+            result = await self._replay(key, Invocation(argv, timeout))
+            with open(stdout_path, "wb") as f:
+                f.write(result.read_stdout())
+            return result
+
+        # 所有作业在调度器中算作同一个客户端，不挤占交互式调用的公平份额
+        waited = await self.scheduler.acquire(service, "jobs")
+        self.metrics.observe("queue_wait_seconds", waited, service=service)
+        started = time.monotonic()
+        try:
+            self.metrics.inc("spawns_total", kind="job")
+            result = await run_subprocess(
+                self.astroquery_cli_path, argv, timeout,
+                reaper=self.reaper,
+                stdout_path=stdout_path,
+            )
+        except asyncio.TimeoutError:
+            self.metrics.inc("timeouts_total", service=service, stage="job")
+            self.metrics.inc("jobs_total", service=service, state=TIMED_OUT)
+            raise
+        finally:
+            self.scheduler.release(service)
+        self.metrics.observe("aqc_seconds", time.monotonic() - started, service=service, source="job")
+        self.metrics.inc("aqc_output_bytes_total", result.output_size, service=service)
+        self.metrics.inc("jobs_total", service=service, state=SUCCEEDED if result.ok else FAILED)
+        await self._record(key, result)
+        return replace(result, source="job")
+
+    def _job_payload(self, job: Job) -> Dict[str, Any]:
+        payload = job.to_dict()
+        payload["output_bytes"] = self.jobs.output_size(job.id)
+        return payload
+
+    def _submit_job(self, arguments: Dict[str, Any]) -> List[TextContent]:
+        """astroquery_submit 工具：在后台启动作业，立即返回作业ID"""
+        command = arguments.get("command", "")
+        if not command:
+            return [TextContent(type="text", text="No command provided")]
+
+        job = self.jobs.submit(command.split(), self._job_timeout(arguments))
+        payload = self._job_payload(job)
+        payload["hint"] = f"Poll with astroquery_job {{\"id\": \"{job.id}\"}}; cancel with astroquery_cancel"
+        return [TextContent(type="text", text=json.dumps(payload))]
+
+    def _read_job(self, arguments: Dict[str, Any]) -> List[TextContent]:
+        """astroquery_job 工具：作业状态和从 offset 开始的输出；不指定ID时列出最近的作业"""
+        job_id = arguments.get("id")
+        if not job_id:
+            jobs = [self._job_payload(job) for job in self.jobs.list()]
+            return [TextContent(type="text", text=json.dumps({"jobs": jobs}))]
+
+        job = self.jobs.get(str(job_id))
+        if job is None:
+            return [TextContent(type="text", text=f"Unknown job: {job_id}")]
+
+        offset = int(arguments.get("offset", 0))
+        output, next_offset = self.jobs.read_output(job, offset, int(arguments.get("max_bytes", JOB_OUTPUT_BYTES)))
+        payload = self._job_payload(job)
+        payload.update(offset=offset, next_offset=next_offset, output=output)
+        payload["complete"] = job.done and next_offset >= payload["output_bytes"]
+        if job.done:
+            payload["stderr"] = job.stderr or ""
+        return [TextContent(type="text", text=json.dumps(payload))]
+
+    async def _cancel_job(self, arguments: Dict[str, Any]) -> List[TextContent]:
+        """astroquery_cancel 工具"""
+        job_id = str(arguments.get("id", ""))
+        before = self.jobs.get(job_id)
+        if before is None:
+            return [TextContent(type="text", text=f"Unknown job: {job_id}")]
+        try:
+            job = await self.jobs.cancel(job_id)
+        except JobError as e:
+            return [TextContent(type="text", text=f"Cannot cancel job: {e}")]
+        if not before.done and job.state == CANCELLED:
+            self.metrics.inc("jobs_total", service=job.argv[0] if job.argv else "", state=CANCELLED)
+        return [TextContent(type="text", text=json.dumps(self._job_payload(job)))]
+
+    async def _execute_batch(self, arguments: Dict[str, Any]) -> List[TextContent]:
+        """对多个目标并发执行同一命令模板，合并为一张带逐行状态的结果"""
+        template = arguments.get("command", "").split()
+        rows = [{"target": str(target)} for target in arguments.get("targets", [])]
+        rows += [dict(row) for row in arguments.get("rows", [])]
+        timeout = self._tool_timeout("batch", arguments)
+        use_cache = arguments.get("cache", True)
+        semaphore = asyncio.Semaphore(max(1, int(arguments.get("concurrency", 4))))
+
+        if not template:
+            return [TextContent(type="text", text="No command provided")]
+        if not rows:
+            return [TextContent(type="text", text="No targets or rows provided")]
+
+        async def run_row(row: Dict[str, Any]) -> Tuple[str, Optional[CommandResult], str]:
+            try:
+                # 逐个词替换，带空格的目标名（如 "NGC 2024"）仍是一个参数
+                argv = [token.format_map(row) for token in template]
+            except (KeyError, IndexError, ValueError) as e:
+                return "invalid", None, f"Cannot fill template: {e}"
+            async with semaphore:
+                try:
+                    result = await self._execute(Invocation(argv, timeout, use_cache=use_cache))
+                except asyncio.TimeoutError:
+                    return "timeout", None, f"Timed out after {timeout} seconds"
+                except Exception as e:
+                    return "error", None, str(e)
+            return ("ok" if result.ok else "failed"), result, ""
+
+        outcomes = await asyncio.gather(*(run_row(row) for row in rows))
+
+        label_key = "target" if all("target" in row for row in rows) else None
+        summary_rows = []
+        for index, (row, (status, result, message)) in enumerate(zip(rows, outcomes)):
+            label = row[label_key] if label_key else ", ".join(f"{k}={v}" for k, v in row.items())
+            summary_rows.append([
+                str(index),
+                str(label),
+                status,
+                "" if result is None else str(result.returncode),
+                "; ".join(result.notes) if result is not None else message,
+            ])
+
+        ok_count = sum(1 for status, _, _ in outcomes if status == "ok")
+        output_text = (
+            f"Batch: {' '.join(template)} ({len(rows)} rows, {ok_count} ok, "
+            f"{len(rows) - ok_count} not ok)\n\n"
+        )
+        output_text += _format_text_table(["row", "input", "status", "returncode", "details"], summary_rows)
+
+        # 能解析为表的结果合并为一张表，row 列是批量中的行号；其余结果逐行附上原始输出
+        tables = []
+        for index, (status, result, _) in enumerate(outcomes):
+            if status == "ok":
+                try:
+                    tables.append((index, await self._parse_table(result)))
+                except (ValueError, SyntaxError):
+                    pass
+        merged = {index for index, _ in tables}
+        if tables:
+            from .tables import concat
+            table = concat(tables)
+            output_text += f"\n\nMerged table ({len(table)} rows from {len(tables)} results):\n"
+            output_text += _format_text_table(table.names, [
+                ["" if value is None or value != value else str(value) for value in row]
+                for row in zip(*(table.columns[name] for name in table.names))
+            ])
+
+        for index, (status, result, message) in enumerate(outcomes):
+            if index in merged:
+                continue
+            output_text += f"\n\n[{index}] {summary_rows[index][1]}: {status}\n"
+            if result is None:
+                output_text += message
+                continue
+            if result.stdout:
+                output_text += self._output_text(result)
+            if result.stderr:
+                output_text += f"Errors:\n{result.stderr.decode('utf-8')}"
+
+        return [TextContent(type="text", text=output_text)]
+
+    async def _execute_crossmatch(self, arguments: Dict[str, Any]) -> List[TextContent]:
+        """并发执行星表查询，并把源表与每个星表按位置匹配"""
+        from .crossmatch import coordinates, crossmatch, has_kdtree, parse_angle
+
+        sources = arguments.get("sources", [])
+        catalogs = arguments.get("catalogs", [])
+        radius = float(arguments.get("radius", 1.0))
+        nearest = arguments.get("nearest", True)
+        timeout = self._tool_timeout("crossmatch", arguments, 60)
+        use_cache = arguments.get("cache", True)
+
+        if not sources:
+            return [TextContent(type="text", text="No sources provided")]
+        if not catalogs:
+            return [TextContent(type="text", text="No catalogs provided")]
+
+        # 源表的字符串赤经按六十进制小时解析
+        source_ra = array("d", (parse_angle(source["ra"], hours=isinstance(source["ra"], str)
+                                            and not _is_number(source["ra"])) for source in sources))
+        source_dec = array("d", (parse_angle(source["dec"]) for source in sources))
+        source_ids = [source.get("id", index) for index, source in enumerate(sources)]
+        loop = asyncio.get_event_loop()
+
+        async def match_catalog(index: int, spec: Dict[str, Any]) -> Dict[str, Any]:
+            name = spec.get("name") or f"catalog{index}"
+            argv = spec.get("command", "").split()
+            summary: Dict[str, Any] = {"name": name, "command": " ".join(argv)}
+            if not argv:
+                return dict(summary, status="invalid", error="No command provided")
+            if f"--{self.format_option}" not in argv and \
+                    self._table_format_supported(argv[0], argv[1] if len(argv) > 1 else ""):
+                argv += [f"--{self.format_option}", self.table_format]
+
+            try:
+                result = await self._execute(Invocation(argv, timeout, use_cache=use_cache))
+            except asyncio.TimeoutError:
+                return dict(summary, status="timeout", error=f"Timed out after {timeout} seconds")
+            if not result.ok:
+                stderr = result.stderr.decode("utf-8", errors="replace").strip()
+                return dict(summary, status="failed", error=stderr or f"Return code {result.returncode}")
+
+            try:
+                table = await self._parse_table(result)
+                ra, dec = coordinates(table, spec.get("ra_column"), spec.get("dec_column"))
+                extra = table.select(spec["columns"]) if spec.get("columns") else None
+                matches = await loop.run_in_executor(
+                    None, lambda: crossmatch(source_ra, source_dec, ra, dec, radius, nearest=nearest)
+                )
+            except (ValueError, SyntaxError) as e:
+                return dict(summary, status="error", error=str(e))
+
+            columns: Dict[str, List[Any]] = {
+                "source": [source_ids[i] for i, _, _ in matches],
+                "row": [j for _, j, _ in matches],
+                "separation_arcsec": [round(sep, 4) for _, _, sep in matches],
+                "ra": [ra[j] for _, j, _ in matches],
+                "dec": [dec[j] for _, j, _ in matches],
+            }
+            if extra is not None:
+                data = extra.to_dict()["data"]
+                for column in extra.names:
+                    columns[column] = [data[column][j] for _, j, _ in matches]
+
+            return dict(
+                summary,
+                status="ok",
+                rows=len(table),
+                matched_sources=len({i for i, _, _ in matches}),
+                matches=columns,
+                notes=result.notes,
+            )
+
+        outcomes = await asyncio.gather(*(match_catalog(i, spec) for i, spec in enumerate(catalogs)))
+        payload = {
+            "radius_arcsec": radius,
+            "nearest": nearest,
+            "sources": len(sources),
+            "method": "kdtree" if has_kdtree() else "grid",
+            "catalogs": outcomes,
+        }
+        return [TextContent(type="text", text=json.dumps(payload, separators=(",", ":")))]
+
+    def stats(self) -> Dict[str, Any]:
+        """共享后端的运行状态（HTTP模式的 /health 使用）"""
+        return {
+            "scheduler": self.scheduler.stats(),
+            "inflight": len(self._inflight),
+            "processes": {
+                "active": self.reaper.active,
+                "killed": self.reaper.killed,
+                "leaked": self.reaper.leaked,
+                "workers_spawned": None if self.worker_pool is None else self.worker_pool.spawned,
+            },
+            "result_cache": None if self.result_cache is None else {
+                "hits": self.result_cache.hits,
+                "misses": self.result_cache.misses,
+                "hit_rate": _ratio(self.result_cache.hits, self.result_cache.hits + self.result_cache.misses),
+                "entries": len(self.result_cache),
+                "bytes": self.result_cache.size_bytes,
+            },
+            "cone_cache": None if self.cone_cache is None else {
+                "hits": self.cone_cache.hits, "entries": len(self.cone_cache),
+            },
+            "name_cache": None if self.name_resolver is None else {
+                "hits": self.name_resolver.hits,
+                "misses": self.name_resolver.misses,
+                "hit_rate": _ratio(self.name_resolver.hits, self.name_resolver.hits + self.name_resolver.misses),
+                "entries": len(self.name_resolver),
+            },
+            "archive": None if self.archive is None else {
+                "mode": "replay" if self.replay else "record",
+                "hits": self.archive.hits,
+                "misses": self.archive.misses,
+                "entries": len(self.archive),
+                "bytes": self.archive.size_bytes,
+                "raw_bytes": self.archive.raw_bytes,
+            },
+            "jobs": None if self.jobs is None else {
+                "running": self.jobs.running,
+                "queued": self.jobs.queued,
+                "stored": self.jobs.store.count(),
+            },
+        }
+
+    def _state_samples(self) -> List[Sample]:
+        """由各组件当前状态得到的 Prometheus 指标"""
+        scheduler = self.scheduler.stats()
+        samples: List[Sample] = [
+            ("queue_depth", "gauge", {}, scheduler["queued"]),
+            ("running", "gauge", {}, scheduler["running"]),
+            ("inflight", "gauge", {}, len(self._inflight)),
+            ("rejected_total", "counter", {}, scheduler["rejected"]),
+            ("processes_active", "gauge", {}, self.reaper.active),
+            ("processes_killed_total", "counter", {}, self.reaper.killed),
+            ("processes_leaked_total", "counter", {}, self.reaper.leaked),
+        ]
+        samples += [("queue_depth_by_client", "gauge", {"client": client}, depth)
+                    for client, depth in scheduler["queued_by_client"].items()]
+        if self.worker_pool is not None:
+            samples.append(("spawns_total", "counter", {"kind": "worker"}, self.worker_pool.spawned))
+        if self.archive is not None:
+            samples.append(("archive_entries", "gauge", {}, len(self.archive)))
+            samples.append(("archive_bytes", "gauge", {}, self.archive.size_bytes))
+        if self.jobs is not None:
+            samples.append(("jobs_running", "gauge", {}, self.jobs.running))
+            samples.append(("jobs_queued", "gauge", {}, self.jobs.queued))
+        for name, cache in (("result", self.result_cache), ("cone", self.cone_cache), ("name", self.name_resolver)):
+            if cache is None:
+                continue
+            samples.append(("cache_hits_total", "counter", {"cache": name}, cache.hits))
+            if hasattr(cache, "misses"):
+                samples.append(("cache_misses_total", "counter", {"cache": name}, cache.misses))
+            samples.append(("cache_entries", "gauge", {"cache": name}, len(cache)))
+        return samples
+
+    def metrics_text(self) -> str:
+        """Prometheus 文本格式的全部指标（HTTP模式的 /metrics 使用）"""
+        return self.metrics.prometheus(self._state_samples())
+
+    def _read_stats(self, arguments: Dict[str, Any]) -> List[TextContent]:
+        """astroquery_stats 工具：JSON 或 Prometheus 文本格式的运行指标"""
+        if arguments.get("format") == "prometheus":
+            return [TextContent(type="text", text=self.metrics_text())]
+        payload = dict(self.stats(), metrics=self.metrics.snapshot())
+        return [TextContent(type="text", text=json.dumps(payload))]
+
     async def run(self):
-        """运行MCP服务器"""
+        """运行MCP服务器；ASTROQUERY_MCP_TRANSPORT 选择 stdio（默认）或 http"""
+        transport = (config.env_str("TRANSPORT") or "stdio").lower()
+        if transport not in ("stdio", "http", "streamable-http", "sse"):
+            raise ValueError(f"Unknown transport: {transport}")
+
+        cleanup_spill_dir()
+        if self.prewarm_catalog:
+            self.start_catalog_prewarm()
+            if self.worker_pool is not None:
+                asyncio.ensure_future(self.worker_pool.start())
+
+        reaping = asyncio.ensure_future(self._reap_periodically())
+        try:
+            if transport == "stdio":
+                await self._run_stdio()
+            else:
+                await self._run_http()
+        finally:
+            reaping.cancel()
+            if self.jobs is not None:
+                await self.jobs.close()
+            self.reaper.kill_all()
+            if self.worker_pool is not None:
+                await self.worker_pool.close()
+            if self.engine is not None:
+                self.engine.close()
+            if self.archive is not None:
+                await asyncio.gather(*self._archiving)
+                self.archive.close()
+
+    async def _reap_periodically(self) -> None:
+        """定期清理已结束执行遗留的子进程"""
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            self.reaper.sweep()
+
+    async def _run_stdio(self):
+        """单个客户端，通过stdin/stdout通信"""
+        from mcp.server.stdio import stdio_server
+
         async with stdio_server() as (read_stream, write_stream):
             await self.server.run(
                 read_stream, 
@@ -293,12 +1841,28 @@ class AstroqueryMCPServer:
                     server_name="astroquery-cli",
                     server_version="1.0.0",
                     capabilities=self.server.get_capabilities(
-                        notification_options=None,
-                        experimental_capabilities=None
+                        notification_options=NotificationOptions(),
+                        experimental_capabilities={}
                     )
                 )
             )
 
+    async def _run_http(self):
+        """多个客户端共享本实例：Streamable HTTP 在 /mcp，旧版SSE在 /sse"""
+        from .transport import create_http_app, serve_http
+
+        app = create_http_app(
+            self.server,
+            self.stats,
+            metrics=self.metrics_text,
+            json_response=config.env_bool("HTTP_JSON_RESPONSE"),
+            stateless=self.http_stateless,
+        )
+        host = config.env_str("HOST", "127.0.0.1")
+        port = config.env_int("PORT", 8000)
+        print(f"Serving MCP on http://{host}:{port}/mcp (SSE: /sse, metrics: /metrics)", file=sys.stderr)
+        await serve_http(app, host, port)
+
 
 async def main():
     """主函数"""
@@ -0,0 +1,67 @@
+"""
+并发调用合并（single-flight）
+相同规范化命令的并发调用共享同一次执行，所有等待者得到同一结果；
+每个等待者按自己的超时等待，共享的执行在最后一个等待者离开时才取消，
+因此实际时限是各等待者中最长的那个
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Future[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键合并进行中的异步调用"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]],
+                 timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """执行或加入键对应的调用，返回 (结果, 是否共享了他人的执行)
+
+        超过本调用的 timeout 时抛出 asyncio.TimeoutError；factory 的执行本身不应再设时限
+        """
+        call = self._calls.get(key)
+        shared = call is not None
+
+        if call is None:
+            call = _Call(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _task: self._forget(key, call))
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            # shield：单个等待者超时或取消不影响其他等待者
+            return await asyncio.wait_for(asyncio.shield(call.task), timeout), shared
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            # 最后一个等待者离开时才取消实际执行
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+                # 之后到来的相同调用不能再加入被取消的执行
+                self._forget(key, call)
+                # 等待执行完成清理（释放调度名额、终止进程）后再返回
+                await asyncio.wait([call.task])
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
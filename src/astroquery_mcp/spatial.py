@@ -0,0 +1,258 @@
+"""
+锥形检索的空间缓存
+按"星表上下文"（命令、子命令、除中心和半径外的其他参数）保存已获取的锥形检索结果；
+新的锥形完全落在某个已缓存锥形内时，直接在本地按角距过滤行得到结果，不再访问存档
+
+表格解析和坐标处理只在第一次遇到锥形检索时导入
+"""
+
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .execution import CommandResult, Invocation
+
+RA_OPTIONS = ("ra",)
+DEC_OPTIONS = ("dec",)
+RADIUS_OPTIONS = ("radius", "r")
+# 行数上限类选项：结果行数达到上限时说明被截断，不能用于回答子区域
+ROW_LIMIT_OPTIONS = ("row-limit", "max-rows", "limit", "top", "maxrec")
+
+# 半径单位 -> 角秒
+_UNITS = {
+    "arcsec": 1.0, "as": 1.0, '"': 1.0,
+    "arcmin": 60.0, "am": 60.0, "'": 60.0,
+    "deg": 3600.0, "d": 3600.0, "degree": 3600.0, "degrees": 3600.0,
+}
+_RADIUS_RE = re.compile(r"^\s*([0-9.eE+-]+)\s*([a-zA-Z'\"]*)\s*$")
+
+Cone = Tuple[float, float, float]
+
+
+def _normalized(key: str) -> str:
+    return key.lstrip("-").replace("_", "-").lower()
+
+
+def parse_radius(value: str) -> float:
+    """解析半径（角秒）；没有单位时按 DEFAULT_RADIUS_UNIT 处理"""
+    from .engine import DEFAULT_RADIUS_UNIT
+    match = _RADIUS_RE.match(str(value))
+    if match is None:
+        raise ValueError(f"Invalid radius: {value!r}")
+    number, unit = match.groups()
+    unit = (unit or DEFAULT_RADIUS_UNIT).lower()
+    if unit not in _UNITS:
+        raise ValueError(f"Unknown radius unit: {unit}")
+    return float(number) * _UNITS[unit]
+
+
+def parse_cone(invocation: Invocation) -> Optional[Tuple[Cone, Tuple, Optional[int]]]:
+    """从结构化调用中解析 ((ra, dec, 半径角秒), 星表上下文, 行数上限)；不是锥形检索时返回 None
+
+    没有行数上限选项时按后端默认的 DEFAULT_ROW_LIMIT 处理；上限不大于0表示不限行数
+    """
+    if not invocation.structured:
+        return None
+    from .engine import DEFAULT_ROW_LIMIT
+
+    ra = dec = radius = None
+    row_limit: Optional[int] = DEFAULT_ROW_LIMIT
+    rest = []
+    for key, value in (invocation.options or {}).items():
+        name = _normalized(key)
+        if name in RA_OPTIONS:
+            ra = value
+        elif name in DEC_OPTIONS:
+            dec = value
+        elif name in RADIUS_OPTIONS:
+            radius = value
+        else:
+            if name in ROW_LIMIT_OPTIONS:
+                try:
+                    row_limit = int(value)
+                except ValueError:
+                    return None
+                if row_limit <= 0:
+                    row_limit = None
+            rest.append((name, str(value)))
+    if ra is None or dec is None or radius is None:
+        return None
+    from .crossmatch import parse_angle
+
+    try:
+        cone = (parse_angle(ra, hours=_sexagesimal(ra)), parse_angle(dec), parse_radius(radius))
+    except ValueError:
+        return None
+
+    context = (invocation.command, invocation.subcommand,
+               tuple(invocation.arguments or ()), tuple(sorted(rest)))
+    return cone, context, row_limit
+
+
+def _sexagesimal(value: str) -> bool:
+    try:
+        float(value)
+        return False
+    except ValueError:
+        return True
+
+
+def _vector(ra: float, dec: float) -> Tuple[float, float, float]:
+    a, d = math.radians(ra), math.radians(dec)
+    return (math.cos(d) * math.cos(a), math.cos(d) * math.sin(a), math.sin(d))
+
+
+def separation(ra1: float, dec1: float, ra2: float, dec2: float) -> float:
+    """两点角距（角秒）"""
+    x1, y1, z1 = _vector(ra1, dec1)
+    x2, y2, z2 = _vector(ra2, dec2)
+    chord = math.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2 + (z1 - z2) ** 2)
+    return math.degrees(2 * math.asin(min(1.0, chord / 2))) * 3600
+
+
+def contains(outer: Cone, inner: Cone) -> bool:
+    """outer 锥形是否完全包含 inner 锥形"""
+    return separation(outer[0], outer[1], inner[0], inner[1]) + inner[2] <= outer[2] * (1 + 1e-9)
+
+
+def _split_table(text: str) -> Optional[Tuple[List[str], List[str]]]:
+    """把CSV或定宽文本表拆为 (表头行, 数据行)；其他格式返回 None"""
+    from .tables import detect_layout
+    lines = text.splitlines()
+    comments = [line for line in lines if line.startswith("#")]
+    body = [line for line in lines if not line.startswith("#")]
+    layout = detect_layout(body)
+    if layout["layout"] not in ("csv", "fixed"):
+        return None
+    header = comments + body[:layout["data_start"]]
+    data = [line for line in body[layout["data_start"]:] if line.strip()]
+    return header, data
+
+
+class _ConeEntry:
+    __slots__ = ("cone", "result", "header", "rows", "ra", "dec", "stored_at", "expires_at", "size")
+
+    def __init__(self, cone: Cone, result: CommandResult, header: List[str], rows: List[str],
+                 ra, dec, stored_at: float, expires_at: float):
+        self.cone = cone
+        self.result = result
+        self.header = header
+        self.rows = rows
+        self.ra = ra
+        self.dec = dec
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.size = len(result.stdout)
+
+
+class ConeCache:
+    """已获取锥形检索结果的空间缓存（按星表上下文索引，LRU按字节数限制）"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, default_ttl: float = 3600.0,
+                 service_ttls: Optional[Dict[str, float]] = None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.service_ttls = dict(service_ttls or {})
+        self._entries: "OrderedDict[int, Tuple[Tuple, _ConeEntry]]" = OrderedDict()
+        self._by_context: Dict[Tuple, List[int]] = {}
+        self._next_id = 0
+        self._bytes = 0
+        self.hits = 0
+
+    def lookup(self, invocation: Invocation) -> Optional[CommandResult]:
+        """查询完全落在某个已缓存锥形内时，在本地过滤出结果"""
+        parsed = parse_cone(invocation)
+        if parsed is None:
+            return None
+        cone, context, _ = parsed
+
+        now = time.time()
+        best: Optional[Tuple[int, _ConeEntry]] = None
+        for entry_id in list(self._by_context.get(context, ())):
+            entry = self._entries[entry_id][1]
+            if entry.expires_at <= now:
+                self._remove(entry_id)
+                continue
+            # 选择包含查询的最小锥形，需要过滤的行最少
+            if contains(entry.cone, cone) and (best is None or entry.cone[2] < best[1].cone[2]):
+                best = (entry_id, entry)
+        if best is None:
+            return None
+
+        entry_id, entry = best
+        self._entries.move_to_end(entry_id)
+        ra, dec, radius = cone
+        selected = [row for row, row_ra, row_dec in zip(entry.rows, entry.ra, entry.dec)
+                    if row_ra == row_ra and row_dec == row_dec
+                    and separation(ra, dec, row_ra, row_dec) <= radius]
+        self.hits += 1
+
+        stdout = "\n".join(entry.header + selected) + "\n"
+        return CommandResult(
+            argv=list(invocation.argv),
+            returncode=0,
+            stdout=stdout.encode("utf-8"),
+            source="cone-cache",
+            notes=[f"Cone cache: {len(selected)} of {len(entry.rows)} rows from a cached "
+                   f"{entry.cone[2] / 60:g}' cone (age {now - entry.stored_at:.0f}s)"],
+        )
+
+    def add(self, invocation: Invocation, result: CommandResult, age: float = 0.0) -> bool:
+        """缓存一次锥形检索结果；被新结果包含的旧锥形随之移除
+
+        age 是结果已有的年龄，缓存的有效期相应缩短
+        """
+        parsed = parse_cone(invocation)
+        if parsed is None or not result.ok or result.spilled:
+            return False
+        cone, context, row_limit = parsed
+        ttl = self.service_ttls.get(invocation.command, self.default_ttl) - age
+        if ttl <= 0 or len(result.stdout) > self.max_bytes:
+            return False
+
+        text = result.stdout.decode("utf-8", errors="replace")
+        split = _split_table(text)
+        if split is None:
+            return False
+        header, rows = split
+        # 结果被行数上限截断时不能代表整个锥形
+        if row_limit is not None and len(rows) >= row_limit:
+            return False
+        from .crossmatch import coordinates
+        from .tables import parse_text
+        try:
+            table = parse_text(text)
+            ra, dec = coordinates(table)
+        except ValueError:
+            return False
+        if len(table) != len(rows):
+            return False
+
+        for entry_id in list(self._by_context.get(context, ())):
+            if contains(cone, self._entries[entry_id][1].cone):
+                self._remove(entry_id)
+
+        now = time.time()
+        entry = _ConeEntry(cone, result, header, rows, ra, dec, now, now + ttl)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (context, entry)
+        self._by_context.setdefault(context, []).append(entry_id)
+        self._bytes += entry.size
+
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+        return True
+
+    def _remove(self, entry_id: int) -> None:
+        context, entry = self._entries.pop(entry_id)
+        self._bytes -= entry.size
+        ids = self._by_context[context]
+        ids.remove(entry_id)
+        if not ids:
+            del self._by_context[context]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,325 @@
+"""
+表格输出解析
+把aqc的机器可读输出（CSV/JSON/VOTable，或astropy定宽文本）解码为按列存储的表，
+数值列使用 array 存储；支持服务器端列投影和行过滤，结果以紧凑JSON返回
+"""
+
+import csv
+import json
+import math
+import operator
+import re
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# 视为缺失值的单元格文本
+MISSING = {"", "--", "nan", "NaN", "null", "None", "NULL"}
+
+_DASHES_RE = re.compile(r"-+")
+_CONDITION_RE = re.compile(r"^\s*([^\s<>=!~]+)\s*(==|!=|<=|>=|<|>|=|~)\s*(.*?)\s*$")
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def detect_layout(lines: Sequence[str], scan: int = 50) -> Dict[str, Any]:
+    """识别文本表格布局：astropy风格定宽表（以 ---- 行分隔表头）、CSV，或逐行文本"""
+    for index, line in enumerate(lines[:scan]):
+        stripped = line.strip()
+        if stripped and set(stripped) <= {"-", " "} and index > 0:
+            spans = [m.start() for m in _DASHES_RE.finditer(line)]
+            # 表头块的第一行是列名（之后可能是单位行）
+            start = index - 1
+            while start > 0 and lines[start - 1].strip():
+                start -= 1
+            # 跳过 astropy 的 "<Table length=N>" 标题行
+            if lines[start].lstrip().startswith("<") and start + 1 < index:
+                start += 1
+            names_line = lines[start]
+            bounds = list(zip(spans, spans[1:] + [None]))
+            names = [names_line[a:b].strip() if b is not None else names_line[a:].strip()
+                     for a, b in bounds]
+            names = [name or f"col{i}" for i, name in enumerate(names)]
+            return {"layout": "fixed", "columns": names, "spans": bounds, "data_start": index + 1}
+
+    if len(lines) >= 2 and "," in lines[0]:
+        header = next(csv.reader([lines[0]]))
+        if len(header) == len(next(csv.reader([lines[1]]))):
+            return {"layout": "csv", "columns": [h.strip() for h in header], "spans": None,
+                    "data_start": 1}
+
+    return {"layout": "lines", "columns": ["line"], "spans": None, "data_start": 0}
+
+
+def _as_int(value: Any) -> int:
+    """严格的整数转换：浮点数（包括 JSON 中的 1.5）不当作整数"""
+    if isinstance(value, (bool, float)):
+        raise ValueError(value)
+    return int(value)
+
+
+def _typed(values: Sequence[Any]) -> Tuple[str, Any]:
+    """推断列类型：整数/浮点数使用 array，布尔和字符串保留为列表（缺失值为 None）"""
+    present = [v for v in values if v is not None and not (isinstance(v, str) and v.strip() in MISSING)]
+    missing = len(present) != len(values)
+
+    if present and all(isinstance(v, bool) or str(v).strip() in ("True", "False", "true", "false")
+                       for v in present):
+        return "bool", [None if _is_missing(v) else (v if isinstance(v, bool) else str(v).strip().lower() == "true")
+                        for v in values]
+
+    if not missing:
+        try:
+            return "int", array("q", (_as_int(v) for v in values))
+        except (TypeError, ValueError, OverflowError):
+            pass
+    try:
+        return "float", array("d", (math.nan if _is_missing(v) else float(v) for v in values))
+    except (TypeError, ValueError):
+        pass
+
+    return "str", [None if _is_missing(v) else str(v) for v in values]
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and value.strip() in MISSING)
+
+
+class Table:
+    """按列存储的表"""
+
+    def __init__(self, names: List[str], columns: Dict[str, Any], types: Dict[str, str],
+                 units: Optional[Dict[str, str]] = None):
+        self.names = names
+        self.columns = columns
+        self.types = types
+        self.units = units or {}
+
+    @classmethod
+    def from_columns(cls, names: List[str], raw: Dict[str, Sequence[Any]],
+                     units: Optional[Dict[str, str]] = None) -> "Table":
+        columns, types = {}, {}
+        for name in names:
+            types[name], columns[name] = _typed(raw[name])
+        return cls(names, columns, types, units)
+
+    @classmethod
+    def from_rows(cls, names: List[str], rows: Sequence[Sequence[Any]],
+                  units: Optional[Dict[str, str]] = None) -> "Table":
+        raw = {name: [row[i] if i < len(row) else None for row in rows] for i, name in enumerate(names)}
+        return cls.from_columns(names, raw, units)
+
+    def __len__(self) -> int:
+        return len(self.columns[self.names[0]]) if self.names else 0
+
+    def select(self, names: Optional[Sequence[str]]) -> "Table":
+        """列投影"""
+        if not names:
+            return self
+        unknown = [name for name in names if name not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        return Table(list(names), {n: self.columns[n] for n in names},
+                     {n: self.types[n] for n in names},
+                     {n: self.units[n] for n in names if n in self.units})
+
+    def take(self, indices: Sequence[int]) -> "Table":
+        """按行号取子表"""
+        columns = {}
+        for name in self.names:
+            column = self.columns[name]
+            if isinstance(column, array):
+                columns[name] = array(column.typecode, (column[i] for i in indices))
+            else:
+                columns[name] = [column[i] for i in indices]
+        return Table(list(self.names), columns, dict(self.types), dict(self.units))
+
+    def head(self, count: int) -> "Table":
+        return self if len(self) <= count else self.take(range(count))
+
+    def where(self, conditions: Sequence[str]) -> "Table":
+        """行过滤；条件形如 "Vmag < 12"、"otype == Star"、"MAIN_ID ~ NGC"（包含，不区分大小写）"""
+        if not conditions:
+            return self
+
+        selected = range(len(self))
+        for condition in conditions:
+            match = _CONDITION_RE.match(condition)
+            if match is None:
+                raise ValueError(f"Invalid filter: {condition!r}")
+            name, op, text = match.groups()
+            if name not in self.columns:
+                raise ValueError(f"Unknown column in filter: {name}")
+
+            column = self.columns[name]
+            kind = self.types[name]
+            text = text.strip("'\"")
+            if op == "~":
+                needle = text.lower()
+                selected = [i for i in selected
+                            if column[i] is not None and needle in str(column[i]).lower()]
+                continue
+
+            if kind in ("int", "float"):
+                value: Any = float(text)
+            elif kind == "bool":
+                value = text.lower() == "true"
+            else:
+                value = text
+            compare = _OPERATORS[op]
+            # 缺失值（None/NaN）不满足任何比较
+            selected = [i for i in selected
+                        if column[i] is not None and column[i] == column[i] and compare(column[i], value)]
+
+        return self.take(selected)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """紧凑的按列JSON表示；NaN 输出为 null"""
+        data = {}
+        for name in self.names:
+            column = self.columns[name]
+            if self.types[name] == "float":
+                data[name] = [None if v != v else v for v in column]
+            else:
+                data[name] = list(column)
+        return {
+            "columns": [
+                dict({"name": name, "type": self.types[name]},
+                     **({"unit": self.units[name]} if self.units.get(name) else {}))
+                for name in self.names
+            ],
+            "data": data,
+        }
+
+
+def parse_csv(text: str) -> Table:
+    """解析CSV（跳过 # 开头的注释行，兼容ECSV）"""
+    lines = [line for line in text.splitlines() if line.strip() and not line.startswith("#")]
+    rows = list(csv.reader(lines))
+    if not rows:
+        raise ValueError("empty CSV output")
+    names = [name.strip() for name in rows[0]]
+    return Table.from_rows(names, rows[1:])
+
+
+def parse_json(text: str) -> Table:
+    """解析JSON：记录列表、按列的对象，或 {"columns": [...], "data"/"rows": [...]}"""
+    document = json.loads(text)
+    if isinstance(document, dict):
+        for key in ("data", "rows", "results", "table"):
+            if key in document and isinstance(document[key], (list, dict)):
+                columns = document.get("columns")
+                if columns and isinstance(document[key], list) and document[key] \
+                        and isinstance(document[key][0], list):
+                    names = [c["name"] if isinstance(c, dict) else str(c) for c in columns]
+                    return Table.from_rows(names, document[key])
+                document = document[key]
+                break
+
+    if isinstance(document, list):
+        if not document:
+            raise ValueError("empty JSON output")
+        if not all(isinstance(record, dict) for record in document):
+            raise ValueError("JSON output is not a list of records")
+        names: List[str] = []
+        for record in document:
+            names.extend(key for key in record if key not in names)
+        return Table.from_rows(names, [[record.get(name) for name in names] for record in document])
+
+    if isinstance(document, dict) and all(isinstance(v, list) for v in document.values()):
+        names = list(document)
+        return Table.from_columns(names, document)
+
+    raise ValueError("JSON output is not a table")
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_votable(data: bytes) -> Table:
+    """解析VOTable（TABLEDATA编码，取第一个表）"""
+    # 只有VOTable输出才需要XML解析器，延迟导入以缩短服务器启动时间
+    from xml.etree import ElementTree
+
+    root = ElementTree.fromstring(data)
+    for table in root.iter():
+        if _local(table.tag) != "TABLE":
+            continue
+        fields = [element for element in table if _local(element.tag) == "FIELD"]
+        names = [field.get("name") or field.get("ID") or f"col{i}" for i, field in enumerate(fields)]
+        units = {name: field.get("unit") for name, field in zip(names, fields) if field.get("unit")}
+
+        rows = []
+        for element in table.iter():
+            tag = _local(element.tag)
+            if tag == "BINARY" or tag == "BINARY2" or tag == "FITS":
+                raise ValueError("only TABLEDATA-encoded VOTables are supported")
+            if tag == "TR":
+                rows.append([(td.text or "").strip() for td in element if _local(td.tag) == "TD"])
+        return Table.from_rows(names, rows, units)
+
+    raise ValueError("VOTable output contains no TABLE")
+
+
+def parse_text(text: str) -> Table:
+    """解析文本表：CSV或astropy定宽表"""
+    # ECSV 等格式以 # 开头的元数据行不参与布局识别
+    lines = [line for line in text.splitlines() if not line.startswith("#")]
+    layout = detect_layout(lines)
+    if layout["layout"] == "csv":
+        return parse_csv(text)
+    if layout["layout"] != "fixed":
+        raise ValueError("output is not a table")
+
+    rows = []
+    for line in lines[layout["data_start"]:]:
+        if not line.strip():
+            continue
+        rows.append([(line[a:b] if b is not None else line[a:]).strip() for a, b in layout["spans"]])
+    return Table.from_rows(layout["columns"], rows)
+
+
+def parse_output(data: bytes) -> Table:
+    """按内容识别格式并解析aqc输出"""
+    text = data.decode("utf-8", errors="replace")
+    start = text.lstrip()[:200]
+    if start.startswith("<?xml") or "<VOTABLE" in start:
+        return parse_votable(data)
+    if start.startswith(("[", "{")):
+        return parse_json(text)
+    return parse_text(text)
+
+
+def table_json(table: Table, **extra: Any) -> str:
+    """表的紧凑JSON文本"""
+    payload = dict(extra)
+    payload.update(table.to_dict())
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def concat(tables: Sequence[Tuple[Any, Table]], key: str = "row") -> Table:
+    """上下拼接多张表，新增 key 列记录每行所属的标签；列取并集，表中没有的列为缺失值"""
+    names: List[str] = []
+    units: Dict[str, str] = {}
+    for _, table in tables:
+        names += [name for name in table.names if name not in names]
+        units.update(table.units)
+    while key in names:
+        key = "_" + key
+
+    raw: Dict[str, List[Any]] = {name: [] for name in [key] + names}
+    for label, table in tables:
+        count = len(table)
+        raw[key] += [label] * count
+        for name in names:
+            column = table.columns.get(name)
+            raw[name] += [None] * count if column is None else list(column)
+    return Table.from_columns([key] + names, raw, units)
@@ -0,0 +1,72 @@
+"""
+HTTP传输
+一个长期运行的服务器实例通过Streamable HTTP（/mcp）和旧版SSE（/sse + /messages/）
+同时服务多个MCP会话；所有会话共用同一个 AstroqueryMCPServer 的工作进程池、缓存和命令目录
+
+依赖 mcp>=1.8 自带的 starlette/uvicorn，只在HTTP模式下导入
+"""
+
+import contextlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from mcp.server import Server
+
+ASGIHandler = Callable[[Dict[str, Any], Any, Any], Awaitable[None]]
+
+
+class _ASGIEndpoint:
+    """把ASGI处理函数包装为 starlette 路由端点（不做重定向，/mcp 与 /mcp/ 都可用）"""
+
+    def __init__(self, handler: ASGIHandler):
+        self.handler = handler
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.handler(scope, receive, send)
+
+
+def create_http_app(server: Server, stats: Callable[[], Dict[str, Any]],
+                    json_response: bool = False, stateless: bool = False,
+                    metrics: Optional[Callable[[], str]] = None):
+    """创建服务所有会话的ASGI应用；提供 metrics 时在 /metrics 输出 Prometheus 文本格式"""
+    from mcp.server.sse import SseServerTransport
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from starlette.applications import Starlette
+    from starlette.responses import Response
+    from starlette.routing import Mount, Route
+
+    manager = StreamableHTTPSessionManager(app=server, json_response=json_response, stateless=stateless)
+    sse = SseServerTransport("/messages/")
+
+    async def handle_sse(scope, receive, send) -> None:
+        async with sse.connect_sse(scope, receive, send) as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, server.create_initialization_options())
+
+    async def health(request) -> Response:
+        return Response(json.dumps(stats()), media_type="application/json")
+
+    async def prometheus(request) -> Response:
+        return Response(metrics(), media_type="text/plain; version=0.0.4")
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with manager.run():
+            yield
+
+    routes = [
+        Route("/mcp", endpoint=_ASGIEndpoint(manager.handle_request)),
+        Route("/sse", endpoint=_ASGIEndpoint(handle_sse)),
+        Mount("/messages/", app=sse.handle_post_message),
+        Route("/health", endpoint=health),
+    ]
+    if metrics is not None:
+        routes.append(Route("/metrics", endpoint=prometheus))
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+async def serve_http(app, host: str, port: int) -> None:
+    """用uvicorn运行ASGI应用，直到被取消"""
+    import uvicorn
+
+    config = uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on")
+    await uvicorn.Server(config).serve()
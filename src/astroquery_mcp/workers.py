@@ -0,0 +1,326 @@
+"""
+常驻aqc工作进程池
+每个工作进程只导入一次astroquery，之后通过管道接收请求，
+省去每次调用的解释器启动和 astropy/astroquery 导入时间
+"""
+
+import asyncio
+import json
+import os
+import re
+import signal
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .catalog import console_script_entry
+from .execution import (PREVIEW_BYTES, CommandResult, ProgressCallback, process_group_options, signal_group,
+                        spill_dir)
+
+WORKER_SCRIPT = str(Path(__file__).with_name("_worker.py"))
+# 单条响应可能包含完整的大表格输出
+STREAM_LIMIT = 1 << 30
+# 工作进程发送进度帧的最小间隔（秒）
+PROGRESS_FRAME_INTERVAL = 0.25
+
+_IMPORT_RE = re.compile(r"^from\s+([\w.]+)\s+import\s+([\w.]+)", re.MULTILINE)
+_SH_EXEC_RE = re.compile(r"""^'''exec'\s+(?:"([^"]+)"|(\S+))""", re.MULTILINE)
+
+
+class WorkerError(Exception):
+    """工作进程不可用或协议错误；调用方应回退到一次性子进程"""
+
+
+class PoolBusy(WorkerError):
+    """所有工作进程都在忙；不排队等待，调用方直接回退到一次性子进程"""
+
+
+def resolve_worker_spec(cli_path: str) -> Optional[Tuple[str, str]]:
+    """不执行aqc，确定 (解释器, "module:attr" 入口)；无法确定时返回 None"""
+    try:
+        with open(cli_path, "r", encoding="utf-8", errors="replace") as f:
+            script = f.read(4096)
+    except OSError:
+        script = ""
+
+    interpreter = None
+    if script.startswith("#!"):
+        shebang = script.splitlines()[0][2:].strip()
+        if "python" in os.path.basename(shebang.split()[0] if shebang else ""):
+            interpreter = shebang.split()[0]
+        else:
+            # pip 为过长路径生成的 /bin/sh 包装
+            match = _SH_EXEC_RE.search(script)
+            if match:
+                interpreter = match.group(1) or match.group(2)
+
+    match = _IMPORT_RE.search(script)
+    if interpreter and match:
+        return interpreter, f"{match.group(1)}:{match.group(2)}"
+
+    # aqc安装在当前环境中（例如二进制启动器）
+    ep = console_script_entry("aqc")
+    if ep is not None:
+        return sys.executable, ep.value
+
+    return None
+
+
+class _Worker:
+    """单个常驻工作进程"""
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.requests = 0
+        self.last_used = time.monotonic()
+        self._next_id = 0
+        self._killed = False
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None and not self._killed
+
+    async def call(self, message: dict, timeout: Optional[float],
+                   progress: Optional[ProgressCallback] = None) -> dict:
+        """发送请求并等待响应；timeout 是整个请求的时限，期间的进度帧交给 progress"""
+        self._next_id += 1
+        message = dict(message, id=self._next_id)
+        loop = asyncio.get_event_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        try:
+            self.process.stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            raise WorkerError(f"worker pipe failed: {e}") from e
+
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                line = await asyncio.wait_for(self.process.stdout.readline(), timeout=remaining)
+            except (BrokenPipeError, ConnectionResetError, ValueError) as e:
+                raise WorkerError(f"worker pipe failed: {e}") from e
+
+            if not line:
+                raise WorkerError("worker exited")
+
+            try:
+                response = json.loads(line)
+            except ValueError as e:
+                raise WorkerError(f"invalid worker response: {e}") from e
+            if response.get("id") != message["id"]:
+                raise WorkerError("worker protocol out of sync")
+            if "progress" not in response:
+                break
+            if progress is not None:
+                await progress(int(response["progress"].get("bytes", 0)),
+                               int(response["progress"].get("rows", 0)))
+        self.last_used = time.monotonic()
+        return response
+
+    async def stop(self) -> None:
+        if not self.alive:
+            await self.process.wait()
+            return
+        try:
+            self.process.stdin.close()
+            await asyncio.wait_for(self.process.wait(), timeout=2)
+        except Exception:
+            self.kill()
+            await self.process.wait()
+
+    def kill(self) -> None:
+        if self.alive:
+            self._killed = True
+            signal_group(self.process, getattr(signal, "SIGKILL", signal.SIGTERM))
+
+
+class WorkerPool:
+    """常驻aqc工作进程池：按需启动、健康检查、按请求数回收"""
+
+    def __init__(self, interpreter: str, entry: str, size: int = 2,
+                 max_requests: int = 100, health_interval: float = 30.0,
+                 startup_timeout: float = 60.0):
+        self.interpreter = interpreter
+        self.entry = entry
+        self.size = size
+        self.max_requests = max_requests
+        self.health_interval = health_interval
+        self.startup_timeout = startup_timeout
+
+        self._idle: List[_Worker] = []
+        self._live = 0
+        self._guard: Optional[asyncio.Lock] = None
+        self._closed = False
+        # 启动过的工作进程数（包括回收后重新启动的）
+        self.spawned = 0
+
+    @property
+    def _lock(self) -> asyncio.Lock:
+        # 延迟创建，保证绑定到运行中的事件循环
+        if self._guard is None:
+            self._guard = asyncio.Lock()
+        return self._guard
+
+    async def _spawn(self) -> _Worker:
+        self.spawned += 1
+        process = await asyncio.create_subprocess_exec(
+            self.interpreter, WORKER_SCRIPT, self.entry,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            env=os.environ,
+            limit=STREAM_LIMIT,
+            **process_group_options(),
+        )
+        worker = _Worker(process)
+        try:
+            line = await asyncio.wait_for(process.stdout.readline(), timeout=self.startup_timeout)
+            hello = json.loads(line) if line else {}
+        except (asyncio.TimeoutError, ValueError):
+            hello = {}
+
+        if not hello.get("ready"):
+            worker.kill()
+            await process.wait()
+            raise WorkerError(f"worker failed to start: {hello.get('error', 'no handshake')}")
+        return worker
+
+    async def _healthy(self, worker: _Worker) -> bool:
+        """进程仍存活；空闲较久的进程再用 ping 确认"""
+        if not worker.alive:
+            return False
+        if time.monotonic() - worker.last_used < self.health_interval:
+            return True
+        try:
+            response = await worker.call({"op": "ping"}, timeout=5)
+            return bool(response.get("ok"))
+        except (WorkerError, asyncio.TimeoutError, ValueError):
+            return False
+
+    async def _acquire(self) -> _Worker:
+        while True:
+            async with self._lock:
+                # 池的大小小于并发上限，排队等待会让调用在工作进程后面串行执行
+                if not self._idle and self._live >= self.size:
+                    raise PoolBusy(f"all {self.size} workers are busy")
+                if self._idle:
+                    worker = self._idle.pop()
+                else:
+                    worker = None
+                    self._live += 1
+
+            if worker is None:
+                try:
+                    return await self._spawn()
+                except BaseException:
+                    await self._discard()
+                    raise
+
+            try:
+                healthy = await self._healthy(worker)
+            except BaseException:
+                # 等待超时时取消：进程状态未知，丢弃并释放名额
+                worker.kill()
+                await worker.stop()
+                await self._discard()
+                raise
+            if healthy:
+                return worker
+            worker.kill()
+            await worker.stop()
+            await self._discard()
+
+    async def _release(self, worker: _Worker) -> None:
+        if self._closed or not worker.alive or worker.requests >= self.max_requests:
+            await worker.stop()
+            await self._discard()
+            return
+        async with self._lock:
+            self._idle.append(worker)
+
+    async def _discard(self) -> None:
+        async with self._lock:
+            self._live -= 1
+
+    async def run(self, argv: List[str], timeout: Optional[float], spill_threshold: Optional[int] = None,
+                  progress: Optional[ProgressCallback] = None) -> CommandResult:
+        """在工作进程中执行命令；超时抛出 asyncio.TimeoutError，进程故障抛出 WorkerError，
+        没有空闲工作进程时立即抛出 PoolBusy
+
+        timeout 为 None 时不设时限
+
+        给出 progress 时，工作进程在执行过程中按 PROGRESS_FRAME_INTERVAL 报告输出字节数和行数
+        """
+        if self._closed:
+            raise WorkerError("worker pool is closed")
+
+        message = {"argv": list(argv)}
+        if spill_threshold is not None:
+            # 大输出由工作进程直接写入文件，不经过管道和服务器内存
+            message.update(spill_threshold=spill_threshold, spill_dir=str(spill_dir()),
+                           preview_bytes=PREVIEW_BYTES)
+        if progress is not None:
+            message["progress_interval"] = PROGRESS_FRAME_INTERVAL
+
+        # 超时包括等待空闲工作进程的时间
+        loop = asyncio.get_event_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        worker = await asyncio.wait_for(self._acquire(), timeout)
+        try:
+            worker.requests += 1
+            remaining = None if deadline is None else max(0.0, deadline - loop.time())
+            response = await worker.call(message, timeout=remaining, progress=progress)
+        except BaseException:
+            # 超时或取消时工作进程状态未知，直接丢弃
+            worker.kill()
+            await self._release(worker)
+            raise
+        await self._release(worker)
+
+        return CommandResult(
+            argv=list(argv),
+            returncode=int(response.get("returncode", 1)),
+            stdout=response.get("stdout", "").encode("utf-8"),
+            stderr=response.get("stderr", "").encode("utf-8"),
+            source="worker",
+            stdout_path=response.get("stdout_path"),
+            stdout_size=int(response.get("stdout_size", 0)),
+        )
+
+    async def describe(self, timeout: float = 60.0) -> Optional[dict]:
+        """读取aqc的命令树和参数元数据；入口不是 Click/Typer 应用时返回 None"""
+        if self._closed:
+            raise WorkerError("worker pool is closed")
+
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        worker = await asyncio.wait_for(self._acquire(), timeout)
+        try:
+            response = await worker.call({"op": "describe"}, timeout=max(0.0, deadline - loop.time()))
+        except BaseException:
+            worker.kill()
+            await self._release(worker)
+            raise
+        await self._release(worker)
+        return response.get("commands")
+
+    async def start(self) -> None:
+        """预先启动全部工作进程，使第一次调用也是热的"""
+        workers = []
+        for _ in range(self.size - self._live):
+            try:
+                workers.append(await self._acquire())
+            except WorkerError as e:
+                print(f"Cannot start aqc worker: {e}", file=sys.stderr)
+                break
+        for worker in workers:
+            await self._release(worker)
+
+    async def close(self) -> None:
+        self._closed = True
+        async with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            await worker.stop()
+            self._live -= 1
@@ -0,0 +1,87 @@
+"""Shared pytest fixtures."""
+
+import asyncio
+import tempfile
+
+import pytest
+
+from astroquery_mcp.execution import CommandResult
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path, monkeypatch):
+    """Keep persistent caches and spilled outputs out of shared directories."""
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("ASTROQUERY_MCP_CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return cache_dir
+
+
+@pytest.fixture(autouse=True)
+def aqc_stub(tmp_path, monkeypatch):
+    """Point the server at a placeholder aqc; tests fake its processes."""
+    path = tmp_path / "bin" / "aqc"
+    path.parent.mkdir()
+    path.write_text("#!/bin/sh\nexit 0\n")
+    path.chmod(0o755)
+    monkeypatch.setenv("ASTROQUERY_MCP_AQC", str(path))
+    return path
+
+
+class FakeProcess:
+    """Stand-in for asyncio.subprocess.Process with real stream readers."""
+
+    def __init__(self, stdout=b"", stderr=b"", returncode=0, delay=0.0):
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        for stream, data in ((self.stdout, stdout), (self.stderr, stderr)):
+            if data:
+                stream.feed_data(data)
+            stream.feed_eof()
+        self.returncode = None
+        self.pid = 0
+        self._stdout, self._stderr = stdout, stderr
+        self._exit_code = returncode
+        self._delay = delay
+        self._signalled = asyncio.Event()
+        self.signals = []
+
+    async def wait(self):
+        if self._delay and self.returncode is None:
+            try:
+                await asyncio.wait_for(self._signalled.wait(), timeout=self._delay)
+            except asyncio.TimeoutError:
+                pass
+        if self.returncode is None:
+            self.returncode = self._exit_code
+        return self.returncode
+
+    async def communicate(self):
+        await self.wait()
+        return self._stdout, self._stderr
+
+    def kill(self):
+        self.signals.append("KILL")
+        if self.returncode is None:
+            self.returncode = -9
+        self._signalled.set()
+
+    def terminate(self):
+        self.signals.append("TERM")
+        if self.returncode is None:
+            self.returncode = -15
+        self._signalled.set()
+
+
+@pytest.fixture
+def fake_process():
+    """Factory for FakeProcess objects to return from create_subprocess_exec."""
+    return FakeProcess
+
+
+@pytest.fixture
+def command_result():
+    """Factory for CommandResult objects as returned by an aqc execution."""
+    def make(stdout=b"ok", returncode=0, argv=("simbad", "query", "M31")):
+        return CommandResult(argv=list(argv), returncode=returncode, stdout=stdout)
+    return make
@@ -0,0 +1,166 @@
+"""Tests for the compressed result archive and replay mode."""
+
+import asyncio
+import os
+from unittest.mock import Mock, patch
+
+import pytest
+
+from astroquery_mcp.archive import ResultArchive
+from astroquery_mcp.execution import CommandResult
+
+
+def _blobs(directory):
+    return [name for _, _, files in os.walk(directory / "objects") for name in files if name.endswith(".z")]
+
+
+class TestResultArchive:
+    """Test cases for ResultArchive."""
+
+    def test_round_trip_and_compression(self, tmp_path, command_result):
+        """Results come back byte for byte and are stored compressed."""
+        table = b"".join(b"M31 %d 10.6847 41.2690\n" % i for i in range(1000))
+        archive = ResultArchive(tmp_path)
+        archive.put("key", command_result(table, returncode=0), "0.4.7")
+
+        result, age = archive.get("key")
+
+        assert result.stdout == table
+        assert result.argv == ["simbad", "query", "M31"]
+        assert result.source == "archive"
+        assert age >= 0
+        assert archive.size_bytes < archive.raw_bytes / 4
+        assert archive.get("other") is None
+        assert (archive.hits, archive.misses) == (1, 1)
+        archive.close()
+
+    def test_identical_outputs_stored_once(self, tmp_path, command_result):
+        """Different calls with the same output share one blob; replacing drops unused blobs."""
+        archive = ResultArchive(tmp_path)
+        archive.put("a", command_result(b"same table\n"))
+        archive.put("b", command_result(b"same table\n"))
+
+        # One blob for the shared stdout and one for the empty stderr
+        assert len(archive) == 2
+        assert len(_blobs(tmp_path)) == 2
+
+        archive.put("a", command_result(b"new table\n"))
+        archive.put("b", command_result(b"new table\n"))
+        assert len(_blobs(tmp_path)) == 2
+        assert archive.get("b")[0].stdout == b"new table\n"
+        archive.close()
+
+    def test_lru_eviction_by_size(self, tmp_path, command_result):
+        """The least recently used results are evicted past the size bound."""
+        archive = ResultArchive(tmp_path, max_bytes=600, level=0)
+        for key in ("a", "b", "c"):
+            archive.put(key, command_result(key.encode() * 200))
+            archive.get("a")
+
+        assert archive.get("b") is None
+        assert archive.get("a") is not None
+        assert archive.get("c") is not None
+        assert archive.size_bytes <= 600
+        archive.close()
+
+    def test_large_output_spills(self, tmp_path):
+        """Outputs past the spill threshold are decompressed to a file, in both directions."""
+        table = b"row\n" * 10000
+        spilled = tmp_path / "spilled.txt"
+        spilled.write_bytes(table)
+        archive = ResultArchive(tmp_path / "archive")
+        archive.put("key", CommandResult(argv=["gaia", "query"], returncode=0, stdout=table[:100],
+                                         stdout_path=str(spilled), stdout_size=len(table)))
+
+        result, _ = archive.get("key", spill_threshold=1024)
+
+        assert result.spilled
+        assert result.stdout_size == len(table)
+        with open(result.stdout_path, "rb") as f:
+            assert f.read() == table
+        assert archive.get("key")[0].stdout == table
+        archive.close()
+
+    def test_shared_between_instances(self, tmp_path, command_result):
+        """A second archive on the same directory sees recorded results."""
+        first = ResultArchive(tmp_path)
+        first.put("key", command_result(b"table"))
+
+        second = ResultArchive(tmp_path)
+        assert second.get("key")[0].stdout == b"table"
+        first.close()
+        second.close()
+
+
+class TestReplay:
+    """Test cases for recording and replaying tool calls on the server."""
+
+    CALL = {"subcommand": "query", "arguments": ["M31"]}
+
+    def _server(self, monkeypatch, mode):
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        monkeypatch.setenv("ASTROQUERY_MCP_ARCHIVE", mode)
+        monkeypatch.setenv("ASTROQUERY_MCP_WORKERS", "0")
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            return AstroqueryMCPServer()
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_replay_answers_without_aqc(self, mock_subprocess, fake_process, monkeypatch):
+        """Recorded calls replay in a new server without spawning; unrecorded calls fail."""
+        mock_subprocess.side_effect = lambda *args, **kwargs: fake_process(b"M31 result\n")
+        recorder = self._server(monkeypatch, "record")
+        await recorder._execute_specific_command("simbad", self.CALL)
+        await asyncio.gather(*recorder._archiving)
+        assert mock_subprocess.call_count == 1
+
+        replayer = self._server(monkeypatch, "replay")
+        replayed = await replayer._execute_specific_command("simbad", self.CALL)
+        missing = await replayer._execute_specific_command("simbad", dict(self.CALL, arguments=["M32"]))
+
+        assert mock_subprocess.call_count == 1
+        assert "M31 result" in replayed[0].text
+        assert "Archive: replayed" in replayed[0].text
+        assert "Replay: no recorded result for aqc simbad query M32" in missing[0].text
+        assert replayer.metrics.counter("archive_hits_total", service="simbad") == 1
+        assert replayer.metrics.counter("archive_misses_total", service="simbad") == 1
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_archive_survives_restart(self, mock_subprocess, fake_process, monkeypatch):
+        """In record mode a restarted server answers from the archive within the service TTL."""
+        mock_subprocess.side_effect = lambda *args, **kwargs: fake_process(b"M31 result\n")
+        first = self._server(monkeypatch, "record")
+        await first._execute_specific_command("simbad", self.CALL)
+        await asyncio.gather(*first._archiving)
+
+        restarted = self._server(monkeypatch, "record")
+        result = await restarted._execute_specific_command("simbad", self.CALL)
+
+        assert mock_subprocess.call_count == 1
+        assert "Archive: hit" in result[0].text
+        assert restarted.stats()["archive"]["entries"] == 1
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_archive_hit_fills_result_cache(self, mock_subprocess, fake_process, monkeypatch):
+        """An archive hit is cached like a fresh result, so the next call skips the archive."""
+        mock_subprocess.side_effect = lambda *args, **kwargs: fake_process(b"M31 result\n")
+        first = self._server(monkeypatch, "record")
+        await first._execute_specific_command("simbad", self.CALL)
+        await asyncio.gather(*first._archiving)
+
+        restarted = self._server(monkeypatch, "record")
+        await restarted._execute_specific_command("simbad", self.CALL)
+        again = await restarted._execute_specific_command("simbad", self.CALL)
+
+        assert mock_subprocess.call_count == 1
+        assert "Cache: hit" in again[0].text
+        assert restarted.metrics.counter("archive_hits_total", service="simbad") == 1
+
+    def test_unknown_mode(self, monkeypatch):
+        """An unknown archive mode is rejected at startup."""
+        with pytest.raises(ValueError, match="Unknown archive mode"):
+            self._server(monkeypatch, "playback")
@@ -0,0 +1,63 @@
+"""Smoke tests for the benchmark harness."""
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+BENCHMARKS = ROOT / "benchmarks"
+
+
+def _load_harness():
+    spec = importlib.util.spec_from_file_location("bench_server", BENCHMARKS / "bench_server.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestBenchmarks:
+    """Test cases for benchmarks/bench_server.py."""
+
+    def test_harness_reports(self, tmp_path):
+        """A short run against the fake aqc produces a complete report."""
+        env = dict(os.environ, PYTHONPATH=str(ROOT / "src"), ASTROQUERY_MCP_WORKERS="0")
+        output = tmp_path / "report.json"
+        completed = subprocess.run(
+            [sys.executable, str(BENCHMARKS / "bench_server.py"), "--calls", "4", "--concurrency", "1,2",
+             "--list-repeats", "2", "--startup", "0", "--latency", "0", "--output", str(output)],
+            env=env, capture_output=True, text=True, timeout=120,
+        )
+
+        assert completed.returncode == 0, completed.stderr
+        report = json.loads(output.read_text())
+        assert [level["concurrency"] for level in report["levels"]] == [1, 2]
+        assert all(level["failures"] == 0 and level["throughput"] > 0 for level in report["levels"])
+        assert report["tools_list"]["cold_seconds"] > 0
+        assert report["server_metrics"]["spawns_total"]["kind=subprocess"] == 8
+
+    def test_fake_aqc_failures(self):
+        """The failure rate makes queries exit with an error."""
+        env = dict(os.environ, FAKE_AQC_STARTUP="0", FAKE_AQC_LATENCY="0", FAKE_AQC_FAILURE_RATE="1")
+        completed = subprocess.run([sys.executable, str(BENCHMARKS / "fake_aqc.py"), "simbad", "query", "M31"],
+                                   env=env, capture_output=True, text=True, timeout=30)
+
+        assert completed.returncode == 1
+        assert "remote service unavailable" in completed.stderr
+
+    def test_compare_flags_regressions(self):
+        """Slower latencies and lower throughput than the baseline are reported."""
+        harness = _load_harness()
+        baseline = {"tools_list": {"p50_seconds": 0.001},
+                    "levels": [{"concurrency": 4, "throughput": 100.0, "p50_seconds": 0.01, "p99_seconds": 0.02}]}
+        report = {"tools_list": {"p50_seconds": 0.0011},
+                  "levels": [{"concurrency": 4, "throughput": 70.0, "p50_seconds": 0.01, "p99_seconds": 0.05}]}
+
+        regressions = harness.compare(report, baseline, tolerance=0.2)
+
+        assert len(regressions) == 2
+        assert regressions[0].startswith("concurrency 4 throughput")
+        assert regressions[1].startswith("concurrency 4 p99")
+        assert harness.percentile([1, 2, 3, 4], 0.5) == 2
@@ -0,0 +1,90 @@
+"""Tests for the query result cache."""
+
+from unittest.mock import patch
+
+import pytest
+
+from astroquery_mcp.cache import ResultCache, cache_key, parse_ttls
+
+
+class TestResultCache:
+    """Test cases for ResultCache."""
+
+    def test_hit_and_miss_counters(self, command_result):
+        """Lookups report hits and misses."""
+        cache = ResultCache()
+        key = cache_key(["simbad", "query", "M31"])
+
+        assert cache.get(key) is None
+        cache.put(key, command_result(), "simbad")
+        result, age = cache.get(key)
+
+        assert result.stdout == b"ok"
+        assert age >= 0
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_lru_eviction_by_bytes(self, command_result):
+        """The least recently used entries are evicted past the byte budget."""
+        cache = ResultCache(max_bytes=10)
+        cache.put("a", command_result(b"aaaa"), "simbad")
+        cache.put("b", command_result(b"bbbb"), "simbad")
+        cache.get("a")
+        cache.put("c", command_result(b"cccc"), "simbad")
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.size_bytes <= 10
+
+    def test_per_service_ttl(self, monkeypatch, command_result):
+        """Entries expire according to their service TTL."""
+        now = [1000.0]
+        monkeypatch.setattr("astroquery_mcp.cache.time.time", lambda: now[0])
+        cache = ResultCache(default_ttl=100, service_ttls=parse_ttls("gaia=10,ned=0"))
+        cache.put("simbad", command_result(), "simbad")
+        cache.put("gaia", command_result(), "gaia")
+        cache.put("ned", command_result(), "ned")
+
+        now[0] += 50
+        assert cache.get("simbad") is not None
+        assert cache.get("gaia") is None
+        assert cache.get("ned") is None
+
+    def test_failed_results_are_not_cached(self, command_result):
+        """Only successful executions are cached."""
+        cache = ResultCache()
+        cache.put("key", command_result(returncode=1), "simbad")
+        assert cache.get("key") is None
+
+    def test_disk_tier_survives_restart(self, tmp_path, command_result):
+        """The on-disk tier serves entries to a fresh cache instance."""
+        ResultCache(disk_dir=tmp_path).put("key", command_result(b"table"), "simbad")
+
+        result, _ = ResultCache(disk_dir=tmp_path).get("key")
+
+        assert result.stdout == b"table"
+        assert result.argv == ["simbad", "query", "M31"]
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_server_reports_cache_hits(self, mock_subprocess, fake_process):
+        """Identical tool calls are served from the cache on repeat."""
+        from unittest.mock import Mock
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        mock_subprocess.side_effect = lambda *args, **kwargs: fake_process(b"M31 result\n")
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+
+        call = {"subcommand": "query", "options": {"b": "2", "a": "1"}, "arguments": ["M31"]}
+        first = await server._execute_specific_command("simbad", call)
+        reordered = dict(call, options={"a": "1", "b": "2"})
+        second = await server._execute_specific_command("simbad", reordered)
+        bypass = await server._execute_specific_command("simbad", dict(call, cache=False))
+
+        assert "Cache: miss" in first[0].text
+        assert "Cache: hit" in second[0].text
+        assert "M31 result" in second[0].text
+        assert "Cache:" not in bypass[0].text
+        assert mock_subprocess.call_count == 2
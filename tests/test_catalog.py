@@ -0,0 +1,62 @@
+"""Tests for the aqc command catalog cache."""
+
+import os
+
+from astroquery_mcp.catalog import CommandCatalog
+
+
+COMMANDS = {
+    "simbad": {
+        "description": "Query SIMBAD astronomical database",
+        "subcommands": {"query": "Query by object name"},
+    }
+}
+
+
+class TestCommandCatalog:
+    """Test cases for CommandCatalog."""
+
+    def _fake_aqc(self, tmp_path):
+        aqc = tmp_path / "aqc"
+        aqc.write_text("#!/bin/sh\n")
+        return aqc
+
+    def test_roundtrip_across_instances(self, tmp_path, isolated_cache_dir):
+        """A catalog written by one instance is reused by the next one."""
+        aqc = self._fake_aqc(tmp_path)
+        CommandCatalog(str(aqc), isolated_cache_dir).put(COMMANDS)
+
+        restarted = CommandCatalog(str(aqc), isolated_cache_dir)
+        assert restarted.get() == COMMANDS
+
+    def test_mtime_change_invalidates(self, tmp_path, isolated_cache_dir):
+        """Touching the aqc binary makes the cached catalog stale."""
+        aqc = self._fake_aqc(tmp_path)
+        catalog = CommandCatalog(str(aqc), isolated_cache_dir)
+        catalog.put(COMMANDS)
+
+        stat = os.stat(aqc)
+        os.utime(aqc, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        assert catalog.get() is None
+        assert CommandCatalog(str(aqc), isolated_cache_dir).get() is None
+
+    def test_invalidate_removes_disk_copy(self, tmp_path, isolated_cache_dir):
+        """Explicit invalidation clears memory and disk."""
+        aqc = self._fake_aqc(tmp_path)
+        catalog = CommandCatalog(str(aqc), isolated_cache_dir)
+        catalog.put(COMMANDS)
+
+        catalog.invalidate()
+
+        assert catalog.get() is None
+        assert not catalog.path.exists()
+
+    def test_memory_only_without_cache_dir(self, tmp_path):
+        """Without a cache directory the catalog is kept in memory only."""
+        aqc = self._fake_aqc(tmp_path)
+        catalog = CommandCatalog(str(aqc), None)
+        catalog.put(COMMANDS)
+
+        assert catalog.get() == COMMANDS
+        assert CommandCatalog(str(aqc), None).get() is None
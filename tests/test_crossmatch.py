@@ -0,0 +1,96 @@
+"""Tests for the positional cross-match engine."""
+
+import json
+import random
+from unittest.mock import Mock, patch
+
+import pytest
+
+from astroquery_mcp.crossmatch import crossmatch, has_kdtree, parse_angle
+
+
+def _brute_force(source_ra, source_dec, catalog_ra, catalog_dec, radius):
+    """Reference matcher using the haversine formula."""
+    import math
+    matches = []
+    for i, (a1, d1) in enumerate(zip(source_ra, source_dec)):
+        for j, (a2, d2) in enumerate(zip(catalog_ra, catalog_dec)):
+            a1r, d1r, a2r, d2r = map(math.radians, (a1, d1, a2, d2))
+            h = (math.sin((d2r - d1r) / 2) ** 2
+                 + math.cos(d1r) * math.cos(d2r) * math.sin((a2r - a1r) / 2) ** 2)
+            separation = math.degrees(2 * math.asin(math.sqrt(h))) * 3600
+            if separation <= radius:
+                matches.append((i, j))
+    return sorted(matches)
+
+
+class TestCrossmatch:
+    """Test cases for crossmatch."""
+
+    def test_parse_angle(self):
+        """Decimal degrees and sexagesimal text are accepted."""
+        assert parse_angle(10.5) == 10.5
+        assert parse_angle("00 42 44.3", hours=True) == pytest.approx(10.68458, abs=1e-5)
+        assert parse_angle("-05:23:28") == pytest.approx(-5.39111, abs=1e-5)
+
+    @pytest.mark.parametrize("use_kdtree", [
+        False,
+        pytest.param(True, marks=pytest.mark.skipif(not has_kdtree(), reason="numpy/scipy not installed")),
+    ])
+    def test_matches_agree_with_brute_force(self, use_kdtree):
+        """All pairs within the radius are found, including across RA=0 and near the pole."""
+        rng = random.Random(42)
+        catalog_ra = [rng.uniform(0, 360) for _ in range(300)] + [359.9999, 45.0]
+        catalog_dec = [rng.uniform(-90, 90) for _ in range(300)] + [0.0, 89.9999]
+        source_ra = [(ra + rng.uniform(-0.0005, 0.0005)) % 360 for ra in catalog_ra[::3]] + [0.0001, 225.0]
+        source_dec = [dec * 0.99999 for dec in catalog_dec[::3]] + [0.0, 89.9999]
+
+        found = crossmatch(source_ra, source_dec, catalog_ra, catalog_dec, 5.0,
+                           nearest=False, use_kdtree=use_kdtree)
+
+        assert sorted((i, j) for i, j, _ in found) == _brute_force(
+            source_ra, source_dec, catalog_ra, catalog_dec, 5.0)
+        assert all(0 <= separation <= 5.0 for _, _, separation in found)
+
+    def test_nearest_keeps_one_counterpart(self):
+        """Only the closest catalog row is kept per source."""
+        found = crossmatch([10.0], [20.0], [10.0, 10.0002], [20.0, 20.0], 2.0, use_kdtree=False)
+
+        assert [(i, j) for i, j, _ in found] == [(0, 0)]
+        assert found[0][2] == pytest.approx(0.0, abs=1e-6)
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_server_crossmatch_tool(self, mock_subprocess, fake_process):
+        """Catalog queries are run and only matched pairs are returned."""
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        catalogs = {
+            "2mass": b"RAJ2000,DEJ2000,Jmag\n10.6847,41.2690,4.1\n83.8221,-5.3911,\n",
+            "gaia": b"ra,dec,phot_g_mean_mag\n200.0,10.0,12.0\n",
+        }
+        mock_subprocess.side_effect = lambda *args, **kwargs: fake_process(
+            catalogs["2mass" if "II/246" in args else "gaia"])
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+
+        result = await server._execute_crossmatch({
+            "sources": [{"id": "M31", "ra": "00 42 44.33", "dec": "+41 16 08.4"},
+                        {"id": "far", "ra": 1.0, "dec": 1.0}],
+            "catalogs": [
+                {"name": "2mass", "command": "vizier cone --catalog II/246", "columns": ["Jmag"]},
+                {"name": "gaia", "command": "gaia cone"},
+            ],
+            "radius": 2.0,
+        })
+        payload = json.loads(result[0].text)
+        twomass, gaia = payload["catalogs"]
+
+        assert twomass["status"] == "ok"
+        assert twomass["matches"]["source"] == ["M31"]
+        assert twomass["matches"]["Jmag"] == [4.1]
+        assert twomass["matches"]["separation_arcsec"][0] < 2.0
+        assert gaia["status"] == "ok"
+        assert gaia["matches"]["source"] == []
+        assert "--output-format" in mock_subprocess.call_args[0]
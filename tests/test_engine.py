@@ -0,0 +1,137 @@
+"""Tests for the in-process astroquery engine."""
+
+from unittest.mock import patch
+
+import pytest
+
+from astroquery_mcp.engine import InProcessEngine, _accepts
+from astroquery_mcp.execution import Invocation
+
+
+class FakeTable:
+    """Minimal stand-in for an astropy Table."""
+
+    meta = {}
+
+    def pformat(self, max_lines=None, max_width=None):
+        return ["MAIN_ID  RA", "------- ---", "M  31   10.68"]
+
+
+@_accepts("object", arguments=True)
+def _fake_handler(invocation):
+    if not invocation.arguments:
+        raise ValueError("no object name")
+    return lambda: FakeTable()
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(InProcessEngine, "handlers", {("simbad", "query"): _fake_handler})
+    engine = InProcessEngine(max_workers=1)
+    yield engine
+    engine.close()
+
+
+def _invocation(subcommand="query", arguments=("M31",)):
+    return Invocation(
+        ["simbad", subcommand, *arguments],
+        subcommand=subcommand,
+        arguments=list(arguments),
+        options={},
+    )
+
+
+def _invocation_with(invocation, options):
+    return Invocation(invocation.argv, subcommand=invocation.subcommand,
+                      arguments=invocation.arguments, options=options)
+
+
+class TestInProcessEngine:
+    """Test cases for InProcessEngine."""
+
+    @pytest.mark.asyncio
+    async def test_runs_supported_call(self, engine):
+        """Supported calls are rendered from the returned table."""
+        result = await engine.run(_invocation())
+
+        assert result.returncode == 0
+        assert result.source == "engine"
+        assert b"M  31" in result.stdout
+
+    @pytest.mark.asyncio
+    async def test_unsupported_calls_return_none(self, engine):
+        """Unknown subcommands and generic commands are left to aqc."""
+        assert await engine.run(_invocation(subcommand="region")) is None
+        assert await engine.run(Invocation(["simbad", "query", "M31"])) is None
+
+    @pytest.mark.asyncio
+    async def test_unmappable_arguments_return_none(self, engine):
+        """Arguments the engine cannot map fall back to aqc."""
+        assert await engine.run(_invocation(arguments=())) is None
+
+    @pytest.mark.asyncio
+    async def test_undeclared_options_return_none(self, engine):
+        """Calls with an option the handler does not declare are left to aqc."""
+        invocation = _invocation()
+
+        assert await engine.run(_invocation_with(invocation, {"--format": "csv"})) is not None
+        assert await engine.run(_invocation_with(invocation, {"--wildcard": "true"})) is None
+
+    @pytest.mark.asyncio
+    async def test_query_errors_are_reported(self, engine, monkeypatch):
+        """Exceptions raised by astroquery become a failed result."""
+        @_accepts(arguments=True)
+        def failing(invocation):
+            def call():
+                raise ConnectionError("SIMBAD unreachable")
+            return call
+        monkeypatch.setattr(InProcessEngine, "handlers", {("simbad", "query"): failing})
+
+        result = await engine.run(_invocation())
+
+        assert result.returncode == 1
+        assert b"SIMBAD unreachable" in result.stderr
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_server_prefers_engine(self, mock_subprocess, engine):
+        """The server answers engine-supported calls without spawning aqc."""
+        from unittest.mock import Mock
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+        server.engine = engine
+
+        result = await server._execute_specific_command("simbad", {
+            "subcommand": "query",
+            "arguments": ["M31"],
+        })
+
+        assert "M  31" in result[0].text
+        assert "Return code: 0" in result[0].text
+        mock_subprocess.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_server_sends_unsupported_options_to_aqc(self, mock_subprocess, engine, fake_process):
+        """A call with an option the engine does not handle runs through aqc."""
+        from unittest.mock import Mock
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        mock_subprocess.return_value = fake_process(b"M31 wildcard result\n")
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+        server.engine = engine
+        server.worker_pool = None
+
+        result = await server._execute_specific_command("simbad", {
+            "subcommand": "query",
+            "arguments": ["M31"],
+            "options": {"wildcard": True},
+        })
+
+        assert "M31 wildcard result" in result[0].text
+        assert mock_subprocess.call_count == 1
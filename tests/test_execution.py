@@ -0,0 +1,125 @@
+"""Tests for process group handling of aqc executions."""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+from astroquery_mcp.execution import Reaper, group_alive, run_subprocess
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="process groups require POSIX")
+
+
+# Starts a grandchild that outlives the script unless its process group is killed
+SPAWN_GRANDCHILD = (
+    "import subprocess, sys, time\n"
+    "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'],\n"
+    "                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)\n"
+    "print(child.pid, flush=True)\n"
+    "time.sleep(float(sys.argv[1]))\n"
+)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # Killed but not yet reaped by its (dead) parent counts as gone
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return True
+
+
+async def _wait_gone(pid, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while _alive(pid) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    return not _alive(pid)
+
+
+async def _first_line(path):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        if os.path.exists(path) and open(path).read().strip():
+            return int(open(path).read().split()[0])
+        await asyncio.sleep(0.05)
+    raise AssertionError("grandchild pid was not written")
+
+
+class TestProcessGroups:
+    """Test cases for killing and reaping aqc process trees."""
+
+    @pytest.mark.asyncio
+    async def test_timeout_kills_whole_group(self, tmp_path):
+        """The grandchild pid reported by the script no longer exists after a timeout."""
+        pid_file = tmp_path / "pid"
+        script = SPAWN_GRANDCHILD.replace("print(child.pid, flush=True)",
+                                          f"open({str(pid_file)!r}, 'w').write(str(child.pid))")
+        reaper = Reaper()
+        task = asyncio.ensure_future(run_subprocess(sys.executable, ["-c", script, "30"],
+                                                    timeout=2.0, reaper=reaper))
+        grandchild = await _first_line(pid_file)
+        with pytest.raises(asyncio.TimeoutError):
+            await task
+
+        assert await _wait_gone(grandchild)
+        assert reaper.killed == 1
+        assert reaper.leaked == 0
+        assert reaper.active == 0
+
+    @pytest.mark.asyncio
+    async def test_timed_out_group_is_not_a_leak(self):
+        """Members killed on timeout are not reported as leaked, even before they are reaped."""
+        # The grandchild keeps stdout open after the script exits, so the call runs into its timeout
+        script = SPAWN_GRANDCHILD.replace("stdout=subprocess.DEVNULL, ", "")
+        reaper = Reaper()
+        with pytest.raises(asyncio.TimeoutError):
+            await run_subprocess(sys.executable, ["-c", script, "0"], timeout=1.0, reaper=reaper)
+
+        assert reaper.leaked == 0
+        assert reaper.active == 0
+
+    @pytest.mark.asyncio
+    async def test_cancellation_kills_group(self, tmp_path):
+        """Cancelling the caller terminates the running process tree."""
+        pid_file = tmp_path / "pid"
+        script = SPAWN_GRANDCHILD.replace("print(child.pid, flush=True)",
+                                          f"open({str(pid_file)!r}, 'w').write(str(child.pid))")
+        reaper = Reaper()
+        task = asyncio.ensure_future(run_subprocess(sys.executable, ["-c", script, "30"],
+                                                    timeout=30, reaper=reaper))
+        grandchild = await _first_line(pid_file)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert await _wait_gone(grandchild)
+        assert reaper.killed == 1
+
+    @pytest.mark.asyncio
+    async def test_leaked_children_are_reaped(self):
+        """Children left behind by a successful execution are reported and killed."""
+        reaper = Reaper()
+        result = await run_subprocess(sys.executable, ["-c", SPAWN_GRANDCHILD, "0"],
+                                      timeout=10, reaper=reaper)
+        grandchild = int(result.stdout.split()[0])
+
+        assert result.returncode == 0
+        assert reaper.leaked == 1
+        assert reaper.killed == 0
+        assert await _wait_gone(grandchild)
+
+    @pytest.mark.asyncio
+    async def test_clean_exit_is_not_a_leak(self):
+        """An execution without stray children leaves nothing to reap."""
+        reaper = Reaper()
+        result = await run_subprocess(sys.executable, ["-c", "print('ok')"], timeout=10, reaper=reaper)
+
+        assert result.stdout == b"ok\n"
+        assert reaper.leaked == 0
+        assert not group_alive(0)
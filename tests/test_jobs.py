@@ -0,0 +1,205 @@
+"""Tests for background jobs."""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+
+from astroquery_mcp.execution import CommandResult
+from astroquery_mcp.jobs import FAILED, JobError, JobManager, JobStore
+
+# Prints numbered rows with a pause between them, like a slow archive query
+SLOW_AQC = (
+    "#!{python}\n"
+    "import sys, time\n"
+    "for i in range(int(sys.argv[2])):\n"
+    "    print(f'row {{i}}', flush=True)\n"
+    "    time.sleep(float(sys.argv[3]))\n"
+)
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+async def _wait_for(predicate, timeout=10.0):
+    deadline = asyncio.get_event_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_event_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.02)
+
+
+class TestJobManager:
+    """Test cases for JobManager with an in-process runner."""
+
+    def _manager(self, tmp_path, runner, concurrency=2):
+        return JobManager(JobStore(tmp_path), tmp_path / "jobs", runner, concurrency=concurrency)
+
+    @pytest.mark.asyncio
+    async def test_submit_and_read_output(self, tmp_path):
+        """Submit returns at once; output is read in chunks that end on line boundaries."""
+        release = asyncio.Event()
+
+        async def runner(argv, timeout, path):
+            with open(path, "wb") as f:
+                f.write(b"row 0\nrow 1\nrow")
+                f.flush()
+                await release.wait()
+                f.write(b" 2\n")
+            return CommandResult(argv=argv, returncode=0)
+
+        manager = self._manager(tmp_path, runner)
+        job = manager.submit(["gaia", "query", "SELECT"], timeout=60)
+        assert job.state == "queued"
+
+        await _wait_for(lambda: manager.get(job.id).state == "running")
+        assert manager.read_output(manager.get(job.id), 0) == ("row 0\nrow 1\n", 12)
+
+        release.set()
+        await _wait_for(lambda: manager.get(job.id).done)
+        finished = manager.get(job.id)
+        assert finished.state == "succeeded"
+        assert finished.returncode == 0
+        assert manager.read_output(finished, 12) == ("row 2\n", 18)
+        assert manager.read_output(finished, 0, max_bytes=8) == ("row 0\n", 6)
+        await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_concurrency_and_cancel(self, tmp_path):
+        """Jobs beyond the concurrency limit wait queued and can be cancelled there."""
+        started = []
+
+        async def runner(argv, timeout, path):
+            started.append(argv[0])
+            await asyncio.sleep(30)
+
+        manager = self._manager(tmp_path, runner, concurrency=1)
+        first = manager.submit(["mast"], timeout=60)
+        second = manager.submit(["gaia"], timeout=60)
+        await _wait_for(lambda: manager.running == 1)
+
+        assert manager.queued == 1
+        assert manager.get(second.id).state == "queued"
+        assert (await manager.cancel(second.id)).state == "cancelled"
+        assert (await manager.cancel(first.id)).state == "cancelled"
+        assert started == ["mast"]
+        assert manager.running == manager.queued == 0
+        await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_jobs_survive_restart(self, tmp_path):
+        """Finished jobs stay readable from a new manager; unfinished ones are marked failed."""
+        async def runner(argv, timeout, path):
+            if argv[0] == "slow":
+                await asyncio.sleep(30)
+            with open(path, "wb") as f:
+                f.write(b"done\n")
+            return CommandResult(argv=argv, returncode=0)
+
+        manager = self._manager(tmp_path, runner)
+        done = manager.submit(["fast"], timeout=60)
+        pending = manager.submit(["slow"], timeout=60)
+        await _wait_for(lambda: manager.get(done.id).done)
+
+        # A new server process opens the same store after the old one died without shutting down
+        manager.store.update(pending.id, owner_pid=_dead_pid())
+        restarted = self._manager(tmp_path, runner)
+        assert restarted.abandoned == 1
+        assert restarted.get(pending.id).state == FAILED
+        assert restarted.read_output(restarted.get(done.id)) == ("done\n", 5)
+        assert [job.id for job in restarted.list()] == [pending.id, done.id]
+        await restarted.close()
+        await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_jobs_of_live_servers_are_kept(self, tmp_path):
+        """A second server leaves a live server's jobs running and refuses to cancel them."""
+        async def runner(argv, timeout, path):
+            await asyncio.sleep(30)
+
+        manager = self._manager(tmp_path, runner)
+        job = manager.submit(["gaia"], timeout=60)
+        await _wait_for(lambda: manager.get(job.id).state == "running")
+        # Stands in for another server process that is still alive
+        manager.store.update(job.id, owner_pid=os.getppid())
+
+        other = self._manager(tmp_path, runner)
+        assert other.abandoned == 0
+        assert other.get(job.id).state == "running"
+        with pytest.raises(JobError, match="another server process"):
+            await other.cancel(job.id)
+
+        assert (await manager.cancel(job.id)).state == "cancelled"
+        await other.close()
+        await manager.close()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="uses a shell-style aqc script")
+class TestJobTools:
+    """Test cases for the job tools against a real aqc process."""
+
+    def _server(self, tmp_path, monkeypatch):
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        script = tmp_path / "slow_aqc"
+        script.write_text(SLOW_AQC.format(python=sys.executable))
+        script.chmod(0o755)
+        monkeypatch.setenv("ASTROQUERY_MCP_AQC", str(script))
+        monkeypatch.setenv("ASTROQUERY_MCP_WORKERS", "0")
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            return AstroqueryMCPServer()
+
+    async def _job(self, server, job_id, offset=0):
+        return json.loads((await server._call_tool("astroquery_job", {"id": job_id, "offset": offset}))[0].text)
+
+    @pytest.mark.asyncio
+    async def test_poll_partial_output(self, tmp_path, monkeypatch):
+        """Output is readable while the job runs and the full output once it has finished."""
+        server = self._server(tmp_path, monkeypatch)
+        submitted = json.loads((await server._call_tool("astroquery_submit", {"command": "gaia 4 0.3"}))[0].text)
+        job_id = submitted["id"]
+        assert submitted["state"] == "queued"
+
+        await _wait_for(lambda: server.jobs.output_size(job_id) > 0)
+        partial = await self._job(server, job_id)
+        assert partial["state"] == "running"
+        assert partial["output"].startswith("row 0\n")
+        assert not partial["complete"]
+
+        await _wait_for(lambda: server.jobs.get(job_id).done)
+        rest = await self._job(server, job_id, partial["next_offset"])
+        assert rest["state"] == "succeeded"
+        assert rest["complete"]
+        assert partial["output"] + rest["output"] == "row 0\nrow 1\nrow 2\nrow 3\n"
+        assert server.metrics.counter("spawns_total", kind="job") == 1
+
+        listed = json.loads((await server._call_tool("astroquery_job", {}))[0].text)
+        assert [job["id"] for job in listed["jobs"]] == [job_id]
+        await server.jobs.close()
+
+    @pytest.mark.asyncio
+    async def test_cancel_and_timeout(self, tmp_path, monkeypatch):
+        """Cancelling stops the process; a job past its timeout ends as timed_out."""
+        server = self._server(tmp_path, monkeypatch)
+        job_id = json.loads((await server._call_tool("astroquery_submit", {"command": "mast 100 0.2"}))[0].text)["id"]
+        await _wait_for(lambda: server.jobs.output_size(job_id) > 0)
+
+        cancelled = json.loads((await server._call_tool("astroquery_cancel", {"id": job_id}))[0].text)
+        assert cancelled["state"] == "cancelled"
+        assert server.reaper.active == 0
+        assert server.metrics.counter("jobs_total", service="mast", state="cancelled") == 1
+
+        timed = json.loads((await server._call_tool(
+            "astroquery_submit", {"command": "mast 100 0.2", "timeout": 0.5}))[0].text)["id"]
+        await _wait_for(lambda: server.jobs.get(timed).done)
+        job = await self._job(server, timed)
+        assert job["state"] == "timed_out"
+        assert job["output"].startswith("row 0\n")
+        await server.jobs.close()
@@ -0,0 +1,80 @@
+"""Tests for server metrics."""
+
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+from astroquery_mcp.metrics import Histogram, Metrics
+
+
+class TestMetrics:
+    """Test cases for the metrics registry."""
+
+    def test_histogram_quantiles(self):
+        """Quantiles are estimated from bucket bounds."""
+        histogram = Histogram((0.1, 1.0, 10.0))
+        for value in [0.05] * 90 + [0.5] * 9 + [50.0]:
+            histogram.observe(value)
+
+        assert histogram.count == 100
+        assert histogram.quantile(0.5) == 0.1
+        assert histogram.quantile(0.95) == 1.0
+        assert histogram.quantile(1.0) == 50.0
+
+    def test_prometheus_text(self):
+        """Counters, extra samples and histograms use the text exposition format."""
+        metrics = Metrics()
+        metrics.inc("spawns_total", kind="subprocess")
+        metrics.inc("spawns_total", 2, kind="subprocess")
+        metrics.observe("tool_seconds", 0.2, tool="astroquery_simbad")
+
+        text = metrics.prometheus([("queue_depth", "gauge", {}, 3)])
+        lines = text.splitlines()
+
+        assert "# TYPE astroquery_mcp_spawns_total counter" in lines
+        assert 'astroquery_mcp_spawns_total{kind="subprocess"} 3' in lines
+        assert "astroquery_mcp_queue_depth 3" in lines
+        assert "# TYPE astroquery_mcp_tool_seconds histogram" in lines
+        assert 'astroquery_mcp_tool_seconds_bucket{tool="astroquery_simbad",le="0.1"} 0' in lines
+        assert 'astroquery_mcp_tool_seconds_bucket{tool="astroquery_simbad",le="0.25"} 1' in lines
+        assert 'astroquery_mcp_tool_seconds_bucket{tool="astroquery_simbad",le="+Inf"} 1' in lines
+        assert 'astroquery_mcp_tool_seconds_count{tool="astroquery_simbad"} 1' in lines
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_tool_calls_are_instrumented(self, mock_subprocess, fake_process, monkeypatch):
+        """Tool calls record latency, spawns, bytes, cache hits and timeouts."""
+        from mcp.shared.memory import create_connected_server_and_client_session
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        monkeypatch.setenv("ASTROQUERY_MCP_CACHE_DIR", "")
+        monkeypatch.setenv("ASTROQUERY_MCP_WORKERS", "0")
+        mock_subprocess.side_effect = lambda *args, **kwargs: fake_process(b"M31 result\n")
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+        server.catalog.put({"simbad": {"description": "SIMBAD", "subcommands": {"query": ""}}})
+
+        async with create_connected_server_and_client_session(server.server) as session:
+            tools = await session.list_tools()
+            await session.call_tool("astroquery_simbad", {"subcommand": "query", "arguments": ["M31"]})
+            await session.call_tool("astroquery_simbad", {"subcommand": "query", "arguments": ["M31"]})
+            mock_subprocess.side_effect = lambda *args, **kwargs: fake_process(b"", delay=10)
+            await session.call_tool("astroquery_execute", {"command": "simbad query slow", "timeout": 0.05})
+            stats = json.loads((await session.call_tool("astroquery_stats", {})).content[0].text)
+            text = (await session.call_tool("astroquery_stats", {"format": "prometheus"})).content[0].text
+
+        assert "astroquery_stats" in [tool.name for tool in tools.tools]
+        metrics = stats["metrics"]
+        assert metrics["histograms"]["tool_seconds"]["tool=astroquery_simbad"]["count"] == 2
+        assert metrics["histograms"]["list_tools_seconds"][""]["count"] == 1
+        assert metrics["counters"]["spawns_total"]["kind=subprocess"] == 2
+        assert metrics["counters"]["aqc_output_bytes_total"]["service=simbad"] == len(b"M31 result\n")
+        assert metrics["counters"]["timeouts_total"]["service=simbad,stage=run"] == 1
+        assert metrics["counters"]["tool_response_bytes_total"]["tool=astroquery_simbad"] > 0
+        assert stats["result_cache"]["hits"] == 1
+        assert stats["result_cache"]["misses"] == 2
+        assert stats["result_cache"]["hit_rate"] == 0.3333
+        assert 'astroquery_mcp_cache_hits_total{cache="result"} 1' in text
+        assert "astroquery_mcp_queue_depth 0" in text
@@ -0,0 +1,157 @@
+"""Tests for the shared object name resolution cache."""
+
+import json
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from astroquery_mcp.names import NameResolver, normalize_name, rewrite_target, target_name
+from astroquery_mcp.schema import parse_help
+
+
+KNOWN = {"M31": (10.684708, 41.26875), "Betelgeuse": (88.792939, 7.407064)}
+
+
+OBJECT_HELP = """\
+Usage: aqc vizier object [OPTIONS] CATALOG OBJECT_NAME
+
+Options:
+  --radius TEXT  Search radius
+"""
+
+CONE_HELP = """\
+Usage: aqc vizier cone [OPTIONS]
+
+Options:
+  --ra TEXT      Right ascension
+  --dec TEXT     Declination
+  --radius TEXT  Search radius
+"""
+
+
+def _lookup(calls):
+    def lookup(name, timeout):
+        calls.append(name)
+        return KNOWN.get(name)
+    return lookup
+
+
+class TestNameResolver:
+    """Test cases for NameResolver."""
+
+    def test_normalize_name(self):
+        """Case and whitespace do not matter."""
+        assert normalize_name("NGC 2024") == normalize_name("ngc2024")
+
+    @pytest.mark.asyncio
+    async def test_batch_resolution_is_cached(self, tmp_path):
+        """Names are resolved once, deduplicated, and persisted."""
+        calls = []
+        resolver = NameResolver(tmp_path / "names.json", lookup=_lookup(calls))
+
+        first = await resolver.resolve_many(["M31", "m 31", "Betelgeuse", "Nowhere"])
+        second = await NameResolver(tmp_path / "names.json", lookup=_lookup(calls)).resolve("M 31")
+
+        assert first["M31"] == first["m 31"] == KNOWN["M31"]
+        assert first["Nowhere"] is None
+        assert sorted(calls) == ["Betelgeuse", "M31", "Nowhere"]
+        assert second == KNOWN["M31"]
+
+    @pytest.mark.asyncio
+    async def test_entries_expire(self, monkeypatch):
+        """Cached coordinates are refreshed after the TTL."""
+        now = [1000.0]
+        monkeypatch.setattr("astroquery_mcp.names.time.time", lambda: now[0])
+        calls = []
+        resolver = NameResolver(ttl=100, lookup=_lookup(calls))
+
+        await resolver.resolve("M31")
+        now[0] += 50
+        await resolver.resolve("M31")
+        now[0] += 100
+        await resolver.resolve("M31")
+
+        assert calls == ["M31", "M31"]
+
+    def test_rewrite_rules(self):
+        """Name queries map to a cone subcommand that aqc provides."""
+        assert rewrite_target("vizier", "object", ["object", "cone"]) == "cone"
+        assert rewrite_target("vizier", "object", ["object"]) is None
+        assert rewrite_target("simbad", "object", ["object", "region"]) is None
+        assert rewrite_target("gaia", "query", ["query", "cone"], {"gaia.query": "cone"}) == "cone"
+        assert rewrite_target("vizier", "object", ["cone"], {"vizier.object": ""}) is None
+        assert target_name({"--object": "M31"}, []) == ("M31", "--object", None)
+        assert target_name({}, ["NGC 2024"]) == ("NGC 2024", None, 0)
+        assert target_name({}, ["II/246", "M31"]) == (None, None, None)
+        assert target_name({}, ["II/246", "M31"], parse_help(OBJECT_HELP)) == ("M31", None, 1)
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_server_rewrites_name_query(self, mock_subprocess, fake_process):
+        """Name plus radius queries are sent to aqc as coordinate cones."""
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        mock_subprocess.side_effect = lambda *args, **kwargs: fake_process(b"rows\n")
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+        server.catalog.put({"vizier": {"description": "", "subcommands": {"object": "", "cone": ""}}})
+        server.name_resolver.lookup = _lookup([])
+
+        result = await server._execute_specific_command("vizier", {
+            "subcommand": "object", "arguments": ["M31"], "options": {"radius": "2"},
+        })
+
+        call_args = mock_subprocess.call_args[0]
+        assert "cone" in call_args and "M31" not in call_args
+        assert call_args[call_args.index("--ra") + 1] == "10.684708"
+        assert "Resolved: M31" in result[0].text
+
+        resolved = json.loads((await server._resolve_names({"names": ["Betelgeuse"]}))[0].text)
+        assert resolved == {"Betelgeuse": {"ra": 88.792939, "dec": 7.407064}}
+
+    def _server(self, subcommands, schemas=None):
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+        server.catalog.put({"vizier": {"description": "", "subcommands": subcommands, "schemas": schemas or {}}})
+        return server
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_rewrite_checked_against_cone_spec(self, mock_subprocess, fake_process):
+        """A rewrite the cone subcommand would reject is dropped and the name query runs as given."""
+        mock_subprocess.side_effect = lambda *args, **kwargs: fake_process(b"rows\n")
+        server = self._server({"object": "", "cone": ""},
+                              {"object": parse_help(OBJECT_HELP), "cone": parse_help(CONE_HELP)})
+        calls = []
+        server.name_resolver.lookup = _lookup(calls)
+
+        result = await server._execute_specific_command("vizier", {
+            "subcommand": "object", "arguments": ["II/246", "M31"], "options": {"radius": "2"},
+        })
+
+        assert calls == ["M31"]
+        assert list(mock_subprocess.call_args[0][1:]) == ["vizier", "object", "--radius", "2", "II/246", "M31"]
+        assert "Resolved:" not in result[0].text
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_resolution_counts_against_timeout(self, mock_subprocess):
+        """Time spent resolving the name is part of the call's timeout."""
+        server = self._server({"object": "", "cone": ""})
+
+        def slow_lookup(name, timeout):
+            time.sleep(0.5)
+            return KNOWN.get(name)
+
+        server.name_resolver.lookup = slow_lookup
+        result = await server._execute_specific_command("vizier", {
+            "subcommand": "object", "arguments": ["M31"], "options": {"radius": "2"}, "timeout": 0.2,
+        })
+
+        assert result[0].text == "Command timed out after 0.2 seconds"
+        mock_subprocess.assert_not_called()
@@ -0,0 +1,112 @@
+"""Tests for large results stored as paginated MCP resources."""
+
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+from astroquery_mcp.resources import ResultStore, parse_result_uri
+
+
+def _fixed_width_table(rows):
+    lines = [
+        "MAIN_ID      RA         DEC   ",
+        "            deg         deg   ",
+        "------- ----------- ----------",
+    ]
+    for i in range(rows):
+        lines.append(f"star{i:<3} {10 + i:11.4f} {-5 - i:10.4f}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+class TestResultStore:
+    """Test cases for ResultStore."""
+
+    def test_fixed_width_table_is_paged_by_rows_and_columns(self, tmp_path, command_result):
+        """Astropy-style tables are split into named columns."""
+        store = ResultStore(tmp_path)
+        stored = store.put("abc", command_result(_fixed_width_table(50)))
+
+        assert stored.row_count == 50
+        assert stored.columns == ["MAIN_ID", "RA", "DEC"]
+
+        page = stored.page(offset=10, limit=2, columns=["DEC", "MAIN_ID"])
+        assert page["total_rows"] == 50
+        assert page["columns"] == ["DEC", "MAIN_ID"]
+        assert page["rows"] == [["-15.0000", "star10"], ["-16.0000", "star11"]]
+
+    def test_csv_layout(self, tmp_path, command_result):
+        """CSV output is paged with its header row as column names."""
+        store = ResultStore(tmp_path)
+        stored = store.put("csv", command_result(b"name,ra,dec\nA,1,2\nB,3,4\n\nC,5,6\n"))
+
+        assert stored.columns == ["name", "ra", "dec"]
+        assert stored.page(offset=1)["rows"] == [["B", "3", "4"], ["C", "5", "6"]]
+
+    def test_unknown_column_rejected(self, tmp_path, command_result):
+        """Requesting a column that does not exist is an error."""
+        stored = ResultStore(tmp_path).put("abc", command_result(_fixed_width_table(3)))
+        with pytest.raises(ValueError):
+            stored.page(columns=["nope"])
+
+    def test_spilled_output_is_moved_into_store(self, tmp_path, command_result):
+        """A spilled output file is taken over instead of copied."""
+        spill = tmp_path / "spill.txt"
+        spill.write_bytes(_fixed_width_table(5))
+        result = command_result(b"preview")
+        result.stdout_path, result.stdout_size = str(spill), spill.stat().st_size
+
+        stored = ResultStore(tmp_path / "store").put("abc", result)
+
+        assert not spill.exists()
+        assert stored.row_count == 5
+
+    def test_store_survives_restart_and_evicts_by_size(self, tmp_path, command_result):
+        """Stored results are reloaded and the oldest are evicted past the budget."""
+        data = _fixed_width_table(20)
+        ResultStore(tmp_path).put("old", command_result(data))
+
+        store = ResultStore(tmp_path, max_bytes=len(data) + 10)
+        assert store.get("old") is not None
+        store.put("new", command_result(data))
+
+        assert store.get("old") is None
+        assert store.get("new").row_count == 20
+        assert not (tmp_path / "old").exists()
+
+    def test_parse_result_uri(self):
+        """Paging parameters are read from the resource URI."""
+        assert parse_result_uri("astroquery://results/abc?offset=5&limit=7&columns=ra,dec") == (
+            "abc", 5, 7, ["ra", "dec"]
+        )
+        assert parse_result_uri("astroquery://results/abc") == ("abc", 0, 100, None)
+        with pytest.raises(ValueError):
+            parse_result_uri("file:///etc/passwd")
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_server_returns_summary_for_large_results(self, mock_subprocess, fake_process,
+                                                            monkeypatch):
+        """Large outputs are returned as a summary with a resource URI."""
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        monkeypatch.setenv("ASTROQUERY_MCP_RESOURCE_BYTES", "1000")
+        mock_subprocess.return_value = fake_process(_fixed_width_table(200))
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+
+        result = await server._execute_generic_command({"command": "vizier cone M31"})
+        text = result[0].text
+
+        assert "Rows: 200" in text
+        assert "Columns: MAIN_ID, RA, DEC" in text
+        assert "star9 " in text
+        assert "star150" not in text
+        assert "Return code: 0" in text
+
+        uri = next(line.split()[1] for line in text.splitlines() if line.startswith("Result:"))
+        page = json.loads(server._read_result({"id": uri, "offset": 150, "limit": 1,
+                                               "columns": ["MAIN_ID"]})[0].text)
+        assert page["rows"] == [["star150"]]
+        assert mock_subprocess.call_count == 1
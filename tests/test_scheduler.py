@@ -0,0 +1,119 @@
+"""Tests for the execution scheduler."""
+
+import asyncio
+import time
+
+import pytest
+
+from astroquery_mcp.scheduler import QueueFull, Scheduler, parse_rates
+
+
+async def _hold(scheduler, service, client, log, hold=0.01):
+    await scheduler.acquire(service, client)
+    log.append((client, service))
+    try:
+        await asyncio.sleep(hold)
+    finally:
+        scheduler.release(service)
+
+
+class TestScheduler:
+    """Test cases for Scheduler."""
+
+    def test_parse_rates(self):
+        """Rates accept an optional burst size."""
+        assert parse_rates({"simbad": "5", "vizier": "2:10", "bad": "x"}) == {
+            "simbad": (5.0, 5.0),
+            "vizier": (2.0, 10.0),
+        }
+
+    @pytest.mark.asyncio
+    async def test_global_and_service_limits(self):
+        """Running executions never exceed the global or per-service caps."""
+        scheduler = Scheduler(max_concurrency=3, service_limits={"simbad": 1})
+        peak = {"total": 0, "simbad": 0}
+
+        async def job(service):
+            await scheduler.acquire(service)
+            stats = scheduler.stats()
+            peak["total"] = max(peak["total"], stats["running"])
+            peak["simbad"] = max(peak["simbad"], stats["running_by_service"].get("simbad", 0))
+            await asyncio.sleep(0.005)
+            scheduler.release(service)
+
+        await asyncio.gather(*(job(s) for s in ["simbad"] * 4 + ["gaia"] * 4))
+
+        assert peak["total"] == 3
+        assert peak["simbad"] == 1
+        assert scheduler.stats()["running"] == 0
+
+    @pytest.mark.asyncio
+    async def test_round_robin_between_clients(self):
+        """A flooding client cannot starve a client that arrives later."""
+        scheduler = Scheduler(max_concurrency=1)
+        log = []
+
+        flood = [asyncio.ensure_future(_hold(scheduler, "simbad", "a", log)) for _ in range(5)]
+        await asyncio.sleep(0)
+        late = asyncio.ensure_future(_hold(scheduler, "simbad", "b", log))
+        await asyncio.gather(*flood, late)
+
+        assert [client for client, _ in log].index("b") <= 2
+
+    @pytest.mark.asyncio
+    async def test_token_bucket_spaces_requests(self):
+        """Rate-limited services are delayed until a token is available."""
+        scheduler = Scheduler(max_concurrency=4, service_rates={"simbad": (50.0, 1.0)})
+        start = time.monotonic()
+
+        await asyncio.gather(*(_hold(scheduler, "simbad", "", [], hold=0) for _ in range(3)))
+
+        assert time.monotonic() - start >= 0.035
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """Timing out while queued removes the request from the queue."""
+        scheduler = Scheduler(max_concurrency=1)
+        await scheduler.acquire("simbad")
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.acquire("simbad"), timeout=0.01)
+
+        assert scheduler.queue_depth == 0
+        scheduler.release("simbad")
+        assert scheduler.stats()["running"] == 0
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_counts_against_call_timeout(self):
+        """A queued tool call still honours its timeout."""
+        from unittest.mock import Mock, patch
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+        server.scheduler = Scheduler(max_concurrency=1)
+        await server.scheduler.acquire("simbad")
+
+        result = await server._execute_generic_command({"command": "simbad query M31", "timeout": 0.05})
+
+        assert "timed out" in result[0].text.lower()
+        assert server.scheduler.queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_flooding_client_is_rejected(self):
+        """A client over its queue bound is rejected without affecting others."""
+        scheduler = Scheduler(max_concurrency=1, max_queued_per_client=2)
+        await scheduler.acquire("simbad", "a")
+        queued = [asyncio.ensure_future(scheduler.acquire("simbad", "a")) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(QueueFull):
+            await scheduler.acquire("simbad", "a")
+        other = asyncio.ensure_future(scheduler.acquire("simbad", "b"))
+        await asyncio.sleep(0)
+
+        assert scheduler.stats()["rejected"] == 1
+        assert scheduler.queue_depth == 3
+        for task in queued + [other]:
+            task.cancel()
@@ -0,0 +1,252 @@
+"""Tests for per-subcommand tool schemas."""
+
+import sys
+import textwrap
+from unittest.mock import Mock, patch
+
+import pytest
+
+from astroquery_mcp.schema import bind_arguments, option_argv, parse_help, tool_schema, validate_call
+
+CLICK_HELP = """\
+Usage: aqc simbad query [OPTIONS] OBJECT_NAME
+
+  Query SIMBAD for an object.
+
+Options:
+  -r, --radius TEXT               Search radius, a long description that
+                                  wraps onto the following line
+  --limit INTEGER RANGE           [default: 10; x>=1]
+  --output-format [csv|json|text]
+                                  [required]
+  --verbose / --quiet
+  --help                          Show this message and exit.
+"""
+
+RICH_HELP = """\
+
+ Usage: aqc simbad query [OPTIONS] OBJECT_NAME
+
+ Query SIMBAD for an object.
+
+╭─ Arguments ──────────────────────────────────────────────────────────────────╮
+│ *    object_name      TEXT  Name of the object [default: None] [required]    │
+╰──────────────────────────────────────────────────────────────────────────────╯
+╭─ Options ────────────────────────────────────────────────────────────────────╮
+│    --radius         -r                TEXT     Search radius                 │
+│                                                [default: 2 arcmin]           │
+│    --limit                            INTEGER  [default: 10]                 │
+│ *  --output-format                    [csv|json|text] [default: None]        │
+│                                       [required]                             │
+│    --verbose            --no-verbose           [default: no-verbose]         │
+│    --help                                      Show this message and exit.   │
+╰──────────────────────────────────────────────────────────────────────────────╯
+"""
+
+CLICK_APP = textwrap.dedent("""
+    import click
+
+    @click.group()
+    def cli():
+        pass
+
+    @cli.group()
+    def simbad():
+        "Query SIMBAD"
+
+    @simbad.command()
+    @click.argument("object_name")
+    @click.option("--radius", default="2 arcmin", help="Search radius")
+    @click.option("--limit", type=int, default=10)
+    def query(object_name, radius, limit):
+        "Query an object."
+        click.echo(f"{object_name} {radius} {limit}")
+""")
+
+
+def _options(spec):
+    return {option["name"]: option for option in spec["options"]}
+
+
+class TestParseHelp:
+    """Test cases for parse_help."""
+
+    @pytest.mark.parametrize("help_text", [CLICK_HELP, RICH_HELP], ids=["click", "rich"])
+    def test_arguments_and_options(self, help_text):
+        """Plain Click and Typer rich panels yield the same typed parameters."""
+        spec = parse_help(help_text)
+        options = _options(spec)
+
+        assert [a["name"] for a in spec["arguments"]] == ["object_name"]
+        assert spec["arguments"][0]["required"]
+        assert sorted(options) == ["limit", "output-format", "radius", "verbose"]
+        assert options["radius"]["type"] == "string"
+        assert options["radius"]["aliases"] == ["-r"]
+        assert options["limit"]["type"] == "integer"
+        assert options["limit"]["default"] == 10
+        assert options["output-format"]["enum"] == ["csv", "json", "text"]
+        assert options["output-format"]["required"]
+        assert options["verbose"]["is_flag"]
+        assert options["verbose"]["secondary"] in ("--quiet", "--no-verbose")
+
+    def test_wrapped_description(self):
+        """Continuation lines are joined to the option description."""
+        spec = parse_help(CLICK_HELP)
+
+        assert _options(spec)["radius"]["description"] == \
+            "Search radius, a long description that wraps onto the following line"
+        assert _options(spec)["limit"]["description"] == "[x>=1]"
+
+    def test_unrecognised_help(self):
+        """Help without an options section produces no schema."""
+        assert parse_help("Usage: aqc simbad [OPTIONS] COMMAND [ARGS]...\n\nCommands:\n  query  Query\n") is None
+        assert parse_help("") is None
+
+
+class TestValidation:
+    """Test cases for call validation and argv construction."""
+
+    def test_valid_call(self):
+        """Typed values and string values that parse are accepted."""
+        spec = parse_help(CLICK_HELP)
+
+        assert validate_call(spec, ["M31"], {"output-format": "csv", "limit": "5", "verbose": True}) == []
+        assert validate_call(spec, ["M31"], {"--output-format": "json", "r": "5 arcmin"}) == []
+
+    def test_invalid_call(self):
+        """Unknown options, bad types, bad choices and missing values are all reported."""
+        spec = parse_help(CLICK_HELP)
+
+        errors = validate_call(spec, [], {"radus": "2", "limit": "ten", "output-format": "xml"})
+
+        assert "Unknown option --radus (did you mean --radius?)" in errors
+        assert "--limit expects an integer, got 'ten'" in errors
+        assert "--output-format must be one of csv, json, text, got 'xml'" in errors
+        assert "Missing argument OBJECT_NAME" in errors
+        assert validate_call(spec, ["M31", "M32"], {"output-format": "csv"}) == \
+            ["Unexpected extra argument: M32"]
+        assert validate_call(spec, ["M31"], {}) == ["Missing required option --output-format"]
+
+    def test_bind_and_argv(self):
+        """Top-level tool properties split into arguments and options; flags take no value."""
+        spec = parse_help(CLICK_HELP)
+        schema = tool_schema(spec, {"timeout": {"type": "number"}})
+
+        assert schema["required"] == ["object_name", "output-format"]
+        assert schema["properties"]["limit"] == {"type": "integer", "default": 10, "description": "--limit: [x>=1]"}
+        assert "timeout" in schema["properties"]
+
+        args, options, errors = bind_arguments(spec, {"object_name": "M31", "verbose": False, "timeout": 5})
+        assert (args, options, errors) == (["M31"], {"verbose": False}, [])
+        assert bind_arguments(spec, {"objet_name": "M31"})[2] == \
+            ["Unknown parameter 'objet_name' (did you mean 'object_name'?)"]
+
+        assert option_argv(_options(spec)["verbose"], False) == ["--quiet"]
+        assert option_argv(_options(spec)["verbose"], "true") == ["--verbose"]
+        assert option_argv(_options(spec)["limit"], 5) == ["--limit", "5"]
+
+
+class TestSubcommandTools:
+    """Test cases for typed subcommand tools on the server."""
+
+    def _server(self, monkeypatch):
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        monkeypatch.setenv("ASTROQUERY_MCP_WORKERS", "0")
+        monkeypatch.setenv("ASTROQUERY_MCP_CACHE_DIR", "")
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+        server.catalog.put({"simbad": {
+            "description": "SIMBAD",
+            "subcommands": {"query": "Query an object"},
+            "schemas": {"query": parse_help(CLICK_HELP)},
+        }})
+        return server
+
+    @pytest.mark.asyncio
+    async def test_typed_tool_listed(self, monkeypatch):
+        """Each subcommand with a schema gets its own tool next to the generic one."""
+        server = self._server(monkeypatch)
+
+        tools = {tool.name: tool for tool in await server._list_tools()}
+
+        assert "astroquery_simbad" in tools
+        schema = tools["astroquery_simbad_query"].inputSchema
+        assert schema["properties"]["output-format"]["enum"] == ["csv", "json", "text"]
+        assert schema["required"] == ["object_name", "output-format"]
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_invalid_call_does_not_spawn(self, mock_subprocess, monkeypatch):
+        """Calls that fail validation return an error without running aqc."""
+        server = self._server(monkeypatch)
+
+        typed = await server._call_tool("astroquery_simbad_query", {"object_name": "M31", "limit": "ten"})
+        generic = await server._call_tool("astroquery_simbad", {
+            "subcommand": "query", "arguments": ["M31"], "options": {"radus": "2", "output-format": "csv"},
+        })
+
+        mock_subprocess.assert_not_called()
+        assert typed[0].text.startswith("Invalid arguments for aqc simbad query:")
+        assert "--limit expects an integer, got 'ten'" in typed[0].text
+        assert "Missing required option --output-format" in typed[0].text
+        assert "Usage: aqc simbad query OBJECT_NAME" in typed[0].text
+        assert "did you mean --radius?" in generic[0].text
+        assert server.metrics.counter("invalid_calls_total", service="simbad") == 2
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_typed_call_builds_command(self, mock_subprocess, fake_process, monkeypatch):
+        """A valid typed call runs aqc with flags written the way Click expects."""
+        server = self._server(monkeypatch)
+        mock_subprocess.return_value = fake_process(b"M31 result\n")
+
+        result = await server._call_tool("astroquery_simbad_query", {
+            "object_name": "M31", "output-format": "csv", "verbose": True, "limit": 5,
+        })
+
+        args = mock_subprocess.call_args[0]
+        assert list(args[1:]) == ["simbad", "query", "--limit", "5", "--output-format", "csv", "--verbose", "M31"]
+        assert "M31 result" in result[0].text
+        assert server._tool_label("astroquery_simbad_query") == "astroquery_simbad_query"
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_table_format_only_when_supported(self, mock_subprocess, fake_process, monkeypatch):
+        """Table output requests a format only from subcommands that accept the option."""
+        server = self._server(monkeypatch)
+        spec = parse_help(CLICK_HELP)
+        spec["options"] = [option for option in spec["options"] if option["name"] != "output-format"]
+        server.catalog.put({"simbad": {
+            "description": "SIMBAD", "subcommands": {"query": "Query an object"}, "schemas": {"query": spec},
+        }})
+        mock_subprocess.return_value = fake_process(b"MAIN_ID,V\nM 31,3.44\n")
+
+        result = await server._execute_specific_command("simbad", {
+            "subcommand": "query", "arguments": ["M31"], "output": "table",
+        })
+
+        assert "--output-format" not in mock_subprocess.call_args[0]
+        assert '"M 31"' in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_worker_describes_click_app(self, tmp_path, monkeypatch):
+        """The worker reads parameters from a Click application without spawning --help."""
+        pytest.importorskip("click")
+        from astroquery_mcp.schema import spec_from_params
+        from astroquery_mcp.workers import WorkerPool
+
+        (tmp_path / "fake_click_aqc.py").write_text(CLICK_APP)
+        monkeypatch.setenv("PYTHONPATH", str(tmp_path))
+        pool = WorkerPool(sys.executable, "fake_click_aqc:cli", size=1)
+        try:
+            tree = await pool.describe(timeout=30)
+        finally:
+            await pool.close()
+
+        assert tree["simbad"]["description"] == "Query SIMBAD"
+        spec = spec_from_params(tree["simbad"]["subcommands"]["query"]["params"])
+        assert [a["name"] for a in spec["arguments"]] == ["object_name"]
+        assert _options(spec)["limit"]["type"] == "integer"
+        assert _options(spec)["radius"]["default"] == "2 arcmin"
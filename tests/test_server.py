@@ -1,33 +1,68 @@
 """Test suite for Astroquery MCP Server."""
 
 import asyncio
+import os
 import pytest
 import subprocess
+import sys
+import time
+from pathlib import Path
 from unittest.mock import Mock, patch, AsyncMock
 from astroquery_mcp.server import AstroqueryMCPServer
 
 
+def _make_server():
+    """Build a server without probing a real aqc binary."""
+    with patch('subprocess.run') as mock_run:
+        mock_run.return_value = Mock(returncode=0)
+        return AstroqueryMCPServer()
+
+
+def _help_responder(outputs):
+    """Fake create_subprocess_exec that answers `aqc ... --help` by argument tuple."""
+    async def fake_exec(*args, **kwargs):
+        cmd_args = tuple(a for a in args[1:] if a != "--help")
+        process = AsyncMock()
+        process.communicate.return_value = (outputs.get(cmd_args, "").encode(), b"")
+        process.returncode = 0
+        return process
+    return fake_exec
+
+
 class TestAstroqueryMCPServer:
     """Test cases for AstroqueryMCPServer."""
     
     @patch('subprocess.run')
-    def test_find_astroquery_cli_success(self, mock_run):
-        """Test successful astroquery-cli discovery."""
-        mock_run.return_value = Mock(returncode=0)
-        
-        server = AstroqueryMCPServer()
-        assert server.astroquery_cli_path == "astroquery-cli"
-    
+    def test_find_astroquery_cli_success(self, mock_run, monkeypatch):
+        """Test that aqc is located on PATH without being executed."""
+        monkeypatch.delenv("ASTROQUERY_MCP_AQC")
+        with patch('shutil.which', return_value="/usr/local/bin/aqc"):
+            server = AstroqueryMCPServer()
+
+        assert server.astroquery_cli_path == "/usr/local/bin/aqc"
+        mock_run.assert_not_called()
+
     @patch('subprocess.run')
-    def test_find_astroquery_cli_failure(self, mock_run):
+    def test_find_astroquery_cli_failure(self, mock_run, monkeypatch, tmp_path):
         """Test astroquery-cli discovery failure."""
-        mock_run.side_effect = FileNotFoundError()
-        
-        with pytest.raises(RuntimeError, match="Cannot find astroquery-cli executable"):
+        monkeypatch.delenv("ASTROQUERY_MCP_AQC")
+        monkeypatch.setenv("HOME", str(tmp_path))
+        with patch('shutil.which', return_value=None):
+            with pytest.raises(RuntimeError, match="Cannot find aqc executable"):
+                AstroqueryMCPServer()
+        mock_run.assert_not_called()
+
+    def test_configured_astroquery_cli(self, aqc_stub, monkeypatch):
+        """Test that ASTROQUERY_MCP_AQC takes precedence over PATH."""
+        assert AstroqueryMCPServer().astroquery_cli_path == str(aqc_stub)
+
+        monkeypatch.setenv("ASTROQUERY_MCP_AQC", str(aqc_stub.parent / "missing"))
+        with pytest.raises(RuntimeError, match="ASTROQUERY_MCP_AQC"):
             AstroqueryMCPServer()
     
-    @patch('subprocess.run')
-    def test_get_available_commands(self, mock_run):
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_get_available_commands(self, mock_subprocess):
         """Test command discovery functionality."""
         mock_help_output = """
 Usage: astroquery-cli [OPTIONS] COMMAND [ARGS]...
@@ -37,21 +72,19 @@ Commands:
   gaia    Query Gaia Data Release
   vizier  Query VizieR catalog service
 """
-        mock_run.return_value = Mock(
-            returncode=0,
-            stdout=mock_help_output
-        )
-        
-        server = AstroqueryMCPServer()
-        commands = server._get_available_commands()
+        mock_subprocess.side_effect = _help_responder({(): mock_help_output})
+
+        server = _make_server()
+        commands = await server._get_available_commands()
         
         assert "simbad" in commands
         assert "gaia" in commands
         assert "vizier" in commands
         assert commands["simbad"]["description"] == "Query SIMBAD astronomical database"
     
-    @patch('subprocess.run')
-    def test_get_subcommands(self, mock_run):
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_get_subcommands(self, mock_subprocess):
         """Test subcommand discovery."""
         mock_subcommand_output = """
 Usage: astroquery-cli simbad [OPTIONS] COMMAND [ARGS]...
@@ -61,31 +94,104 @@ Commands:
   coords     Query by coordinates
   region     Query by region
 """
-        # First call for main help, second for subcommand help
-        mock_run.side_effect = [
-            Mock(returncode=0, stdout="Commands:\n  simbad  Test command"),
-            Mock(returncode=0, stdout=mock_subcommand_output)
-        ]
-        
-        server = AstroqueryMCPServer()
-        subcommands = server._get_subcommands("simbad")
+        mock_subprocess.side_effect = _help_responder({
+            (): "Commands:\n  simbad  Test command",
+            ("simbad",): mock_subcommand_output,
+        })
+
+        server = _make_server()
+        subcommands = await server._get_subcommands("simbad")
         
         assert "query" in subcommands
         assert "coords" in subcommands
         assert "region" in subcommands
-    
+
     @pytest.mark.asyncio
     @patch('asyncio.create_subprocess_exec')
-    async def test_execute_generic_command(self, mock_subprocess):
+    async def test_subcommand_probes_run_in_parallel(self, mock_subprocess):
+        """Test that subcommand --help probes overlap instead of running serially."""
+        active = 0
+        peak = 0
+
+        async def slow_help(*args, **kwargs):
+            nonlocal active, peak
+            cmd_args = tuple(a for a in args[1:] if a != "--help")
+            process = AsyncMock()
+            process.returncode = 0
+
+            async def communicate():
+                nonlocal active, peak
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+                if not cmd_args:
+                    return (b"Commands:\n  simbad  S\n  gaia  G\n  vizier  V\n", b"")
+                return (b"Commands:\n  query  Q\n", b"")
+
+            process.communicate = communicate
+            return process
+
+        mock_subprocess.side_effect = slow_help
+        server = _make_server()
+
+        commands = await server._get_available_commands()
+
+        assert set(commands) == {"simbad", "gaia", "vizier"}
+        assert commands["gaia"]["subcommands"] == {"query": "Q"}
+        assert peak > 1
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_get_catalog_is_cached(self, mock_subprocess):
+        """Test that command discovery runs only once per aqc installation."""
+        mock_subprocess.side_effect = _help_responder({
+            (): "Commands:\n  simbad  Query SIMBAD\n",
+        })
+        server = _make_server()
+
+        first = await server._get_catalog()
+        discovery_calls = mock_subprocess.call_count
+        second = await server._get_catalog()
+
+        assert first == second
+        assert "simbad" in first
+        assert discovery_calls > 0
+        assert mock_subprocess.call_count == discovery_calls
+
+        # A restarted server reads the catalog from disk
+        restarted = _make_server()
+        mock_subprocess.reset_mock()
+        assert await restarted._get_catalog() == first
+        mock_subprocess.assert_not_called()
+
+        restarted.invalidate_catalog()
+        await restarted._get_catalog()
+        assert mock_subprocess.call_count == discovery_calls
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_prewarm_runs_discovery_in_background(self, mock_subprocess):
+        """Test that prewarming fills the catalog before the first tools/list."""
+        mock_subprocess.side_effect = _help_responder({
+            (): "Commands:\n  simbad  Query SIMBAD\n",
+        })
+        server = _make_server()
+
+        server.start_catalog_prewarm()
+        await server._discovery_task
+
+        assert "simbad" in server.catalog.get()
+        calls = mock_subprocess.call_count
+        await server._get_catalog()
+        assert mock_subprocess.call_count == calls
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_execute_generic_command(self, mock_subprocess, fake_process):
         """Test generic command execution."""
         # Mock process
-        mock_process = AsyncMock()
-        mock_process.communicate.return_value = (
-            b"Test output\n", 
-            b"Test error\n"
-        )
-        mock_process.returncode = 0
-        mock_subprocess.return_value = mock_process
+        mock_subprocess.return_value = fake_process(b"Test output\n", b"Test error\n")
         
         # Mock the constructor to avoid subprocess calls
         with patch('subprocess.run') as mock_run:
@@ -104,16 +210,10 @@ Commands:
     
     @pytest.mark.asyncio
     @patch('asyncio.create_subprocess_exec')
-    async def test_execute_specific_command(self, mock_subprocess):
+    async def test_execute_specific_command(self, mock_subprocess, fake_process):
         """Test specific command execution with options."""
         # Mock process
-        mock_process = AsyncMock()
-        mock_process.communicate.return_value = (
-            b"Simbad query result\n",
-            b""
-        )
-        mock_process.returncode = 0
-        mock_subprocess.return_value = mock_process
+        mock_subprocess.return_value = fake_process(b"Simbad query result\n")
         
         # Mock the constructor
         with patch('subprocess.run') as mock_run:
@@ -139,22 +239,194 @@ Commands:
         assert "M31" in call_args
     
     @pytest.mark.asyncio
-    async def test_command_timeout(self):
+    @patch('asyncio.create_subprocess_exec')
+    async def test_large_output_is_spilled_to_file(self, mock_subprocess, fake_process):
+        """Test that outputs above the spill threshold are kept on disk."""
+        payload = b"".join(b"row %06d\n" % i for i in range(20000))
+        mock_subprocess.return_value = fake_process(payload)
+        server = _make_server()
+        server.spill_threshold = 4096
+
+        result = await server._execute_generic_command({"command": "gaia cone", "cache": False})
+        text = result[0].text
+
+        assert "output truncated" in text
+        assert len(text) < len(payload)
+        path = text.split("full output saved to ")[1].split("]")[0]
+        with open(path, "rb") as f:
+            assert f.read() == payload
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_progress_reported_while_streaming(self, mock_subprocess, fake_process):
+        """Test that the progress callback sees bytes and rows as they arrive."""
+        mock_subprocess.return_value = fake_process(b"a\nb\nc\n")
+        server = _make_server()
+        updates = []
+
+        async def progress(size, rows):
+            updates.append((size, rows))
+
+        from astroquery_mcp.execution import Invocation
+        result = await server._run_aqc(Invocation(["simbad", "query", "M31"], progress=progress))
+
+        assert result.stdout == b"a\nb\nc\n"
+        assert updates[-1] == (6, 3)
+
+    @pytest.mark.asyncio
+    async def test_progress_message_feature_detected(self):
+        """Progress notifications omit the message on mcp versions that do not accept it."""
+        server = _make_server()
+        sent = []
+
+        class OldSession:
+            async def send_progress_notification(self, progress_token, progress, total=None):
+                sent.append((progress_token, progress))
+
+        context = Mock(meta=Mock(progressToken="t"), session=OldSession())
+        with patch.object(type(server.server), "request_context", new=context, create=True):
+            report = server._progress_reporter()
+        await report(42, 3)
+
+        assert sent == [("t", 42.0)]
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_execute_batch(self, mock_subprocess, fake_process):
+        """Test batch execution merges per-target results with status."""
+        async def fake_exec(*args, **kwargs):
+            target = args[-1]
+            if target == "M999":
+                return fake_process(b"", b"Object not found\n", returncode=1)
+            return fake_process(f"{target} result\n".encode())
+
+        mock_subprocess.side_effect = fake_exec
+        server = _make_server()
+
+        result = await server._execute_batch({
+            "command": "simbad query {target}",
+            "targets": ["M1", "NGC 2024", "M999"],
+            "rows": [{"ra": 10.68, "dec": 41.27}],
+        })
+        text = result[0].text
+
+        assert "4 rows, 2 ok, 2 not ok" in text
+        assert "NGC 2024 result" in text
+        assert "Object not found" in text
+        assert "Cannot fill template" in text
+        assert mock_subprocess.call_count == 3
+        called_targets = {call.args[-1] for call in mock_subprocess.call_args_list}
+        assert "NGC 2024" in called_targets
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_batch_merges_tables(self, mock_subprocess, fake_process):
+        """Tabular per-row results are merged into one table keyed by batch row."""
+        async def fake_exec(*args, **kwargs):
+            if args[-1] == "M999":
+                return fake_process(b"Object not found\n")
+            return fake_process(f"MAIN_ID,V\n{args[-1]},3.4\n".encode())
+
+        mock_subprocess.side_effect = fake_exec
+        server = _make_server()
+
+        result = await server._execute_batch({"command": "simbad query {target}", "targets": ["M31", "M999", "M42"]})
+        text = result[0].text
+        merged = text.split("Merged table (2 rows from 2 results):\n")[1].splitlines()
+
+        assert merged[0].split() == ["row", "MAIN_ID", "V"]
+        assert merged[2].split() == ["0", "M31", "3.4"]
+        assert merged[3].split() == ["2", "M42", "3.4"]
+        assert "[1] M999: ok\nObject not found" in text
+        assert "[0] M31" not in text
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_command_timeout(self, mock_subprocess, fake_process):
         """Test command timeout handling."""
+        process = fake_process(b"", delay=10)
+        mock_subprocess.return_value = process
         with patch('subprocess.run') as mock_run:
             mock_run.return_value = Mock(returncode=0)
             server = AstroqueryMCPServer()
         
-        with patch('asyncio.wait_for') as mock_wait:
-            mock_wait.side_effect = asyncio.TimeoutError()
-            
-            result = await server._execute_generic_command({
-                "command": "slow command",
-                "timeout": 1
-            })
-            
-            assert len(result) == 1
-            assert "timed out" in result[0].text.lower()
+        result = await server._execute_generic_command({
+            "command": "slow command",
+            "timeout": 0.05
+        })
+        
+        assert len(result) == 1
+        assert "timed out" in result[0].text.lower()
+        # The child is terminated instead of being left running
+        assert process.signals[0] == "TERM"
+        assert process.returncode is not None
+        assert mock_subprocess.call_args[1]["start_new_session"] is True
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_specific_command_timeout(self, mock_subprocess, fake_process, monkeypatch):
+        """Per-tool timeouts apply to the service tools."""
+        monkeypatch.setenv("ASTROQUERY_MCP_TOOL_TIMEOUTS", "gaia=0.05")
+        process = fake_process(b"", delay=10)
+        mock_subprocess.return_value = process
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+
+        result = await server._execute_specific_command("gaia", {"subcommand": "cone"})
+
+        assert result[0].text == "Command timed out after 0.05 seconds"
+        assert process.signals
+
+
+# Seconds from spawning `python -m astroquery_mcp` to a completed MCP handshake
+STARTUP_BUDGET = 3.0
+
+
+class TestStartup:
+    """Cold start of the stdio server."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(os.name != "posix", reason="uses a shebang launcher for the fake aqc")
+    async def test_handshake_within_budget(self, tmp_path):
+        """The handshake does not wait for a slow aqc."""
+        from mcp import ClientSession
+        from mcp.client.stdio import StdioServerParameters, stdio_client
+
+        root = Path(__file__).resolve().parents[1]
+        launcher = tmp_path / "slow" / "aqc"
+        launcher.parent.mkdir()
+        launcher.write_text(f"#!{sys.executable}\nimport sys\nfrom fake_aqc import main\nsys.exit(main())\n")
+        launcher.chmod(0o755)
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join([str(root / "src"), str(root / "benchmarks")]),
+            ASTROQUERY_MCP_AQC=str(launcher),
+            ASTROQUERY_MCP_WORKERS="0",
+            FAKE_AQC_STARTUP="10",
+        )
+        params = StdioServerParameters(command=sys.executable, args=["-m", "astroquery_mcp"], env=env)
+
+        started = time.perf_counter()
+        async with stdio_client(params) as (read, write):
+            async with ClientSession(read, write) as session:
+                await asyncio.wait_for(session.initialize(), timeout=30)
+                elapsed = time.perf_counter() - started
+
+        assert elapsed < STARTUP_BUDGET
+
+    def test_optional_modules_not_imported(self):
+        """Importing the server does not load table parsing, crossmatch or the in-process engine."""
+        root = Path(__file__).resolve().parents[1]
+        code = (
+            "import sys, astroquery_mcp.server; "
+            "print(' '.join(m for m in ('tables', 'crossmatch', 'engine') "
+            "if 'astroquery_mcp.' + m in sys.modules))"
+        )
+        loaded = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                env=dict(os.environ, PYTHONPATH=str(root / "src")))
+
+        assert loaded.stdout.strip() == ""
 
 
 @pytest.mark.integration
@@ -174,8 +446,9 @@ class TestIntegration:
             pytest.skip("astroquery-cli not available for integration testing")
     
     @pytest.mark.asyncio
-    async def test_real_simbad_query(self):
+    async def test_real_simbad_query(self, monkeypatch):
         """Test a real SIMBAD query (requires network and astroquery-cli)."""
+        monkeypatch.delenv("ASTROQUERY_MCP_AQC")
         try:
             # This is a real integration test
             server = AstroqueryMCPServer()
@@ -0,0 +1,168 @@
+"""Tests for in-flight call coalescing."""
+
+import asyncio
+from unittest.mock import Mock, patch
+
+import pytest
+
+from astroquery_mcp.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test cases for SingleFlight."""
+
+    @pytest.mark.asyncio
+    async def test_identical_calls_share_one_execution(self):
+        """Concurrent calls with the same key run the factory once."""
+        flight = SingleFlight()
+        runs = 0
+
+        async def work():
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+
+        assert runs == 1
+        assert [value for value, _ in results] == ["result"] * 5
+        assert sum(shared for _, shared in results) == 4
+        assert len(flight) == 0
+
+    @pytest.mark.asyncio
+    async def test_different_keys_run_separately(self):
+        """Distinct keys are not coalesced."""
+        flight = SingleFlight()
+
+        async def work(value):
+            await asyncio.sleep(0)
+            return value
+
+        results = await asyncio.gather(
+            flight.do("a", lambda: work("a")),
+            flight.do("b", lambda: work("b")),
+        )
+
+        assert results == [("a", False), ("b", False)]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        """One waiter giving up leaves the shared execution running."""
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+
+        assert await second == ("done", True)
+
+    @pytest.mark.asyncio
+    async def test_last_waiter_cancels_execution(self):
+        """The execution is cancelled once nobody is waiting for it."""
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        waiter.cancel()
+
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+    @pytest.mark.asyncio
+    async def test_each_waiter_uses_its_own_timeout(self):
+        """A short timeout fails only its own caller; the run lasts for the longest timeout."""
+        flight = SingleFlight()
+        runs = 0
+
+        async def work():
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.2)
+            return "result"
+
+        short = asyncio.ensure_future(flight.do("k", work, timeout=0.05))
+        long = asyncio.ensure_future(flight.do("k", work, timeout=2))
+
+        with pytest.raises(asyncio.TimeoutError):
+            await short
+        assert await long == ("result", True)
+        assert runs == 1
+
+    @pytest.mark.asyncio
+    async def test_last_waiter_timeout_cancels_execution(self):
+        """The execution is cancelled once every waiter has timed out."""
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        results = await asyncio.gather(
+            flight.do("k", work, timeout=0.01),
+            flight.do("k", work, timeout=0.05),
+            return_exceptions=True,
+        )
+
+        assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+        assert cancelled.is_set()
+        assert len(flight) == 0
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_server_coalesces_identical_tool_calls(self, mock_subprocess, fake_process):
+        """Identical concurrent tool calls spawn a single aqc process."""
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        mock_subprocess.return_value = fake_process(b"M31 result\n", delay=0.01)
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+
+        results = await asyncio.gather(*(
+            server._execute_generic_command({"command": "simbad query M31", "cache": False})
+            for _ in range(4)
+        ))
+
+        assert mock_subprocess.call_count == 1
+        assert all("M31 result" in result[0].text for result in results)
+        assert sum("Coalesced" in result[0].text for result in results) == 3
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_server_applies_each_callers_timeout(self, mock_subprocess, fake_process):
+        """A coalesced call with a short timeout times out alone, with its own timeout in the message."""
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        mock_subprocess.return_value = fake_process(b"M31 result\n", delay=0.3)
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+
+        patient, hasty = await asyncio.gather(
+            server._execute_generic_command({"command": "simbad query M31", "cache": False, "timeout": 5}),
+            server._execute_generic_command({"command": "simbad query M31", "cache": False, "timeout": 0.1}),
+        )
+
+        assert mock_subprocess.call_count == 1
+        assert "M31 result" in patient[0].text
+        assert hasty[0].text == "Command timed out after 0.1 seconds"
+        assert server.metrics.counter("timeouts_total", service="simbad", stage="run") == 1
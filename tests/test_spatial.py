@@ -0,0 +1,108 @@
+"""Tests for the spatial cone-search cache."""
+
+from unittest.mock import Mock, patch
+
+import pytest
+
+from astroquery_mcp.execution import Invocation
+from astroquery_mcp.spatial import ConeCache, contains, parse_cone, parse_radius
+
+
+CONE_OUTPUT = b"""source,ra,dec,mag
+a,10.0000,41.0000,12.1
+b,10.0100,41.0000,13.5
+c,10.1000,41.0000,14.2
+d,10.0000,41.1500,15.0
+"""
+
+
+def _cone(radius, ra="10.0", dec="41.0", **options):
+    options = dict(options, ra=ra, dec=dec, radius=radius)
+    argv = ["vizier", "cone"] + [f"--{k}={v}" for k, v in sorted(options.items())]
+    return Invocation(argv, subcommand="cone", arguments=[], options=options)
+
+
+class TestConeCache:
+    """Test cases for ConeCache."""
+
+    def test_parse_cone(self):
+        """Cone parameters are split from the catalog context."""
+        cone, context, row_limit = parse_cone(_cone("10", catalog="II/246"))
+
+        assert cone == (10.0, 41.0, 600.0)
+        assert context == ("vizier", "cone", (), (("catalog", "II/246"),))
+        assert row_limit == 50
+        assert parse_radius("30arcsec") == 30.0
+        assert parse_radius("0.5 deg") == 1800.0
+        assert parse_cone(Invocation(["vizier", "cone"])) is None
+
+    def test_contains(self):
+        """Containment accounts for center offset and radius."""
+        assert contains((10.0, 41.0, 600.0), (10.0, 41.0, 60.0))
+        assert not contains((10.0, 41.0, 600.0), (10.0, 41.15, 120.0))
+
+    def test_sub_cone_answered_from_cache(self, command_result):
+        """A contained cone is answered by filtering the cached rows."""
+        cache = ConeCache()
+        assert cache.add(_cone("10"), command_result(CONE_OUTPUT))
+
+        answer = cache.lookup(_cone("1"))
+
+        assert answer is not None
+        assert answer.source == "cone-cache"
+        lines = answer.stdout.decode().splitlines()
+        assert lines[0] == "source,ra,dec,mag"
+        assert [line.split(",")[0] for line in lines[1:]] == ["a", "b"]
+        assert cache.hits == 1
+
+    def test_overlapping_or_other_catalog_not_answered(self, command_result):
+        """Cones outside the cached region or with other options are fetched."""
+        cache = ConeCache()
+        cache.add(_cone("10"), command_result(CONE_OUTPUT))
+
+        assert cache.lookup(_cone("10", dec="41.1")) is None
+        assert cache.lookup(_cone("1", catalog="I/355")) is None
+
+    def test_truncated_results_not_cached(self, command_result):
+        """Results that hit a row limit do not represent the whole cone."""
+        cache = ConeCache()
+        assert not cache.add(_cone("10", **{"row-limit": "4"}), command_result(CONE_OUTPUT))
+        assert cache.add(_cone("10", **{"row-limit": "50"}), command_result(CONE_OUTPUT))
+
+    def test_implicit_row_limit(self, command_result):
+        """Without a limit option, a result with the backend's default row count is treated as truncated."""
+        header = CONE_OUTPUT.splitlines(keepends=True)[0]
+        full = header + b"".join(b"s%d,10.0,41.0,12.0\n" % i for i in range(50))
+        cache = ConeCache()
+
+        assert not cache.add(_cone("10"), command_result(full))
+        assert cache.lookup(_cone("1")) is None
+        assert cache.add(_cone("10", **{"row-limit": "-1"}), command_result(full))
+
+    def test_larger_cone_replaces_contained_cones(self, command_result):
+        """A new cone supersedes cached cones it contains."""
+        cache = ConeCache()
+        cache.add(_cone("1"), command_result(CONE_OUTPUT))
+        cache.add(_cone("10"), command_result(CONE_OUTPUT))
+
+        assert len(cache) == 1
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_server_answers_zoomed_cone_locally(self, mock_subprocess, fake_process):
+        """Zooming into a fetched cone does not run aqc again."""
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        mock_subprocess.side_effect = lambda *args, **kwargs: fake_process(CONE_OUTPUT)
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+
+        options = {"ra": "10.0", "dec": "41.0", "radius": "10"}
+        await server._execute_specific_command("vizier", {"subcommand": "cone", "options": options})
+        zoomed = await server._execute_specific_command(
+            "vizier", {"subcommand": "cone", "options": dict(options, radius="1")})
+
+        assert mock_subprocess.call_count == 1
+        assert "Cone cache: 2 of 4 rows" in zoomed[0].text
+        assert "10.1000" not in zoomed[0].text
@@ -0,0 +1,145 @@
+"""Tests for structured table output."""
+
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+from astroquery_mcp.tables import concat, parse_output
+
+
+CSV_OUTPUT = b"""# %ECSV 1.0
+MAIN_ID,RA,DEC,V,variable
+M 31,10.6847,41.2690,3.44,False
+M 42,83.8221,-5.3911,,True
+NGC 2024,85.4208,-1.9000,2.0,false
+"""
+
+VOTABLE_OUTPUT = b"""<?xml version="1.0"?>
+<VOTABLE xmlns="http://www.ivoa.net/xml/VOTable/v1.3">
+ <RESOURCE><TABLE>
+  <FIELD name="source_id" datatype="long"/>
+  <FIELD name="phot_g_mean_mag" datatype="float" unit="mag"/>
+  <DATA><TABLEDATA>
+   <TR><TD>101</TD><TD>12.5</TD></TR>
+   <TR><TD>102</TD><TD>17.25</TD></TR>
+  </TABLEDATA></DATA>
+ </TABLE></RESOURCE>
+</VOTABLE>
+"""
+
+TEXT_OUTPUT = b"""MAIN_ID     RA      DEC
+           deg      deg
+-------- -------- -------
+M 31     10.6847  41.2690
+M 42     83.8221  -5.3911
+"""
+
+
+class TestTables:
+    """Test cases for table parsing, projection and filtering."""
+
+    def test_csv_column_types(self):
+        """CSV columns are decoded into typed columns."""
+        table = parse_output(CSV_OUTPUT)
+
+        assert len(table) == 3
+        assert table.types == {"MAIN_ID": "str", "RA": "float", "DEC": "float",
+                               "V": "float", "variable": "bool"}
+        assert table.to_dict()["data"]["V"] == [3.44, None, 2.0]
+        assert table.columns["variable"] == [False, True, False]
+
+    def test_votable_fields_and_units(self):
+        """VOTable fields keep their names and units."""
+        table = parse_output(VOTABLE_OUTPUT)
+
+        assert table.types == {"source_id": "int", "phot_g_mean_mag": "float"}
+        assert table.to_dict()["columns"][1] == {"name": "phot_g_mean_mag", "type": "float", "unit": "mag"}
+        assert list(table.columns["source_id"]) == [101, 102]
+
+    def test_json_records_and_columns(self):
+        """JSON is accepted as a list of records or as columns."""
+        records = parse_output(b'[{"a": 1, "b": "x"}, {"a": 2.5, "b": "y"}]')
+        columns = parse_output(b'{"data": {"a": [1, 2], "b": ["x", "y"]}}')
+
+        assert records.types == {"a": "float", "b": "str"}
+        assert columns.types == {"a": "int", "b": "str"}
+
+    def test_fixed_width_text(self):
+        """Astropy's text rendering is parsed as a fallback."""
+        table = parse_output(TEXT_OUTPUT)
+
+        assert table.names == ["MAIN_ID", "RA", "DEC"]
+        assert table.columns["MAIN_ID"] == ["M 31", "M 42"]
+
+    def test_filter_and_projection(self):
+        """Filters select rows and projection selects columns."""
+        table = parse_output(CSV_OUTPUT)
+
+        bright = table.where(["V < 3"]).select(["MAIN_ID"])
+        assert bright.to_dict()["data"] == {"MAIN_ID": ["NGC 2024"]}
+        assert len(table.where(["MAIN_ID ~ m 4"])) == 1
+        assert len(table.where(["DEC > 0", "variable == false"])) == 1
+
+        with pytest.raises(ValueError):
+            table.where(["nope > 1"])
+        with pytest.raises(ValueError):
+            table.select(["nope"])
+
+    def test_concat(self):
+        """Tables are stacked with a label column; columns missing from a table are null."""
+        first = parse_output(b"MAIN_ID,V\nM 1,8.4\nM 31,3.44\n")
+        second = parse_output(b"MAIN_ID,B\nM 42,4.0\n")
+
+        merged = concat([(0, first), (2, second)])
+
+        assert merged.names == ["row", "MAIN_ID", "V", "B"]
+        assert list(merged.columns["row"]) == [0, 0, 2]
+        assert merged.to_dict()["data"]["V"] == [8.4, 3.44, None]
+        assert merged.types["B"] == "float"
+
+    def test_unparsable_output(self):
+        """Plain text that is not a table is rejected."""
+        with pytest.raises(ValueError):
+            parse_output(b"Object not found\n")
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_server_returns_columnar_json(self, mock_subprocess, fake_process):
+        """Table output asks aqc for CSV and returns filtered columnar JSON."""
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        mock_subprocess.return_value = fake_process(CSV_OUTPUT)
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+
+        result = await server._execute_specific_command("simbad", {
+            "subcommand": "query",
+            "arguments": ["M31"],
+            "columns": ["MAIN_ID", "V"],
+            "where": ["V > 3"],
+        })
+        payload = json.loads(result[0].text)
+
+        call_args = mock_subprocess.call_args[0]
+        assert call_args[call_args.index("--output-format") + 1] == "csv"
+        assert payload["total_rows"] == 3
+        assert payload["matched_rows"] == 1
+        assert payload["data"] == {"MAIN_ID": ["M 31"], "V": [3.44]}
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_server_falls_back_to_text(self, mock_subprocess, fake_process):
+        """Output that cannot be parsed is returned as text with a note."""
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        mock_subprocess.return_value = fake_process(b"Object not found\n")
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+
+        result = await server._execute_generic_command({"command": "simbad query X", "output": "table"})
+
+        assert "Object not found" in result[0].text
+        assert "Table: output is not a parsable table" in result[0].text
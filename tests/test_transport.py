@@ -0,0 +1,121 @@
+"""Tests for the shared multi-client HTTP transport."""
+
+import asyncio
+import socket
+from unittest.mock import Mock, patch
+
+import pytest
+
+uvicorn = pytest.importorskip("uvicorn")
+streamable_http = pytest.importorskip("mcp.client.streamable_http")
+
+from mcp import ClientSession
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestHTTPTransport:
+    """Test cases for the streamable HTTP transport."""
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_sessions_share_one_backend(self, mock_subprocess, fake_process):
+        """Concurrent sessions are served by one instance and share its caches."""
+        from astroquery_mcp.server import AstroqueryMCPServer
+        from astroquery_mcp.transport import create_http_app
+
+        mock_subprocess.side_effect = lambda *args, **kwargs: fake_process(b"M31 result\n", delay=0.05)
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+        server.catalog.put({"simbad": {"description": "SIMBAD", "subcommands": {"query": ""}}})
+
+        port = _free_port()
+        http = uvicorn.Server(uvicorn.Config(create_http_app(server.server, server.stats),
+                                             host="127.0.0.1", port=port, log_level="warning"))
+        serving = asyncio.ensure_future(http.serve())
+        while not http.started:
+            await asyncio.sleep(0.01)
+
+        async def client_call():
+            async with streamable_http.streamablehttp_client(f"http://127.0.0.1:{port}/mcp") as (read, write, _):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    tools = await session.list_tools()
+                    result = await session.call_tool("astroquery_execute", {"command": "simbad query M31"})
+                    return [tool.name for tool in tools.tools], result.content[0].text
+
+        try:
+            outcomes = await asyncio.wait_for(asyncio.gather(client_call(), client_call()), timeout=30)
+        finally:
+            http.should_exit = True
+            await serving
+
+        for names, text in outcomes:
+            assert "astroquery_simbad" in names
+            assert "M31 result" in text
+        # Identical concurrent calls from two sessions ran aqc once
+        assert mock_subprocess.call_count == 1
+
+    @pytest.mark.asyncio
+    @patch('asyncio.create_subprocess_exec')
+    async def test_stateless_clients_keyed_by_address(self, mock_subprocess, fake_process, monkeypatch):
+        """In stateless mode, requests from one client share a scheduler identity."""
+        from astroquery_mcp.server import AstroqueryMCPServer
+        from astroquery_mcp.transport import create_http_app
+
+        monkeypatch.setenv("ASTROQUERY_MCP_HTTP_STATELESS", "1")
+        mock_subprocess.side_effect = lambda *args, **kwargs: fake_process(b"M31 result\n")
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+        clients = []
+        acquire = server.scheduler.acquire
+
+        async def recording_acquire(service, client):
+            clients.append(client)
+            return await acquire(service, client)
+
+        server.scheduler.acquire = recording_acquire
+        port = _free_port()
+        app = create_http_app(server.server, server.stats, stateless=True)
+        http = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        serving = asyncio.ensure_future(http.serve())
+        while not http.started:
+            await asyncio.sleep(0.01)
+
+        async def client_call(target):
+            async with streamable_http.streamablehttp_client(f"http://127.0.0.1:{port}/mcp") as (read, write, _):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    await session.call_tool("astroquery_execute", {"command": f"simbad query {target}"})
+
+        try:
+            await asyncio.wait_for(asyncio.gather(client_call("M31"), client_call("M42")), timeout=30)
+        finally:
+            http.should_exit = True
+            await serving
+
+        assert clients == ["address:127.0.0.1"] * 2
+
+    def test_client_header(self, monkeypatch):
+        """A configured header identifies stateless clients ahead of their address."""
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        monkeypatch.setenv("ASTROQUERY_MCP_HTTP_STATELESS", "1")
+        monkeypatch.setenv("ASTROQUERY_MCP_CLIENT_HEADER", "X-User")
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+
+        def client_id(headers):
+            request = Mock(headers=headers, client=Mock(host="10.0.0.1"))
+            with patch.object(type(server.server), "request_context", new=Mock(request=request), create=True):
+                return server._client_id()
+
+        assert client_id({"X-User": "alice"}) == "header:alice"
+        assert client_id({}) == "address:10.0.0.1"
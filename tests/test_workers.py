@@ -0,0 +1,216 @@
+"""Tests for the persistent aqc worker pool."""
+
+import asyncio
+import os
+import sys
+import textwrap
+
+import pytest
+
+from astroquery_mcp.workers import PoolBusy, WorkerError, WorkerPool, resolve_worker_spec
+
+
+FAKE_MODULE = textwrap.dedent("""
+    import os
+    import sys
+    import time
+
+    def main():
+        args = sys.argv[1:]
+        if args and args[0] == "sleep":
+            time.sleep(float(args[1]))
+        if args and args[0] == "rows":
+            for i in range(int(args[1])):
+                print(f"row {i}", flush=True)
+                time.sleep(0.1)
+        if args and args[0] == "fail":
+            print("boom", file=sys.stderr)
+            sys.exit(3)
+        if args and args[0] == "crash":
+            os._exit(1)
+        print(f"pid={os.getpid()} args={' '.join(args)}")
+""")
+
+
+@pytest.fixture
+def fake_aqc(tmp_path, monkeypatch):
+    """A console-script style aqc wrapper backed by an importable module."""
+    (tmp_path / "fake_aqc_cli.py").write_text(FAKE_MODULE)
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path))
+
+    script = tmp_path / "aqc"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "from fake_aqc_cli import main\n"
+        "if __name__ == '__main__':\n"
+        "    sys.exit(main())\n"
+    )
+    script.chmod(0o755)
+    return script
+
+
+class TestWorkerPool:
+    """Test cases for WorkerPool."""
+
+    def test_resolve_worker_spec(self, fake_aqc):
+        """The interpreter and entry point are read from the wrapper script."""
+        assert resolve_worker_spec(str(fake_aqc)) == (sys.executable, "fake_aqc_cli:main")
+
+    @pytest.mark.asyncio
+    async def test_worker_is_reused(self, fake_aqc):
+        """Consecutive calls are served by the same warm process."""
+        pool = WorkerPool(*resolve_worker_spec(str(fake_aqc)), size=1)
+        try:
+            first = await pool.run(["simbad", "query", "M31"], timeout=30)
+            second = await pool.run(["simbad", "query", "M42"], timeout=30)
+        finally:
+            await pool.close()
+
+        assert first.returncode == 0
+        assert first.source == "worker"
+        assert b"args=simbad query M31" in first.stdout
+        assert first.stdout.split()[0] == second.stdout.split()[0]
+
+    @pytest.mark.asyncio
+    async def test_exit_code_and_stderr(self, fake_aqc):
+        """sys.exit codes and stderr are reported like a real process."""
+        pool = WorkerPool(*resolve_worker_spec(str(fake_aqc)), size=1)
+        try:
+            result = await pool.run(["fail"], timeout=30)
+        finally:
+            await pool.close()
+
+        assert result.returncode == 3
+        assert b"boom" in result.stderr
+
+    @pytest.mark.asyncio
+    async def test_large_output_spilled_by_worker(self, fake_aqc):
+        """Workers write large outputs to a file instead of the pipe."""
+        pool = WorkerPool(*resolve_worker_spec(str(fake_aqc)), size=1)
+        try:
+            result = await pool.run(["x" * 200], timeout=30, spill_threshold=50)
+        finally:
+            await pool.close()
+
+        assert result.spilled
+        assert result.stdout_size > 200
+        assert b"x" * 200 in result.read_stdout()
+
+    @pytest.mark.asyncio
+    async def test_progress_frames(self, fake_aqc):
+        """Workers report output progress while a command is still running."""
+        updates = []
+
+        async def progress(size, rows):
+            updates.append((size, rows))
+
+        pool = WorkerPool(*resolve_worker_spec(str(fake_aqc)), size=1)
+        try:
+            result = await pool.run(["rows", "8"], timeout=30, progress=progress)
+            quiet = await pool.run(["rows", "2"], timeout=30)
+        finally:
+            await pool.close()
+
+        assert result.stdout.count(b"row ") == 8
+        assert quiet.returncode == 0
+        assert updates
+        assert all(0 < rows < 8 for _, rows in updates)
+        assert updates == sorted(updates)
+
+    @pytest.mark.asyncio
+    async def test_worker_recycled_after_max_requests(self, fake_aqc):
+        """Workers are replaced once they have served max_requests calls."""
+        pool = WorkerPool(*resolve_worker_spec(str(fake_aqc)), size=1, max_requests=1)
+        try:
+            first = await pool.run(["a"], timeout=30)
+            second = await pool.run(["b"], timeout=30)
+        finally:
+            await pool.close()
+
+        assert first.stdout.split()[0] != second.stdout.split()[0]
+
+    @pytest.mark.asyncio
+    async def test_crashed_worker_raises_worker_error(self, fake_aqc):
+        """A worker dying mid-request surfaces as WorkerError and is replaced."""
+        pool = WorkerPool(*resolve_worker_spec(str(fake_aqc)), size=1)
+        try:
+            with pytest.raises(WorkerError):
+                await pool.run(["crash"], timeout=30)
+            result = await pool.run(["ok"], timeout=30)
+        finally:
+            await pool.close()
+
+        assert result.returncode == 0
+
+    @pytest.mark.asyncio
+    async def test_busy_pool_raises_at_once(self, fake_aqc):
+        """Calls that find every worker busy fail with PoolBusy instead of queueing."""
+        pool = WorkerPool(*resolve_worker_spec(str(fake_aqc)), size=1)
+        try:
+            await pool.run(["warm"], timeout=30)
+            start = asyncio.get_event_loop().time()
+            busy = asyncio.ensure_future(pool.run(["sleep", "0.5"], timeout=30))
+            await asyncio.sleep(0.05)
+            with pytest.raises(PoolBusy):
+                await pool.run(["ok"], timeout=30)
+            assert asyncio.get_event_loop().time() - start < 0.5
+            assert (await busy).returncode == 0
+            after = await pool.run(["ok"], timeout=30)
+        finally:
+            await pool.close()
+
+        assert after.returncode == 0
+        assert pool.spawned == 1
+
+    @pytest.mark.asyncio
+    async def test_server_falls_back_to_subprocess(self, fake_aqc, monkeypatch):
+        """The server uses a one-shot process when the pool cannot serve a call."""
+        from unittest.mock import Mock, patch
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        monkeypatch.setenv("PATH", f"{fake_aqc.parent}{os.pathsep}{os.environ['PATH']}")
+        monkeypatch.delenv("ASTROQUERY_MCP_AQC")
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+        assert server.worker_pool is not None
+
+        # Point the pool at an entry point that cannot be imported
+        server.worker_pool.entry = "missing_module:main"
+        try:
+            result = await server._execute_generic_command({"command": "simbad query M31"})
+        finally:
+            await server.worker_pool.close()
+
+        assert "args=simbad query M31" in result[0].text
+        assert "Return code: 0" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_server_runs_past_a_saturated_pool(self, fake_aqc, monkeypatch):
+        """Calls beyond the pool size run in one-shot processes alongside the workers."""
+        from unittest.mock import Mock, patch
+        from astroquery_mcp.server import AstroqueryMCPServer
+
+        monkeypatch.setenv("PATH", f"{fake_aqc.parent}{os.pathsep}{os.environ['PATH']}")
+        monkeypatch.delenv("ASTROQUERY_MCP_AQC")
+        monkeypatch.setenv("ASTROQUERY_MCP_WORKERS", "1")
+        with patch('subprocess.run') as mock_run:
+            mock_run.return_value = Mock(returncode=0)
+            server = AstroqueryMCPServer()
+
+        try:
+            await server._execute_generic_command({"command": "warm", "cache": False})
+            start = asyncio.get_event_loop().time()
+            results = await asyncio.gather(*(
+                server._execute_generic_command({"command": f"sleep 0.5 {i}", "cache": False})
+                for i in range(3)
+            ))
+            elapsed = asyncio.get_event_loop().time() - start
+        finally:
+            await server.worker_pool.close()
+
+        assert all("Return code: 0" in result[0].text for result in results)
+        assert elapsed < 1.4
+        assert server.metrics.counter("worker_busy_total") == 2
+        assert server.metrics.counter("spawns_total", kind="subprocess") == 2